@@ -0,0 +1,208 @@
+# Mergeable churn aggregates per customer dimension
+
+import numpy as np
+import pandas as pd
+
+from features import AGE_BINS, AGE_LABELS, CREDIT_SCORE_CATEGORIES, iqr_bounds
+from moments import CoMoments
+
+DIMENSIONS = ['AgeGroup', 'Gender', 'Geography', 'NumOfProducts', 'Tenure',
+              'IsActiveMember', 'HasCrCard', 'CreditScoreCategory', 'ZeroBalance']
+
+# CreditScoreCategory depends on quartiles of the whole population, so chunks
+# only record a CreditScore histogram and the category is derived on read.
+KEY_COLUMNS = [dim for dim in DIMENSIONS if dim != 'CreditScoreCategory'] + ['CreditScore']
+
+CATEGORY_ORDER = {
+    'AgeGroup': AGE_LABELS,
+    'CreditScoreCategory': CREDIT_SCORE_CATEGORIES,
+}
+
+
+# Integer key columns with a value range above this are factorized instead
+# of being offset-coded, to keep the bincount arrays small.
+MAX_DIRECT_RANGE = 1 << 16
+
+
+def weighted_quantile(values, counts, q):
+    """Exact quantile of a histogram, using pandas' linear interpolation"""
+    order = np.argsort(values)
+    values = np.asarray(values, dtype=float)[order]
+    cum = np.cumsum(np.asarray(counts)[order])
+
+    h = (cum[-1] - 1) * q
+    lo = values[np.searchsorted(cum, np.floor(h), side='right')]
+    hi = values[np.searchsorted(cum, np.ceil(h), side='right')]
+    return lo + (h - np.floor(h)) * (hi - lo)
+
+
+def encode_key(chunk, col):
+    """Integer-code a key column
+
+    Returns (codes, values) where values[codes[i]] is the key of row i and
+    rows without a key (missing values, ages outside the bins) get code -1.
+    """
+    if col == 'AgeGroup':
+        # Same right-closed intervals as pd.cut(bins=AGE_BINS)
+        codes = np.searchsorted(AGE_BINS, chunk['Age'].to_numpy(), side='left') - 1
+        codes[codes >= len(AGE_LABELS)] = -1
+        return codes, np.array(AGE_LABELS, dtype=object)
+
+    if col == 'ZeroBalance':
+        return (chunk['Balance'].to_numpy() == 0).astype(np.int64), np.array([False, True])
+
+    if pd.api.types.is_integer_dtype(chunk[col]) and len(chunk):
+        # Widen first so that narrow (int8/int16) columns cannot overflow
+        values = chunk[col].to_numpy().astype(np.int64, copy=False)
+        lo, hi = values.min(), values.max()
+        if hi - lo < MAX_DIRECT_RANGE:
+            return values - lo, np.arange(lo, hi + 1)
+
+    codes, uniques = pd.factorize(chunk[col])
+    return codes, np.asarray(uniques)
+
+
+def fused_group_sums(chunk, columns):
+    """Count, exited sum, balance sum and churned balance sum for every key column
+
+    The measure columns are extracted once and shared by every key, and each
+    key is reduced with np.bincount over its integer codes, so no filtered
+    copies or per-group Python work is involved.
+    """
+    exited = chunk['Exited'].to_numpy(dtype=np.float64)
+    balance = chunk['Balance'].to_numpy(dtype=np.float64)
+    balance_exited = balance * exited
+
+    result = {}
+    for col in columns:
+        codes, values = encode_key(chunk, col)
+        # Rows without a key go to an extra slot past the end of the range
+        size = len(values) + 1
+        codes = np.where(codes < 0, len(values), codes)
+
+        counts = np.bincount(codes, minlength=size)[:-1]
+        present = counts > 0
+        result[col] = pd.DataFrame({
+            'Count': counts[present],
+            'Exited': np.bincount(codes, weights=exited, minlength=size)[:-1][present].round().astype(np.int64),
+            'Balance': np.bincount(codes, weights=balance, minlength=size)[:-1][present],
+            'BalanceExited': np.bincount(codes, weights=balance_exited, minlength=size)[:-1][present],
+        }, index=pd.Index(values[present], name=col))
+    return result
+
+
+class ChurnAggregates:
+    """Customer counts, exited sums and balance sums per dimension value
+
+    Aggregates built from separate chunks (or workers) can be combined with
+    merge(), so the full population never has to be held in memory. The
+    co-moments of the correlation columns are kept alongside, for the
+    Pearson matrix.
+    """
+
+    MEASURES = ['Count', 'Exited', 'Balance', 'BalanceExited']
+
+    def __init__(self):
+        self.rows = 0
+        self.total_exited = 0
+        self.groups = {}
+        self.moments = CoMoments()
+
+    @classmethod
+    def from_frame(cls, df):
+        agg = cls()
+        agg.update(df)
+        return agg
+
+    def update(self, chunk):
+        """Add a chunk of customer rows"""
+        self.rows += len(chunk)
+        self.total_exited += int(chunk['Exited'].sum())
+        for col, group in fused_group_sums(chunk, KEY_COLUMNS).items():
+            self._add(col, group)
+        self.moments.update(chunk)
+        return self
+
+    def remove(self, chunk):
+        """Take a chunk of previously added rows out again (e.g. deleted or
+        updated customers)"""
+        self.rows -= len(chunk)
+        self.total_exited -= int(chunk['Exited'].sum())
+        for col, group in fused_group_sums(chunk, KEY_COLUMNS).items():
+            self._add(col, -group)
+        self.moments.remove(chunk)
+        return self
+
+    def merge(self, other):
+        """Combine another set of aggregates into this one"""
+        self.rows += other.rows
+        self.total_exited += other.total_exited
+        for col, group in other.groups.items():
+            self._add(col, group)
+        self.moments.merge(other.moments)
+        return self
+
+    def _add(self, col, group):
+        if col in self.groups:
+            group = self.groups[col].add(group, fill_value=0)
+            group[['Count', 'Exited']] = group[['Count', 'Exited']].astype(np.int64)
+            group = group[group['Count'] != 0]
+        self.groups[col] = group
+
+    def credit_score_bounds(self):
+        """Return the IQR outlier fences for CreditScore"""
+        scores = self.groups['CreditScore']['Count']
+        q1 = weighted_quantile(scores.index, scores.values, 0.25)
+        q3 = weighted_quantile(scores.index, scores.values, 0.75)
+        return iqr_bounds(q1, q3)
+
+    def _credit_score_categories(self):
+        lower_bound, upper_bound = self.credit_score_bounds()
+        scores = self.groups['CreditScore']
+        labels = np.where(scores.index < lower_bound, 'Low', np.where(scores.index > upper_bound, 'High', 'Normal'))
+        return scores.groupby(labels).sum()
+
+    def table(self, dim):
+        """Return Count, Exited, Balance sums and ChurnRate for every value of a dimension"""
+        if dim == 'CreditScoreCategory':
+            result = self._credit_score_categories()
+        else:
+            result = self.groups[dim].copy()
+
+        if dim in CATEGORY_ORDER:
+            result = result.reindex([v for v in CATEGORY_ORDER[dim] if v in result.index])
+        else:
+            result = result.sort_index()
+        result['ChurnRate'] = result['Exited'] / result['Count']
+        result.index.name = dim
+        return result
+
+    def churn_rate(self, dim):
+        """Return the churn rate per value, shaped like groupby(dim)['Exited'].mean()"""
+        rates = self.table(dim)['ChurnRate'].rename('Exited')
+        return rates.reset_index()
+
+    def churn_counts(self, dim):
+        """Return stayed/churned customer counts per value in long format"""
+        table = self.table(dim)
+        counts = pd.DataFrame({0: table['Count'] - table['Exited'], 1: table['Exited']})
+        return counts.reset_index().melt(id_vars=dim, var_name='Exited', value_name='Count')
+
+    def average_balance(self, dim):
+        """Return the average balance per value and churn status, like
+        pivot_table(index=dim, columns='Exited', values='Balance', aggfunc='mean')"""
+        table = self.table(dim)
+        stayed = table['Count'] - table['Exited']
+        result = pd.DataFrame({
+            0: (table['Balance'] - table['BalanceExited']) / stayed.where(stayed > 0),
+            1: table['BalanceExited'] / table['Exited'].where(table['Exited'] > 0),
+        })
+        result.columns.name = 'Exited'
+        return result
+
+    def correlation(self):
+        """Pearson matrix of the correlation columns, like df[CORRELATION_COLS].corr()"""
+        return self.moments.correlation()
+
+    def overall_churn_rate(self):
+        return self.total_exited / self.rows
@@ -0,0 +1,369 @@
+# Local asyncio HTTP API serving the dashboard's churn aggregates as JSON
+#
+#   python api.py --port 8765 [--scope full]
+#
+#   GET /health
+#   GET /version
+#   GET /churn/<age_group|geography|products|tenure|credit_score>[?ci=wilson]
+#   GET /outliers
+#   GET /correlation
+#   GET /associations
+#   GET /segments[?k=10&min_support=0.01&min_lift=1.2&max_size=4&rank_by=lower]
+#   GET /scores[?bins=20]
+#   GET /metrics   (stage timings in the Prometheus text format, with --timings)
+#
+# Every endpoint except /health, /version and /metrics accepts filters as query
+# parameters, with comma-separated values: geography, gender, age_group,
+# products, active, credit_card (e.g. /churn/tenure?geography=France,Spain&active=1).
+
+import asyncio
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from bitmaps import BitmapIndex
+from cube import ChurnCube, load_cube
+from data_cache import DATA_FILE, dataset_version, load_raw_data
+from features import CORRELATION_COLS, SAMPLE_ROWS, add_derived_columns
+from incremental import CustomerStore, delta_files, delta_version
+from instrumentation import TIMINGS
+from intervals import CI_METHODS, churn_rate_intervals
+from moments import CoMoments, association_table
+from segments import RANK_BY, find_segments
+from profiling import profile_frame
+from shared_store import SharedDataset
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+CACHE_SIZE = 256
+VERSION_CHECK_INTERVAL = 1.0
+
+CHURN_DIMENSIONS = {
+    'age_group': 'AgeGroup',
+    'geography': 'Geography',
+    'products': 'NumOfProducts',
+    'tenure': 'Tenure',
+    'credit_score': 'CreditScoreCategory',
+}
+FILTER_PARAMS = {
+    'geography': 'Geography',
+    'gender': 'Gender',
+    'age_group': 'AgeGroup',
+    'products': 'NumOfProducts',
+    'active': 'IsActiveMember',
+    'credit_card': 'HasCrCard',
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class ResponseCache:
+    """LRU cache of encoded responses, keyed by dataset version, path and filters"""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, value):
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _clean(value):
+    """Replace NaN (not valid JSON) with None, recursively"""
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {str(k): _clean(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clean(v) for v in value]
+    if isinstance(value, np.generic):
+        return _clean(value.item())
+    return value
+
+
+def _records(frame):
+    return _clean(frame.to_dict('records'))
+
+
+class ServiceState:
+    """One version of the data behind the endpoints, replaced as a whole on reload"""
+
+    def __init__(self, version, cube, shared):
+        self.version = version
+        self.cube = cube
+        self.shared = shared
+        self.model = None
+
+
+class ChurnService:
+    """The data behind the endpoints, reloaded when the source version changes
+
+    A reload builds a new ServiceState and swaps it in with one assignment;
+    a request works on the state it started with, so it never mixes the
+    cube of one version with the sample of another.
+    """
+
+    def __init__(self, path=DATA_FILE, full_population=False):
+        self.path = path
+        self.full_population = full_population
+        self.store = None
+        self.checked = 0.0
+        self.lock = threading.Lock()
+        self.state = self.load()
+
+    @property
+    def version(self):
+        return self.state.version
+
+    def load(self):
+        if delta_files(self.path):
+            # Deltas are applied to the store, which only rereads the source
+            # when the base file itself changed
+            if self.store is None:
+                self.store = CustomerStore(load_raw_data(self.path), self.path, dataset_version(self.path))
+            self.store.refresh()
+            df = self.store.sample()
+            cube = self.store.population_cube() if self.full_population else ChurnCube.from_frame(df)
+            version = self.store.version
+        else:
+            df = load_raw_data(self.path, compact=True).head(SAMPLE_ROWS).copy()
+            add_derived_columns(df)
+            cube = load_cube(self.path) if self.full_population else ChurnCube.from_frame(df)
+            version = dataset_version(self.path)
+        return ServiceState(version, cube, SharedDataset(df, BitmapIndex(df)))
+
+    def refresh(self):
+        """Reload when the source file or its deltas changed; returns the current state
+
+        The source is checked at most every VERSION_CHECK_INTERVAL seconds.
+        """
+        with self.lock:
+            now = time.monotonic()
+            if now - self.checked >= VERSION_CHECK_INTERVAL:
+                self.checked = now
+                if delta_version(self.path) != self.state.version:
+                    self.state = self.load()
+            return self.state
+
+    def parse_filters(self, state, params):
+        """Map query parameters to bitmap filters, typed like the indexed values"""
+        filters = {}
+        for param, col in FILTER_PARAMS.items():
+            if param not in params:
+                continue
+            known = {str(value): value for value in state.shared.index.values(col)}
+            wanted = [v for v in params[param].split(',') if v]
+            unknown = [v for v in wanted if v not in known]
+            if unknown:
+                raise HTTPError(400, f'Unknown {param} value(s): {", ".join(unknown)} '
+                                     f'(expected one of {", ".join(known)})')
+            filters[col] = sorted(known[v] for v in wanted)
+        return filters
+
+    def handle(self, route, params, state=None):
+        """Compute the payload of one endpoint (runs in the executor)"""
+        state = state or self.state
+        shared, cube = state.shared, state.cube
+        filters = self.parse_filters(state, params)
+        if route == '/outliers':
+            profile = profile_frame(shared.filter(filters))
+            return {'outliers': _records(profile.outliers)}
+        if route == '/correlation':
+            corr = CoMoments.from_frame(shared.filter(filters)).correlation()
+            return {'columns': CORRELATION_COLS, 'matrix': _clean(corr.to_numpy().tolist())}
+        if route == '/associations':
+            moments = CoMoments.from_frame(shared.filter(filters))
+            return {'associations': _records(association_table(cube.slice(filters), moments))}
+        if route == '/segments':
+            rank_by = params.get('rank_by', 'lower')
+            if rank_by not in RANK_BY:
+                raise HTTPError(400, f'Unknown rank_by (expected one of {", ".join(RANK_BY)})')
+            segments = find_segments(cube.slice(filters), int(params.get('k', 10)),
+                                     min_support=float(params.get('min_support', 0.01)),
+                                     min_lift=float(params.get('min_lift', 1.2)),
+                                     max_size=int(params.get('max_size', 4)), rank_by=rank_by)
+            return {'baseline': cube.slice(filters).overall_churn_rate(), 'segments': _records(segments)}
+        if route == '/scores':
+            return self.scores(state, filters, int(params.get('bins', 20)))
+        if route.startswith('/churn/'):
+            dim = CHURN_DIMENSIONS.get(route[len('/churn/'):])
+            if dim is None:
+                raise HTTPError(404, f'Unknown dimension (expected one of {", ".join(CHURN_DIMENSIONS)})')
+            method = params.get('ci', 'wilson')
+            if method not in CI_METHODS:
+                raise HTTPError(400, f'Unknown ci method (expected one of {", ".join(CI_METHODS)})')
+            agg = cube.slice(filters)
+            rates = churn_rate_intervals(agg, dim, method).rename(columns={'Exited': 'ChurnRate'})
+            counts = agg.table(dim)[['Count', 'Exited']].reset_index(drop=True)
+            return {'dimension': dim, 'customers': agg.rows,
+                    'groups': _records(rates.join(counts)[[dim, 'Count', 'Exited', 'ChurnRate', 'Lower', 'Upper']])}
+        raise HTTPError(404, 'Not found')
+
+    def scores(self, state, filters, bins):
+        from scoring import load_model
+
+        if state.model is None:
+            state.model = load_model(self.path)
+        df = state.shared.filter(filters)
+        scores = state.model.score(df)
+        counts, edges = np.histogram(scores, bins=bins, range=(0, 1))
+        return {'customers': len(df), 'mean': float(scores.mean()) if len(df) else None,
+                'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()}}
+
+
+def canonical_params(params):
+    """Query parameters with filter values deduplicated and sorted, so that
+    equivalent filters share a cache key"""
+    return {name: ','.join(sorted({v for v in value.split(',') if v})) if name in FILTER_PARAMS else value
+            for name, value in params.items()}
+
+
+class ChurnAPI:
+    """asyncio HTTP/1.1 server with keep-alive, an LRU response cache and
+    computation in a thread pool so the event loop never blocks on pandas
+
+    Concurrent misses for the same key share one computation.
+    """
+
+    def __init__(self, service, cache_size=CACHE_SIZE, workers=None):
+        self.service = service
+        self.cache = ResponseCache(cache_size)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = {}
+
+    async def respond(self, target):
+        loop = asyncio.get_running_loop()
+        url = urlsplit(target)
+        route = url.path.rstrip('/') or '/'
+        params = canonical_params(dict(parse_qsl(url.query)))
+
+        state = await loop.run_in_executor(self.executor, self.service.refresh)
+        version = state.version
+        if route == '/health':
+            return 200, {'status': 'ok'}
+        if route == '/version':
+            return 200, {'version': version, 'cache': {'entries': len(self.cache.entries),
+                                                       'hits': self.cache.hits, 'misses': self.cache.misses}}
+        if route == '/metrics':
+            return 200, TIMINGS.to_prometheus()
+
+        key = (version, route, tuple(sorted(params.items())))
+        body = self.cache.get(key)
+        if body is not None:
+            return 200, body
+        future = self.pending.get(key)
+        if future is None:
+            future = self.pending[key] = loop.run_in_executor(self.executor, self._compute, state, route, params)
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return 200, await asyncio.shield(future)
+
+    def _compute(self, state, route, params):
+        with TIMINGS.stage(f'api[{route}]'):
+            payload = self.service.handle(route, params, state)
+        return json.dumps(payload, default=_json_default).encode()
+
+    def _finish(self, key, future):
+        del self.pending[key]
+        if not future.cancelled() and future.exception() is None:
+            self.cache.put(key, future.result())
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    method, target, _ = request_line.decode('latin-1').split(' ', 2)
+                    if method != 'GET':
+                        raise HTTPError(405, 'Only GET is supported')
+                    status, body = await self.respond(target)
+                except HTTPError as e:
+                    status, body = e.status, {'error': str(e)}
+                except ValueError as e:
+                    status, body = 400, {'error': str(e)}
+                except Exception as e:
+                    status, body = 500, {'error': f'{type(e).__name__}: {e}'}
+                content_type = 'application/json'
+                if isinstance(body, dict):
+                    body = json.dumps(body, default=_json_default).encode()
+                elif isinstance(body, str):
+                    body, content_type = body.encode(), 'text/plain; version=0.0.4; charset=utf-8'
+
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f'HTTP/1.1 {status} {"OK" if status == 200 else "Error"}\r\n'
+                    f'Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n'
+                    f'Connection: {"keep-alive" if keep_alive else "close"}\r\n\r\n'.encode() + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f'Serving churn API on http://{host}:{port} (dataset {self.service.version[:12]})')
+        async with server:
+            await server.serve_forever()
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Serve churn aggregates as JSON over HTTP')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--scope', choices=['sample', 'full'], default='sample',
+                        help='aggregates over the sample or the full population')
+    parser.add_argument('--cache-size', type=int, default=CACHE_SIZE)
+    parser.add_argument('--workers', type=int, default=None, help='executor threads for computation')
+    parser.add_argument('--timings', action='store_true', help='time every computed endpoint (see /metrics)')
+    args = parser.parse_args()
+    TIMINGS.enabled = TIMINGS.enabled or args.timings
+
+    api = ChurnAPI(ChurnService(full_population=args.scope == 'full'), args.cache_size, args.workers)
+    try:
+        asyncio.run(api.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,123 @@
+# Load test for the churn API (api.py)
+#
+# Opens a number of keep-alive connections and sends GET requests over a mix
+# of endpoints and filters as fast as the server answers, then reports
+# p50/p99 latency and throughput. With --spawn the server is started as a
+# subprocess first.
+#
+#   python benchmarks/api_load_test.py --spawn --connections 32 --requests 5000
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = [
+    '/churn/age_group',
+    '/churn/geography',
+    '/churn/products',
+    '/churn/tenure',
+    '/churn/credit_score',
+    '/outliers',
+    '/correlation',
+    '/scores',
+]
+FILTERS = ['', 'geography=France', 'geography=Germany&active=1', 'gender=Female&products=1,2',
+           'age_group=46-60', 'credit_card=0&active=0']
+
+
+def request_targets(count, seed=0):
+    """Mixed endpoint/filter targets, each path+filter combination reused many times"""
+    rng = np.random.default_rng(seed)
+    paths = rng.choice(PATHS, count)
+    filters = rng.choice(FILTERS, count)
+    return [path + ('?' + query if query else '') for path, query in zip(paths, filters)]
+
+
+async def fetch(reader, writer, host, target):
+    writer.write(f'GET {target} HTTP/1.1\r\nHost: {host}\r\n\r\n'.encode())
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def client(host, port, targets, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for target in targets:
+            start = time.perf_counter()
+            status = await fetch(reader, writer, host, target)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(target)
+    finally:
+        writer.close()
+
+
+async def run(host, port, connections, requests):
+    targets = request_targets(requests)
+    latencies, errors = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(host, port, targets[i::connections], latencies, errors)
+                           for i in range(connections)))
+    return time.perf_counter() - start, np.array(latencies), errors
+
+
+async def wait_for_server(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            await fetch(reader, writer, host, '/health')
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load-test the churn API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--spawn', action='store_true', help='start api.py as a subprocess')
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, os.path.join(ROOT, 'api.py'), '--host', args.host,
+                                   '--port', str(args.port)], cwd=ROOT, stdout=subprocess.DEVNULL)
+    try:
+        asyncio.run(wait_for_server(args.host, args.port))
+        elapsed, latencies, errors = asyncio.run(run(args.host, args.port, args.connections, args.requests))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    print(f'{len(latencies):,} requests over {args.connections} connections in {elapsed:.2f} s')
+    print(f'throughput {len(latencies) / elapsed:,.0f} req/s   p50 {p50:.2f} ms   p99 {p99:.2f} ms   '
+          f'max {latencies.max() * 1000:.2f} ms   errors {len(errors)}')
+
+
+if __name__ == '__main__':
+    main()
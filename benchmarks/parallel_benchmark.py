@@ -0,0 +1,100 @@
+# Scaling of the map-reduce pipeline (parallel.py) with the worker count
+#
+# Runs run_parallel over synthetic customers, either in memory (hash shards
+# of CustomerId), from one file (CSV, Parquet or Arrow IPC, split into
+# pieces the workers read themselves) or from a directory of Parquet
+# partitions, for every worker count up to the number of cores, and reports
+# rows/s, speedup over one worker, the CPU time of the parent process (the
+# serial part that bounds the speedup whatever the core count) and the CPU
+# time of the workers. With fewer cores than workers the speedup cannot
+# exceed the number of usable cores, printed first.
+#
+#   python benchmarks/parallel_benchmark.py --rows 5000000 --source file --format csv
+
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parallel import run_parallel  # noqa: E402
+from streaming import DEFAULT_CHUNKSIZE  # noqa: E402
+from synthetic import generate_customers  # noqa: E402
+
+
+def write_partitions(df, directory, partitions):
+    size = -(-len(df) // partitions)
+    for i in range(partitions):
+        df.iloc[i * size:(i + 1) * size].to_parquet(os.path.join(directory, f'part-{i:04d}.parquet'), index=False)
+
+
+def write_file(df, directory, fmt):
+    path = os.path.join(directory, f'customers.{fmt}')
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False, row_group_size=DEFAULT_CHUNKSIZE)
+    elif fmt == 'arrow':
+        df.to_feather(path, compression='uncompressed')
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+
+def children_cpu():
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def worker_counts(limit):
+    counts, n = [], 1
+    while n < limit:
+        counts.append(n)
+        n *= 2
+    return counts + [limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure map-reduce throughput against the worker count')
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--source', choices=['memory', 'file', 'partitions'], default='memory')
+    parser.add_argument('--format', choices=['csv', 'parquet', 'arrow'], default='parquet',
+                        help='file format of --source file')
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args()
+
+    df = generate_customers(args.rows)
+    source, tmp = df, None
+    if args.source != 'memory':
+        tmp = tempfile.mkdtemp(prefix='churn-partitions-')
+        if args.source == 'file':
+            source = write_file(df, tmp, args.format)
+        else:
+            write_partitions(df, tmp, 4 * args.max_workers)
+            source = tmp
+
+    try:
+        label = f'{args.format} file' if args.source == 'file' else args.source
+        print(f'{args.rows:,} rows from {label}, {len(os.sched_getaffinity(0))} usable cores')
+        baseline = None
+        for workers in worker_counts(args.max_workers):
+            best, parent, children = float('inf'), float('inf'), float('inf')
+            for _ in range(args.repeats):
+                start, cpu, child = time.perf_counter(), time.process_time(), children_cpu()
+                run_parallel(source, workers)
+                best = min(best, time.perf_counter() - start)
+                parent = min(parent, time.process_time() - cpu)
+                children = min(children, children_cpu() - child)
+            baseline = baseline or best
+            print(f'  {workers:>3} workers  {best:8.2f} s  {args.rows / best:14,.0f} rows/s  '
+                  f'speedup {baseline / best:5.2f}x  parent CPU {parent:6.2f} s  worker CPU {children:6.2f} s')
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp)
+
+
+if __name__ == '__main__':
+    main()
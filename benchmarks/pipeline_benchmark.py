@@ -0,0 +1,194 @@
+# Time and memory-profile every dashboard pipeline stage on synthetic data
+#
+# For each size, synthetic customers are generated (synthetic.py) and pushed
+# through the same steps as the dashboard: load_data, the churn cube, the
+# bitmap filters, calculate_outliers, every create_* figure builder
+# (including the figure's JSON serialization, which st.plotly_chart pays)
+# and churn scoring. Each stage is timed (best of --repeats) and then run once
+# more under tracemalloc for its peak allocation. Results are written as JSON
+# and compared against a saved baseline; regressions make the exit code 1.
+#
+#   python benchmarks/pipeline_benchmark.py --sizes 10000 100000 --save-baseline
+#   python benchmarks/pipeline_benchmark.py --sizes 10000 100000
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from streamlit.logger import set_log_level  # noqa: E402
+
+set_log_level('error')
+
+import streamlit_app as app  # noqa: E402
+from bitmaps import BitmapIndex  # noqa: E402
+from cube import ChurnCube  # noqa: E402
+from features import add_derived_columns  # noqa: E402
+from moments import CoMoments  # noqa: E402
+from profiling import profile_frame  # noqa: E402
+from schema import compact_frame  # noqa: E402
+from scoring import load_model  # noqa: E402
+from shared_store import SharedDataset  # noqa: E402
+from synthetic import generate_customers  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_BASELINE = os.path.join(ROOT, 'benchmarks', 'pipeline_baseline.json')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+MIN_TIME_DELTA = 0.005
+MIN_MEMORY_DELTA = 1.0
+
+
+def _serialize(figures):
+    for fig in figures if isinstance(figures, tuple) else (figures,):
+        fig.to_json()
+
+
+def _load_data(ctx):
+    df = compact_frame(ctx['raw'])
+    add_derived_columns(df)
+    ctx['shared'] = SharedDataset(df, BitmapIndex(df))
+    ctx['df'] = ctx['shared'].view()
+
+
+def _figure(builder, *args):
+    def stage(ctx):
+        _serialize(builder(*(ctx[arg] if arg in ctx else arg for arg in args)))
+    return stage
+
+
+# (stage name, function of the shared context); stages run in this order
+STAGES = [
+    ('load_data', _load_data),
+    ('aggregates', lambda ctx: ctx.update(agg=ChurnCube.from_frame(ctx['df']))),
+    ('filter', lambda ctx: ctx['shared'].filter({'Geography': ['Germany'], 'IsActiveMember': [0]})),
+    ('calculate_outliers', lambda ctx: app.calculate_outliers(profile_frame(ctx['df']))),
+    ('moments', lambda ctx: ctx.update(moments=CoMoments.from_frame(ctx['df']))),
+    ('create_correlation_heatmap', _figure(app.create_correlation_heatmap, 'moments')),
+    ('create_age_group_churn', _figure(app.create_age_group_churn, 'agg')),
+    ('create_gender_churn_pie', _figure(app.create_gender_churn_pie, 'agg')),
+    ('create_geography_churn', _figure(app.create_geography_churn, 'agg')),
+    ('create_balance_boxplot', _figure(app.create_balance_boxplot, 'df')),
+    ('create_balance_histogram', _figure(app.create_balance_histogram, 'df')),
+    ('create_products_analysis', _figure(app.create_products_analysis, 'agg')),
+    ('create_activity_analysis', _figure(app.create_activity_analysis, 'agg')),
+    ('create_tenure_analysis', _figure(app.create_tenure_analysis, 'agg')),
+    ('create_credit_score_analysis', _figure(app.create_credit_score_analysis, 'df', 'agg')),
+    ('create_balance_products_analysis', _figure(app.create_balance_products_analysis, 'agg')),
+    ('score', lambda ctx: ctx['model'].score(ctx['df'])),
+]
+
+
+def time_stage(stage, ctx, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        stage(ctx)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(stage, ctx):
+    """Peak bytes allocated through Python and NumPy while the stage runs (MiB)"""
+    tracemalloc.start()
+    try:
+        stage(ctx)
+        return tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+
+
+def run_size(rows, seed, repeats, memory=True):
+    ctx = {'model': load_model()}
+    start = time.perf_counter()
+    ctx['raw'] = generate_customers(rows, seed)
+    results = {'generate': {'seconds': time.perf_counter() - start}}
+
+    for name, stage in STAGES:
+        result = {'seconds': time_stage(stage, ctx, repeats)}
+        result['rows_per_second'] = rows / result['seconds'] if result['seconds'] else None
+        if memory:
+            result['peak_mib'] = peak_memory(stage, ctx)
+        results[name] = result
+    return results
+
+
+def compare(results, baseline, threshold):
+    """List (size, stage, metric, baseline, current) for every regression"""
+    regressions = []
+    for size, stages in results.items():
+        for stage, current in stages.items():
+            base = baseline.get(size, {}).get(stage)
+            if not base:
+                continue
+            for metric, min_delta in [('seconds', MIN_TIME_DELTA), ('peak_mib', MIN_MEMORY_DELTA)]:
+                if metric in current and metric in base:
+                    if current[metric] > base[metric] * (1 + threshold) and current[metric] - base[metric] > min_delta:
+                        regressions.append((size, stage, metric, base[metric], current[metric]))
+    return regressions
+
+
+def environment():
+    return {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(), 'platform': platform.platform(),
+        'numpy': np.__version__, 'pandas': pd.__version__, 'cpus': os.cpu_count(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the dashboard pipeline on synthetic data')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeats', type=int, default=3, help='timing runs per stage (best is kept)')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--output', help='results JSON (default: benchmarks/results/pipeline-<time>.json)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25, help='relative slowdown flagged as a regression')
+    args = parser.parse_args()
+
+    results = {}
+    for rows in args.sizes:
+        results[str(rows)] = stages = run_size(rows, args.seed, args.repeats, not args.no_memory)
+        print(f'\n{rows:,} rows')
+        for name, r in stages.items():
+            memory = f"{r['peak_mib']:9.1f} MiB" if 'peak_mib' in r else ''
+            print(f"  {name:<34} {r['seconds'] * 1000:10.1f} ms {memory}")
+
+    report = {'environment': environment(), 'seed': args.seed, 'results': results}
+    output = args.output or os.path.join(RESULTS_DIR, f"pipeline-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'\nResults written to {output}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('No baseline to compare against (run with --save-baseline)')
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f)['results'], args.threshold)
+    for size, stage, metric, base, current in regressions:
+        print(f'REGRESSION {int(size):,} rows {stage} {metric}: {base:.4g} -> {current:.4g} ({current / base - 1:+.0%})')
+    if not regressions:
+        print('No regressions against the baseline')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
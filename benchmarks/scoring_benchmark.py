@@ -0,0 +1,72 @@
+# Throughput of the churn scoring engine in batch and micro-batch mode
+#
+# Batch mode scores a whole table with ChurnModel.score; micro-batch mode
+# scores small lists of records with ChurnModel.score_records, the path a
+# request handler would use. Reports rows/sec and per-call latency.
+#
+#   python benchmarks/scoring_benchmark.py --rows 5000000
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cache import DATA_FILE, load_raw_data  # noqa: E402
+from scoring import load_model  # noqa: E402
+
+
+def build_table(rows):
+    data = load_raw_data(DATA_FILE)
+    repeats = -(-rows // len(data))
+    return pd.concat([data] * repeats, ignore_index=True).head(rows)
+
+
+def run_batch(model, df, repeats):
+    model.score(df.head(1000))  # warm up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.score(df)
+    return (time.perf_counter() - start) / repeats
+
+
+def run_micro_batches(model, records, size, calls):
+    latencies = np.empty(calls)
+    for i in range(calls):
+        offset = (i * size) % (len(records) - size)
+        batch = records[offset:offset + size]
+        start = time.perf_counter()
+        model.score_records(batch)
+        latencies[i] = time.perf_counter() - start
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark batch and micro-batch churn scoring')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--calls', type=int, default=2000, help='micro-batch calls per batch size')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 16, 256])
+    args = parser.parse_args()
+
+    model = load_model()
+    df = build_table(args.rows)
+    print(f'Model: AUC {model.metrics.get("auc", float("nan")):.3f} on the holdout')
+
+    seconds = run_batch(model, df, args.repeats)
+    print(f'batch        {len(df):>10,} rows  {seconds * 1000:9.1f} ms   {len(df) / seconds:14,.0f} rows/s')
+
+    records = df.head(max(args.sizes) * 100).to_dict('records')
+    for size in args.sizes:
+        latencies = run_micro_batches(model, records, size, args.calls)
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1e6
+        print(f'micro-batch  {size:>10,} rows  p50 {p50:8.1f} us  p99 {p99:8.1f} us   '
+              f'{size * args.calls / latencies.sum():14,.0f} rows/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+# Compare per-session copies (st.cache_data) with the shared read-only store
+#
+# st.cache_data keeps a pickled DataFrame and deserializes a fresh copy on
+# every call; SharedDataset hands out shallow views of one table. This script
+# replays that for a number of concurrent sessions and reruns and reports
+# rerun latency and peak memory for both.
+#
+#   python benchmarks/shared_store_benchmark.py --rows 1000000 --sessions 20
+
+import argparse
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cache import DATA_FILE, load_raw_data  # noqa: E402
+from features import add_derived_columns  # noqa: E402
+from shared_store import SharedDataset  # noqa: E402
+
+
+def build_table(rows):
+    data = load_raw_data(DATA_FILE)
+    repeats = -(-rows // len(data))
+    df = pd.concat([data] * repeats, ignore_index=True).head(rows)
+    return add_derived_columns(df)
+
+
+def run_copies(df, sessions, reruns):
+    """Every session deserializes its own copy on every rerun"""
+    payload = pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        # Sessions are concurrent, so their copies are alive at the same time
+        copies = [pickle.loads(payload) for _ in range(sessions)]
+        del copies
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / (sessions * reruns), peak
+
+
+def run_shared(df, sessions, reruns):
+    """Every session takes a shallow view of the shared table"""
+    shared = SharedDataset(df)
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        views = [shared.view() for _ in range(sessions)]
+        del views
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / (sessions * reruns), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare per-session copies with the shared dataset store')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--reruns', type=int, default=5)
+    args = parser.parse_args()
+
+    df = build_table(args.rows)
+    print(f'Table: {len(df):,} rows, {df.memory_usage(deep=True).sum() / 2**20:.1f} MiB')
+    print(f'{args.sessions} concurrent sessions x {args.reruns} reruns\n')
+
+    for name, run in [('cache_data copies', run_copies), ('shared views', run_shared)]:
+        latency, peak = run(df, args.sessions, args.reruns)
+        print(f'{name:<18} rerun latency {latency * 1000:9.3f} ms   peak extra memory {peak / 2**20:9.1f} MiB')
+
+
+if __name__ == '__main__':
+    main()
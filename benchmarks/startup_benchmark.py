@@ -0,0 +1,81 @@
+# Cold-start cost of the dashboard: module import time and time to first
+# render of every section, with and without the warm-start bundle (bundle.py)
+#
+# Every measurement runs in a fresh interpreter, so nothing is shared through
+# Streamlit's in-process caches. Sections are rendered in turn with
+# streamlit.testing's AppTest, each for the first time in that process.
+#
+#   python bundle.py && python benchmarks/startup_benchmark.py --repeats 5
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bundle import open_bundle  # noqa: E402
+from data_cache import CACHE_DIR, DATA_FILE  # noqa: E402
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import streamlit_app  # noqa: F401
+print(time.perf_counter() - start)
+"""
+
+RENDER_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+import bundle
+if sys.argv[1] == 'live':
+    bundle.BUNDLE_FORMAT = None  # no bundle matches, everything is computed live
+at = AppTest.from_file('streamlit_app.py', default_timeout=300).run()
+times = {'first_render': time.perf_counter() - start}
+selector = next(s for s in at.sidebar.selectbox if 'Section' in s.label)
+for section in selector.options[1:]:
+    start = time.perf_counter()
+    next(s for s in at.sidebar.selectbox if 'Section' in s.label).set_value(section).run()
+    times[section.split(' ', 1)[1]] = time.perf_counter() - start
+assert not at.exception, at.exception
+print(json.dumps(times))
+"""
+
+
+def run(script, *args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    result = subprocess.run([sys.executable, '-c', script, *args], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure dashboard import time and time to first render')
+    parser.add_argument('--repeats', type=int, default=3, help='fresh processes per measurement (best is kept)')
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    results = {'import_seconds': min(float(run(IMPORT_SCRIPT)) for _ in range(args.repeats))}
+    modes = ['live']
+    if open_bundle(os.path.join(ROOT, DATA_FILE), os.path.join(ROOT, CACHE_DIR)) is not None:
+        modes.append('bundle')
+    else:
+        print('No warm-start bundle for the current data file (run python bundle.py); measuring live only')
+    for mode in modes:
+        runs = [json.loads(run(RENDER_SCRIPT, mode)) for _ in range(args.repeats)]
+        results[mode] = {stage: min(r[stage] for r in runs) for stage in runs[0]}
+
+    print(f"Import streamlit_app: {results['import_seconds']:.3f} s")
+    print(f"{'Stage':<32}" + ''.join(f'{mode:>12}' for mode in modes))
+    for stage in results['live']:
+        print(f'{stage:<32}' + ''.join(f'{results[mode][stage]:11.3f}s' for mode in modes))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# Warm-start bundle: everything the dashboard computes on its first requests,
+# prebuilt for one version of the data file
+#
+#   python bundle.py [path] [--quantile-mode auto] [--workers 4]
+#
+# A bundle is a directory next to the data cache, named after the dataset
+# version it was built from, holding:
+#
+#   manifest.json   format, dataset version, build settings and contents
+#   table.arrow     the enriched sample (compact dtypes and derived columns)
+#   cube.arrow      the churn cube of the sample
+#   summaries.pkl   profile, memory report and full-population outliers and co-moments
+#   figures.json    Plotly specs of every chart in the default (unfiltered sample) view
+#
+# The dashboard opens the bundle of the current dataset version when there is
+# one and computes everything live otherwise, so a stale bundle is never used.
+
+import glob
+import json
+import os
+import pickle
+import shutil
+import time
+
+from data_cache import CACHE_DIR, DATA_FILE, cache_paths, dataset_version
+from quantiles import QUANTILE_MODES
+
+BUNDLE_FORMAT = 2
+
+
+def bundle_dir(path=DATA_FILE, version=None, cache_dir=CACHE_DIR):
+    """Directory of the bundle of a data file version (the current one by default)"""
+    version = version or dataset_version(path, cache_dir)
+    return os.path.splitext(cache_paths(path, cache_dir)[0])[0] + f'.bundle-{version[:16]}'
+
+
+class WarmStartBundle:
+    """Read side of a bundle; every artifact is loaded on first use"""
+
+    def __init__(self, directory, manifest):
+        self.directory = directory
+        self.manifest = manifest
+        self._summaries = None
+        self._figures = None
+
+    @property
+    def version(self):
+        return self.manifest['version']
+
+    @property
+    def quantile_mode(self):
+        return self.manifest['quantile_mode']
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def table(self):
+        """The enriched sample, memory-mapped from Arrow IPC"""
+        import pyarrow.feather as feather
+
+        return feather.read_table(self._path('table.arrow'), memory_map=True).to_pandas()
+
+    def cube(self):
+        from cube import ChurnCube
+
+        return ChurnCube.load(self._path('cube.arrow'), self.version)
+
+    def summary(self, name):
+        if self._summaries is None:
+            with open(self._path('summaries.pkl'), 'rb') as f:
+                self._summaries = pickle.load(f)
+        return self._summaries.get(name)
+
+    def has_figure(self, key):
+        return key in self.manifest['figures']
+
+    def figure(self, key):
+        """The figures of one builder call, rebuilt from their stored specs
+
+        Returns a single figure, or a tuple for builders returning several.
+        """
+        import plotly.io as pio
+
+        if self._figures is None:
+            with open(self._path('figures.json'), encoding='utf-8') as f:
+                self._figures = json.load(f)
+        specs = self._figures[key]
+        if isinstance(specs, list):
+            return tuple(pio.from_json(spec) for spec in specs)
+        return pio.from_json(specs)
+
+
+def open_bundle(path=DATA_FILE, cache_dir=CACHE_DIR):
+    """The bundle of the current version of a data file, or None when there is none"""
+    try:
+        version = dataset_version(path, cache_dir)
+        directory = bundle_dir(path, version, cache_dir)
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != BUNDLE_FORMAT or manifest.get('version') != version:
+        return None
+    return WarmStartBundle(directory, manifest)
+
+
+def build_bundle(path=DATA_FILE, cache_dir=CACHE_DIR, quantile_mode='auto', workers=1):
+    """Build the bundle of the current version of a data file and remove older ones
+
+    The bundle is written to a temporary directory and renamed into place, so
+    readers never see a partial bundle.
+    """
+    import pyarrow.feather as feather
+
+    from cube import ChurnCube
+    from dashboard_figures import default_figures
+    from data_cache import load_raw_data
+    from features import SAMPLE_ROWS, add_derived_columns
+    from parallel import population_aggregates, population_outliers
+    from profiling import profile_dataset
+    from schema import memory_report
+
+    start = time.perf_counter()
+    version = dataset_version(path, cache_dir)
+    directory = bundle_dir(path, version, cache_dir)
+    tmp = f'{directory}.{os.getpid()}.tmp'
+    os.makedirs(tmp, exist_ok=True)
+
+    try:
+        df = load_raw_data(path, cache_dir=cache_dir, compact=True).head(SAMPLE_ROWS).copy()
+        add_derived_columns(df, mode=quantile_mode)
+        feather.write_feather(df, os.path.join(tmp, 'table.arrow'), compression='uncompressed')
+        cube = ChurnCube.from_frame(df)
+        cube.save(os.path.join(tmp, 'cube.arrow'), version)
+
+        raw = add_derived_columns(load_raw_data(path, cache_dir=cache_dir).head(SAMPLE_ROWS).copy())
+        population = population_aggregates(path, workers)
+        # The dashboard shows the bundled outliers whatever its worker count,
+        # so they come from the single-stream path of its default view
+        summaries = {
+            'profile': profile_dataset(df, quantile_mode, cache_dir),
+            'memory_report': memory_report(raw, df),
+            'population_outliers': population_outliers(path),
+            'population_moments': population.moments,
+        }
+        with open(os.path.join(tmp, 'summaries.pkl'), 'wb') as f:
+            pickle.dump(summaries, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        figures = {}
+        for key, result in default_figures(df, cube):
+            figures[key] = [fig.to_json() for fig in result] if isinstance(result, tuple) else result.to_json()
+        with open(os.path.join(tmp, 'figures.json'), 'w', encoding='utf-8') as f:
+            json.dump(figures, f)
+
+        manifest = {
+            'format': BUNDLE_FORMAT, 'version': version, 'source': os.path.abspath(path),
+            'quantile_mode': quantile_mode, 'sample_rows': len(df), 'population_rows': population.rows,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'build_seconds': time.perf_counter() - start,
+            'figures': sorted(figures),
+        }
+        with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        shutil.rmtree(directory, ignore_errors=True)
+        os.replace(tmp, directory)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for old in glob.glob(bundle_dir(path, '*', cache_dir)):
+        if old != directory and not old.endswith('.tmp'):
+            shutil.rmtree(old, ignore_errors=True)
+    return WarmStartBundle(directory, manifest)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Prebuild the dashboard warm-start bundle for a data file')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--quantile-mode', choices=QUANTILE_MODES, default='auto')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the full-population co-moments')
+    args = parser.parse_args()
+
+    bundle = build_bundle(args.path, quantile_mode=args.quantile_mode, workers=args.workers)
+    print(f"Bundle {bundle.directory}: {len(bundle.manifest['figures'])} figures, "
+          f"built in {bundle.manifest['build_seconds']:.2f} s")
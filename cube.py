@@ -0,0 +1,240 @@
+# Precomputed churn data cube over the derived customer dimensions
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregates import CATEGORY_ORDER, encode_key
+from data_cache import CACHE_DIR, DATA_FILE, cache_paths, dataset_version
+from features import add_credit_score_category
+from streaming import DEFAULT_CHUNKSIZE, iter_chunks, stream_aggregates
+
+CUBE_DIMENSIONS = ['Geography', 'Gender', 'AgeGroup', 'NumOfProducts', 'IsActiveMember',
+                   'HasCrCard', 'Tenure', 'CreditScoreCategory', 'ZeroBalance']
+CUBE_MEASURES = ['Count', 'Exited', 'Balance', 'BalanceExited', 'TenureSum']
+
+
+def cube_cells(chunk):
+    """Sum the cube measures for every non-empty cell of a chunk
+
+    Each dimension is integer-coded, the codes are combined into one
+    mixed-radix cell key and every measure is reduced with np.bincount.
+    The chunk must already have a CreditScoreCategory column.
+    """
+    if len(chunk) == 0:
+        return pd.DataFrame(columns=CUBE_DIMENSIONS + CUBE_MEASURES)
+
+    codes, values = [], []
+    for dim in CUBE_DIMENSIONS:
+        dim_codes, dim_values = encode_key(chunk, dim)
+        dim_values = np.asarray(dim_values, dtype=object)
+        if (dim_codes < 0).any():
+            dim_codes = np.where(dim_codes < 0, len(dim_values), dim_codes)
+            dim_values = np.append(dim_values, None)
+        codes.append(dim_codes)
+        values.append(dim_values)
+
+    shape = [len(v) for v in values]
+    keys = np.ravel_multi_index(codes, shape)
+    size = int(np.prod(shape))
+
+    exited = chunk['Exited'].to_numpy(dtype=np.float64)
+    balance = chunk['Balance'].to_numpy(dtype=np.float64)
+    counts = np.bincount(keys, minlength=size)
+    present = np.flatnonzero(counts)
+
+    cells = pd.DataFrame({
+        dim: dim_values[idx]
+        for dim, dim_values, idx in zip(CUBE_DIMENSIONS, values, np.unravel_index(present, shape))
+    })
+    cells['Count'] = counts[present]
+    cells['Exited'] = np.bincount(keys, weights=exited, minlength=size)[present].round().astype(np.int64)
+    cells['Balance'] = np.bincount(keys, weights=balance, minlength=size)[present]
+    cells['BalanceExited'] = np.bincount(keys, weights=balance * exited, minlength=size)[present]
+    cells['TenureSum'] = np.bincount(keys, weights=chunk['Tenure'].to_numpy(dtype=np.float64), minlength=size)[present]
+    return cells.infer_objects()
+
+
+class ChurnCube:
+    """(count, exited, balance sum, tenure sum) for every dimension combination
+
+    Roll-up and slice queries only touch the cube cells (a few thousand at
+    most), never the customer rows. Exposes the same table() / churn_rate()
+    interface as ChurnAggregates so the chart builders can use either.
+    """
+
+    def __init__(self, cells=None, credit_score_bounds=None):
+        if cells is None:
+            cells = pd.DataFrame(columns=CUBE_DIMENSIONS + CUBE_MEASURES)
+        self.cells = cells
+        self.bounds = credit_score_bounds
+
+    @classmethod
+    def from_frame(cls, df, credit_score_bounds=None):
+        """Build a cube from an in-memory table"""
+        if 'CreditScoreCategory' not in df or credit_score_bounds is not None:
+            df = add_credit_score_category(df.copy(), credit_score_bounds)
+        return cls(credit_score_bounds=credit_score_bounds).update(df)
+
+    @property
+    def rows(self):
+        return int(self.cells['Count'].sum())
+
+    @property
+    def total_exited(self):
+        return int(self.cells['Exited'].sum())
+
+    def update(self, chunk):
+        """Add a chunk of customer rows (with CreditScoreCategory derived)"""
+        return self.merge(ChurnCube(cube_cells(chunk)))
+
+    def remove(self, chunk):
+        """Take a chunk of previously added rows out again; emptied cells are dropped"""
+        cells = cube_cells(chunk)
+        cells[CUBE_MEASURES] = -cells[CUBE_MEASURES]
+        self.merge(ChurnCube(cells))
+        self.cells = self.cells[self.cells['Count'] != 0].reset_index(drop=True)
+        return self
+
+    def merge(self, other):
+        """Combine another cube into this one"""
+        if len(self.cells) == 0:
+            self.cells = other.cells
+        else:
+            cells = pd.concat([self.cells, other.cells], ignore_index=True)
+            self.cells = cells.groupby(CUBE_DIMENSIONS, dropna=False, sort=False, observed=True)[CUBE_MEASURES].sum().reset_index()
+        return self
+
+    def slice(self, filters=None):
+        """Return the sub-cube whose dimensions take the given values
+
+        filters maps a dimension to a value or a list of allowed values.
+        """
+        if not filters:
+            return self
+        mask = np.ones(len(self.cells), dtype=bool)
+        for dim, allowed in filters.items():
+            if not isinstance(allowed, (list, tuple, set)):
+                allowed = [allowed]
+            mask &= self.cells[dim].isin(list(allowed)).to_numpy()
+        return ChurnCube(self.cells[mask], self.bounds)
+
+    def rollup(self, by):
+        """Sum the measures over every dimension not in by"""
+        by = [by] if isinstance(by, str) else list(by)
+        return self.cells.groupby(by, observed=True)[CUBE_MEASURES].sum()
+
+    def table(self, dim):
+        """Return Count, Exited, Balance sums and ChurnRate for every value of a dimension"""
+        result = self.rollup(dim)
+        if dim in CATEGORY_ORDER:
+            result = result.reindex([v for v in CATEGORY_ORDER[dim] if v in result.index])
+        result['ChurnRate'] = result['Exited'] / result['Count']
+        result.index.name = dim
+        return result
+
+    def churn_rate(self, dim):
+        """Return the churn rate per value, shaped like groupby(dim)['Exited'].mean()"""
+        return self.table(dim)['ChurnRate'].rename('Exited').reset_index()
+
+    def churn_counts(self, dim):
+        """Return stayed/churned customer counts per value in long format"""
+        table = self.table(dim)
+        counts = pd.DataFrame({0: table['Count'] - table['Exited'], 1: table['Exited']})
+        return counts.reset_index().melt(id_vars=dim, var_name='Exited', value_name='Count')
+
+    def average_balance(self, dim):
+        """Return the average balance per value and churn status"""
+        table = self.table(dim)
+        stayed = table['Count'] - table['Exited']
+        result = pd.DataFrame({
+            0: (table['Balance'] - table['BalanceExited']) / stayed.where(stayed > 0),
+            1: table['BalanceExited'] / table['Exited'].where(table['Exited'] > 0),
+        })
+        result.columns.name = 'Exited'
+        return result
+
+    def average_tenure(self):
+        """Return the average tenure of (stayed, churned) customers"""
+        # Tenure is a cube dimension, so all customers in a cell share one
+        # tenure and TenureSum splits exactly by the churned share of the cell
+        churned_sum = (self.cells['TenureSum'] * self.cells['Exited'] / self.cells['Count']).sum()
+        stayed_sum = self.cells['TenureSum'].sum() - churned_sum
+        exited = self.total_exited
+        stayed = self.rows - exited
+        return (stayed_sum / stayed if stayed else np.nan,
+                churned_sum / exited if exited else np.nan)
+
+    def overall_churn_rate(self):
+        return self.total_exited / self.rows if self.rows else np.nan
+
+    def save(self, path, version):
+        """Persist the cube cells with the source version they were built from"""
+        self.cells.to_feather(path)
+        with open(path + '.json', 'w') as f:
+            json.dump({'version': version, 'credit_score_bounds': list(self.bounds or [])}, f)
+
+    @classmethod
+    def load(cls, path, version=None):
+        """Load a persisted cube, or return None when missing or built from another version"""
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            if version is not None and meta['version'] != version:
+                return None
+            return cls(pd.read_feather(path), tuple(meta['credit_score_bounds']) or None)
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def build_cube(path=DATA_FILE, chunksize=DEFAULT_CHUNKSIZE, workers=1):
+    """Build the cube over a whole file in two chunked passes
+
+    The first pass finds the population-wide CreditScore fences, the second
+    fills the cube cells. With workers > 1 both passes run as a map-reduce
+    over a process pool (see parallel.run_parallel).
+    """
+    if workers != 1:
+        from parallel import run_parallel
+
+        return run_parallel(path, workers, chunksize=chunksize).cube
+
+    bounds = stream_aggregates(path, chunksize).credit_score_bounds()
+    cube = ChurnCube(credit_score_bounds=bounds)
+    for chunk in iter_chunks(path, chunksize):
+        cube.update(add_credit_score_category(chunk, bounds))
+    return cube
+
+
+def cube_path(path=DATA_FILE, cache_dir=CACHE_DIR):
+    """Path of the persisted cube of a source file"""
+    return os.path.splitext(cache_paths(path, cache_dir)[0])[0] + '.cube.arrow'
+
+
+def load_cube(path=DATA_FILE, cache_dir=CACHE_DIR, workers=1):
+    """Return the cube for a source file, rebuilding it only when the source changed"""
+    version = dataset_version(path, cache_dir)
+
+    cube = ChurnCube.load(cube_path(path, cache_dir), version)
+    if cube is None:
+        cube = build_cube(path, workers=workers)
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            cube.save(cube_path(path, cache_dir), version)
+        except (OSError, ImportError):
+            pass
+    return cube
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build (or refresh) the persisted churn cube for a data file')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the build (0: all cores)')
+    args = parser.parse_args()
+
+    cube = load_cube(args.path, workers=args.workers or None)
+    print(f'Cube ready: {len(cube.cells)} cells covering {cube.rows} customers')
@@ -0,0 +1,334 @@
+# Plotly figures of the dashboard, one builder per chart
+#
+# Kept free of Streamlit so the warm-start bundle (bundle.py) and the
+# benchmarks can build the same figures outside a Streamlit session.
+
+import pandas as pd
+
+from instrumentation import timed
+from intervals import CI_METHODS, churn_rate_intervals
+from moments import CoMoments, association_table
+
+EXITED_COLORS = {0: '#8fd9b6', 1: '#ff9999'}
+
+
+@timed()
+def create_correlation_heatmap(moments):
+    """Create correlation heatmap from the co-moments of the key features"""
+    import plotly.express as px
+
+    corr_matrix = moments.correlation()
+    
+    fig = px.imshow(corr_matrix, 
+                    text_auto=True, 
+                    aspect="auto",
+                    color_continuous_scale='RdBu',
+                    title="Correlation Matrix of Key Features")
+    fig.update_layout(width=800, height=600)
+    return fig
+
+
+@timed()
+def create_association_chart(associations):
+    """Create bar chart of every feature's association with churn"""
+    import plotly.express as px
+
+    fig = px.bar(associations.iloc[::-1], x='Association', y='Feature', color='Measure', orientation='h',
+                 title="Association with Churn (Cramér's V / Point-Biserial)",
+                 color_discrete_sequence=['#8fd9b6', '#ff9999'])
+    fig.update_layout(height=500)
+    return fig
+
+
+@timed()
+def create_age_group_churn(agg, ci_method='wilson'):
+    """Create age group churn analysis"""
+    import plotly.express as px
+
+    age_churn = churn_rate_intervals(agg, 'AgeGroup', ci_method)
+    
+    fig = px.bar(age_churn, x='AgeGroup', y='Exited', 
+                 error_y='ErrorPlus', error_y_minus='ErrorMinus',
+                 title='Churn Rate by Age Group',
+                 labels={'Exited': 'Churn Rate', 'AgeGroup': 'Age Group'},
+                 color='Exited',
+                 color_continuous_scale='Reds')
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+@timed()
+def create_gender_churn_pie(agg):
+    """Create gender churn pie chart"""
+    import plotly.express as px
+
+    gender_churn = agg.churn_rate('Gender')
+    
+    fig = px.pie(gender_churn, values='Exited', names='Gender',
+                 title='Churn Rate by Gender',
+                 color_discrete_sequence=['#8fd9b6', '#ff9999'])
+    return fig
+
+
+@timed()
+def create_geography_churn(agg, ci_method='wilson'):
+    """Create geography churn analysis"""
+    import plotly.express as px
+
+    geo_churn = churn_rate_intervals(agg, 'Geography', ci_method)
+    
+    fig = px.bar(geo_churn, x='Geography', y='Exited',
+                 error_y='ErrorPlus', error_y_minus='ErrorMinus',
+                 title='Churn Rate by Geography',
+                 labels={'Exited': 'Churn Rate'},
+                 color='Exited',
+                 color_continuous_scale='Blues')
+    fig.update_layout(showlegend=False)
+    return fig
+
+
+@timed()
+def create_balance_boxplot(df):
+    """Create balance distribution boxplot (statistics computed server-side)"""
+    from summary_charts import summarised_box
+
+    fig = summarised_box(df, x='Exited', y='Balance', colors=EXITED_COLORS)
+    fig.update_layout(title='Account Balance Distribution by Churn Status',
+                      xaxis_title='Customer Churned (0=No, 1=Yes)',
+                      yaxis_title='Account Balance',
+                      legend_title='Exited')
+    return fig
+
+
+@timed()
+def create_balance_histogram(df):
+    """Create balance histogram by churn status (bins computed server-side)"""
+    from summary_charts import summarised_histogram
+
+    fig = summarised_histogram(df, x='Balance', color='Exited',
+                               colors=EXITED_COLORS, names={0: 'Stayed', 1: 'Churned'})
+    fig.update_layout(title='Account Balance Histogram by Churn Status',
+                      xaxis_title='Account Balance', yaxis_title='Count')
+    return fig
+
+
+@timed()
+def create_products_analysis(agg, ci_method='wilson'):
+    """Create number of products analysis"""
+    import plotly.graph_objects as go
+    from plotly.subplots import make_subplots
+
+    product_churn = churn_rate_intervals(agg, 'NumOfProducts', ci_method)
+    product_count = agg.churn_counts('NumOfProducts')
+    
+    # Create subplots
+    fig = make_subplots(rows=1, cols=2, 
+                        subplot_titles=('Churn Rate by Number of Products', 
+                                      'Product Distribution by Churn Status'))
+    
+    # Churn rate plot
+    fig.add_trace(go.Bar(x=product_churn['NumOfProducts'], 
+                         y=product_churn['Exited'],
+                         error_y=dict(type='data', array=product_churn['ErrorPlus'],
+                                      arrayminus=product_churn['ErrorMinus']),
+                         name='Churn Rate',
+                         marker_color='lightcoral'), row=1, col=1)
+    
+    # Product distribution plot
+    for exit_status in [0, 1]:
+        data = product_count[product_count['Exited'] == exit_status]
+        fig.add_trace(go.Bar(x=data['NumOfProducts'], 
+                             y=data['Count'],
+                             name=f'{"Churned" if exit_status else "Stayed"}',
+                             marker_color='#ff9999' if exit_status else '#8fd9b6'), row=1, col=2)
+    
+    fig.update_layout(height=500, showlegend=True)
+    return fig
+
+
+@timed()
+def create_activity_analysis(agg):
+    """Create activity member analysis"""
+    import plotly.express as px
+
+    activity = agg.table('IsActiveMember')['ChurnRate']
+    credit_card = agg.table('HasCrCard')['ChurnRate']
+    engagement_data = {
+        'Active Members': activity.get(1, float('nan')),
+        'Inactive Members': activity.get(0, float('nan')),
+        'Credit Card Holders': credit_card.get(1, float('nan')),
+        'No Credit Card': credit_card.get(0, float('nan'))
+    }
+    
+    engagement_df = pd.DataFrame(list(engagement_data.items()), 
+                                columns=['Engagement_Type', 'Churn_Rate'])
+    engagement_df = engagement_df.sort_values('Churn_Rate', ascending=True)
+    
+    fig = px.bar(engagement_df, x='Churn_Rate', y='Engagement_Type',
+                 orientation='h',
+                 title='Churn Rate by Engagement Type',
+                 labels={'Churn_Rate': 'Churn Rate', 'Engagement_Type': 'Engagement Type'},
+                 color='Churn_Rate',
+                 color_continuous_scale='Viridis')
+    return fig
+
+
+@timed()
+def create_tenure_analysis(agg):
+    """Create tenure analysis"""
+    import plotly.express as px
+
+    tenure_churn = agg.churn_rate('Tenure')
+    
+    fig = px.line(tenure_churn, x='Tenure', y='Exited',
+                  title='Churn Rate by Tenure',
+                  labels={'Exited': 'Churn Rate', 'Tenure': 'Tenure (Years)'},
+                  markers=True,
+                  line_shape='linear')
+    fig.update_traces(line_color='red', marker_color='red')
+    return fig
+
+
+@timed()
+def create_credit_score_analysis(df, agg, ci_method='wilson'):
+    """Create credit score analysis"""
+    import plotly.express as px
+    from summary_charts import summarised_box
+
+    # Boxplot for credit scores
+    fig1 = summarised_box(df, y='CreditScore')
+    fig1.update_layout(title='Credit Score Distribution (Identifying Outliers)',
+                       yaxis_title='CreditScore', showlegend=False)
+    
+    # Churn rate by credit score category
+    credit_churn = churn_rate_intervals(agg, 'CreditScoreCategory', ci_method)
+    credit_churn = credit_churn.sort_values('Exited')
+    
+    fig2 = px.bar(credit_churn, x='CreditScoreCategory', y='Exited',
+                  error_y='ErrorPlus', error_y_minus='ErrorMinus',
+                  title='Churn Rate by Credit Score Category',
+                  labels={'Exited': 'Churn Rate', 'CreditScoreCategory': 'Credit Score Category'},
+                  color='Exited',
+                  color_continuous_scale='Reds')
+    
+    return fig1, fig2
+
+
+@timed()
+def create_score_histogram(scored):
+    """Create churn score histogram by actual churn status"""
+    from summary_charts import summarised_histogram
+
+    fig = summarised_histogram(scored, x='ChurnScore', color='Exited',
+                               colors=EXITED_COLORS, names={0: 'Stayed', 1: 'Churned'})
+    fig.update_layout(title='Churn Score Distribution by Actual Churn Status',
+                      xaxis_title='Predicted Churn Probability', yaxis_title='Count')
+    return fig
+
+
+@timed()
+def create_score_by_geography(scored):
+    """Create churn score box plot by geography"""
+    import plotly.express as px
+    from summary_charts import summarised_box
+
+    fig = summarised_box(scored, x='Geography', y='ChurnScore', colors=px.colors.qualitative.Set2)
+    fig.update_layout(title='Churn Score by Geography', showlegend=False,
+                      xaxis_title='Geography', yaxis_title='Predicted Churn Probability')
+    return fig
+
+
+@timed()
+def create_segment_chart(segments, baseline):
+    """Create bar chart of the top churn segments with their confidence intervals"""
+    import plotly.express as px
+
+    fig = px.bar(segments.iloc[::-1], x='ChurnRate', y='Segment', orientation='h',
+                 error_x=segments['Upper'].iloc[::-1] - segments['ChurnRate'].iloc[::-1],
+                 error_x_minus=segments['ChurnRate'].iloc[::-1] - segments['Lower'].iloc[::-1],
+                 title='Highest-Churn Segments', labels={'ChurnRate': 'Churn Rate', 'Segment': ''},
+                 color='Lift', color_continuous_scale='Reds', hover_data=['Customers', 'Lift'])
+    fig.add_vline(x=baseline, line_dash='dash', annotation_text='Overall churn rate')
+    fig.update_layout(height=max(400, 40 * len(segments)))
+    return fig
+
+
+@timed()
+def create_balance_products_analysis(agg):
+    """Create balance and products combined analysis"""
+    import plotly.express as px
+
+    # Average balance by number of products and churn status
+    pivot_data = agg.average_balance('NumOfProducts').reset_index()
+    pivot_data = pivot_data.melt(id_vars=['NumOfProducts'], 
+                                value_vars=[0, 1],
+                                var_name='Exited', value_name='Average_Balance')
+    pivot_data['Churn_Status'] = pivot_data['Exited'].map({0: 'Stayed', 1: 'Churned'})
+    
+    fig1 = px.bar(pivot_data, x='NumOfProducts', y='Average_Balance', 
+                  color='Churn_Status',
+                  title='Average Balance by Number of Products and Churn Status',
+                  labels={'Average_Balance': 'Average Balance', 'NumOfProducts': 'Number of Products'},
+                  color_discrete_sequence=['#8fd9b6', '#ff9999'],
+                  barmode='group')
+    
+    # Churn rate by zero balance status
+    zero_balance_churn = agg.churn_rate('ZeroBalance')
+    zero_balance_churn['Balance_Status'] = zero_balance_churn['ZeroBalance'].map({True: 'Zero Balance', False: 'Non-Zero Balance'})
+    
+    fig2 = px.bar(
+    zero_balance_churn,
+    x='Balance_Status',
+    y='Exited',
+    title='Churn Rate by Balance Status',
+    labels={'Exited': 'Churn Rate', 'Balance_Status': 'Balance Status'},
+    color='Balance_Status',
+    color_discrete_sequence=['#8fd9b6', '#ff9999']
+)
+    
+    return fig1, fig2
+
+
+@timed()
+def create_trend_chart(trends, dimension):
+    """Create line chart of the monthly churn rate of every value of a dimension"""
+    import plotly.express as px
+
+    data = trends[trends['Dimension'] == dimension]
+    fig = px.line(data, x='Month', y='ChurnRate', color='Value', markers=True,
+                  title=f'Monthly Churn Rate by {dimension}' if dimension != 'Overall' else 'Monthly Churn Rate',
+                  labels={'ChurnRate': 'Churn Rate', 'Value': dimension}, hover_data=['Count', 'ChurnRateChange'])
+    fig.update_layout(yaxis_tickformat='.0%', xaxis_type='category')
+    return fig
+
+
+@timed()
+def create_simulation_chart(result):
+    """Create overlaid histograms of the churned customers per trial, without and with the intervention"""
+    import plotly.graph_objects as go
+
+    fig = go.Figure()
+    fig.add_trace(go.Histogram(x=result.baseline_churned, name='Baseline', marker_color='#ff9999', opacity=0.6))
+    fig.add_trace(go.Histogram(x=result.scenario_churned, name='With intervention', marker_color='#8fd9b6',
+                               opacity=0.6))
+    fig.update_layout(barmode='overlay', title=f'Churned Customers over {result.trials:,} Trials',
+                      xaxis_title='Churned Customers', yaxis_title='Trials')
+    return fig
+
+
+def figure_key(builder, args):
+    """Name of a builder call in the warm-start bundle: the builder and its option arguments"""
+    return builder.__name__ + ''.join(f'[{arg}]' for arg in args if isinstance(arg, str))
+
+
+def default_figures(df, agg):
+    """Yield (key, figures) of every chart of the default view (the unfiltered sample)"""
+    moments = CoMoments.from_frame(df)
+    calls = [(create_correlation_heatmap, moments), (create_association_chart, association_table(agg, moments)),
+             (create_gender_churn_pie, agg), (create_balance_boxplot, df), (create_balance_histogram, df),
+             (create_activity_analysis, agg), (create_tenure_analysis, agg), (create_balance_products_analysis, agg)]
+    for ci_method in CI_METHODS:
+        calls += [(create_age_group_churn, agg, ci_method), (create_geography_churn, agg, ci_method),
+                  (create_products_analysis, agg, ci_method), (create_credit_score_analysis, df, agg, ci_method)]
+    for builder, *args in calls:
+        yield figure_key(builder, args), builder(*args)
@@ -0,0 +1,164 @@
+# Columnar on-disk cache for the Bank Churn workbook
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - pyarrow is optional, Excel still works
+    feather = None
+
+DATA_FILE = 'Bank_Churn.xlsx'
+CACHE_DIR = '.cache'
+
+
+def file_hash(path, block_size=1 << 20):
+    """Compute the SHA-256 digest of a file"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_paths(path, cache_dir=CACHE_DIR):
+    """Return the (data, metadata) cache file paths for a source file
+
+    The names carry a short hash of the absolute source path, so files of
+    the same name in different folders (e.g. monthly snapshots) get their
+    own cache.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stem += '-' + hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    return (os.path.join(cache_dir, f'{stem}.arrow'),
+            os.path.join(cache_dir, f'{stem}.meta.json'))
+
+
+def read_source(path):
+    """Read a source file straight from disk, based on its extension"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return pd.read_csv(path)
+    if ext == '.parquet':
+        return pd.read_parquet(path)
+    if ext in ('.arrow', '.feather'):
+        return pd.read_feather(path)
+    return pd.read_excel(path)
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    with open(meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+
+
+def cache_status(path=DATA_FILE, cache_dir=CACHE_DIR):
+    """Check the cache for a source file
+
+    Returns (is_valid, metadata). The cache is valid when the source mtime and
+    size are unchanged, or when they changed but the content hash did not
+    (e.g. the file was touched or copied). In the latter case the stored
+    mtime is refreshed so the next check is cheap again.
+    """
+    data_path, meta_path = cache_paths(path, cache_dir)
+    meta = _read_meta(meta_path)
+    if meta is None or not os.path.exists(data_path):
+        return False, None
+
+    stat = os.stat(path)
+    if meta['mtime'] == stat.st_mtime and meta['size'] == stat.st_size:
+        return True, meta
+
+    if meta['sha256'] != file_hash(path):
+        return False, meta
+
+    meta['mtime'] = stat.st_mtime
+    meta['size'] = stat.st_size
+    _write_meta(meta_path, meta)
+    return True, meta
+
+
+def build_cache(path=DATA_FILE, cache_dir=CACHE_DIR):
+    """Convert the source file into an uncompressed Arrow IPC file
+
+    Uncompressed Arrow IPC can be memory-mapped, so later reads do not need
+    to parse or decompress anything.
+    """
+    if feather is None:
+        raise ImportError('pyarrow is required to build the columnar cache')
+
+    os.makedirs(cache_dir, exist_ok=True)
+    data_path, meta_path = cache_paths(path, cache_dir)
+
+    df = read_source(path)
+    stat = os.stat(path)
+    tmp_path = data_path + '.tmp'
+    feather.write_feather(df, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, data_path)
+
+    meta = {
+        'source': os.path.abspath(path),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha256': file_hash(path),
+        'rows': len(df),
+    }
+    _write_meta(meta_path, meta)
+    return df, meta
+
+
+def dataset_version(path=DATA_FILE, cache_dir=CACHE_DIR):
+    """Return the content hash identifying the current version of the source"""
+    valid, meta = cache_status(path, cache_dir)
+    if valid:
+        return meta['sha256']
+    return file_hash(path)
+
+
+def load_raw_data(path=DATA_FILE, use_cache=True, cache_dir=CACHE_DIR, compact=False):
+    """Load the raw customer table, going through the columnar cache when possible
+
+    Falls back to reading the source directly when the cache is disabled,
+    pyarrow is not installed or the cache directory is not writable. With
+    compact=True the table comes back in the dtypes of schema.compact_frame,
+    converted straight from the Arrow cache.
+    """
+    from schema import compact_frame, compact_table
+
+    if not use_cache or feather is None:
+        df = read_source(path)
+        return compact_frame(df) if compact else df
+
+    try:
+        valid, _ = cache_status(path, cache_dir)
+        if valid:
+            data_path, _ = cache_paths(path, cache_dir)
+            table = feather.read_table(data_path, memory_map=True)
+            return compact_table(table) if compact else table.to_pandas()
+        df, _ = build_cache(path, cache_dir)
+        return compact_frame(df) if compact else df
+    except OSError:
+        df = read_source(path)
+        return compact_frame(df) if compact else df
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build the columnar cache for a churn data file')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--cache-dir', default=CACHE_DIR)
+    args = parser.parse_args()
+
+    _, meta = build_cache(args.path, args.cache_dir)
+    print(f"Cached {meta['rows']} rows from {args.path} ({meta['sha256'][:12]})")
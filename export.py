@@ -0,0 +1,187 @@
+# Streaming export of filtered customer subsets to CSV, Parquet or Excel
+#
+#   python export.py out.csv --filter Geography=Germany --filter IsActiveMember=0 --filter AgeGroup=46-60
+#
+# Rows are read, enriched, filtered and written one chunk at a time, so memory
+# stays bounded by the chunk size whatever the number of customers exported.
+
+import os
+import time
+
+import pandas as pd
+
+from data_cache import DATA_FILE
+from features import add_derived_columns
+from streaming import DEFAULT_CHUNKSIZE, iter_chunks
+
+EXPORT_FORMATS = ['csv', 'parquet', 'xlsx']
+EXCEL_MAX_ROWS = 1_048_575  # rows per worksheet, below the header
+
+
+def export_format(out):
+    """Export format of an output path, from its extension"""
+    fmt = os.path.splitext(out)[1].lower().lstrip('.')
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f'Unsupported export format: {out} (expected one of {", ".join(EXPORT_FORMATS)})')
+    return fmt
+
+
+def _filter_values(dtype, values):
+    """Filter values converted to a column dtype, so '1', 1 and 1.0 match a
+    numerical column alike whether it was read as integers or floats
+
+    Values that do not convert match nothing.
+    """
+    if isinstance(dtype, pd.CategoricalDtype):
+        return _filter_values(dtype.categories.dtype, values)
+    if pd.api.types.is_numeric_dtype(dtype):
+        return pd.to_numeric(pd.Series(list(values), dtype=object), errors='coerce').dropna().tolist()
+    return [str(value) for value in values]
+
+
+def select_rows(chunk, filters=None):
+    """Rows of a chunk matching the filters (column -> value or list of values)"""
+    mask = pd.Series(True, index=chunk.index)
+    for col, allowed in (filters or {}).items():
+        if not isinstance(allowed, (list, tuple, set)):
+            allowed = [allowed]
+        mask &= chunk[col].isin(_filter_values(chunk[col].dtype, allowed))
+    return chunk[mask]
+
+
+class _CsvWriter:
+    def __init__(self, out):
+        self.file = open(out, 'w', newline='', encoding='utf-8')
+        self.header = True
+
+    def write(self, chunk):
+        chunk.to_csv(self.file, header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, out):
+        self.out = out
+        self.writer = None
+
+    def write(self, chunk):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self.writer is None:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            self.writer = pq.ParquetWriter(self.out, table.schema)
+        else:
+            table = pa.Table.from_pandas(chunk, schema=self.writer.schema, preserve_index=False)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class _ExcelWriter:
+    """openpyxl write-only workbook: rows go straight to disk, a new sheet
+    starting whenever one is full"""
+
+    def __init__(self, out):
+        from openpyxl import Workbook
+
+        self.out = out
+        self.workbook = Workbook(write_only=True)
+        self.sheet = None
+        self.sheet_rows = 0
+
+    def write(self, chunk):
+        header = [str(col) for col in chunk.columns]
+        # Plain Python values: openpyxl cannot write numpy scalars or categoricals
+        rows = chunk.astype(object).where(chunk.notna(), None).itertuples(index=False, name=None)
+        for row in rows:
+            if self.sheet is None or self.sheet_rows == EXCEL_MAX_ROWS:
+                self.sheet = self.workbook.create_sheet(f'Customers {len(self.workbook.worksheets) + 1}')
+                self.sheet.append(header)
+                self.sheet_rows = 0
+            self.sheet.append([value.item() if hasattr(value, 'item') else value for value in row])
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.sheet is None:
+            self.workbook.create_sheet('Customers 1')
+        self.workbook.save(self.out)
+
+
+WRITERS = {'csv': _CsvWriter, 'parquet': _ParquetWriter, 'xlsx': _ExcelWriter}
+
+
+def export_chunks(chunks, out, filters=None, bounds=None, limit=None, fmt=None):
+    """Enrich, filter and write customer chunks to out; returns export statistics
+
+    bounds are the population-wide CreditScore fences used to derive
+    CreditScoreCategory (per-chunk fences would disagree between chunks).
+    limit stops after that many input rows, e.g. the dashboard sample.
+    The file is written under a temporary name and renamed when complete.
+    """
+    fmt = fmt or export_format(out)
+    tmp = f'{out}.{os.getpid()}.tmp'
+    writer = WRITERS[fmt](tmp)
+    start = time.perf_counter()
+    read = written = 0
+    try:
+        for chunk in chunks:
+            if limit is not None:
+                if read >= limit:
+                    break
+                chunk = chunk.head(limit - read)
+            read += len(chunk)
+            selected = select_rows(add_derived_columns(chunk.copy(), bounds), filters)
+            if len(selected):
+                writer.write(selected)
+                written += len(selected)
+        writer.close()
+        os.replace(tmp, out)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    seconds = time.perf_counter() - start
+    return {'path': out, 'format': fmt, 'rows_read': read, 'rows': written, 'seconds': seconds,
+            'rows_per_second': read / seconds if seconds else 0.0, 'bytes': os.path.getsize(out)}
+
+
+def export_file(path=DATA_FILE, out='customers.csv', filters=None, chunksize=DEFAULT_CHUNKSIZE, limit=None):
+    """Export the customers of a data file matching the filters, chunk by chunk"""
+    from cube import load_cube
+
+    bounds = load_cube(path).bounds
+    return export_chunks(iter_chunks(path, chunksize), out, filters, bounds, limit)
+
+
+def parse_filters(specs):
+    """Filters from COLUMN=VALUE[,VALUE...] strings"""
+    filters = {}
+    for spec in specs:
+        col, sep, values = spec.partition('=')
+        if not sep or not values:
+            raise ValueError(f'Filters look like COLUMN=VALUE[,VALUE...], got {spec!r}')
+        filters.setdefault(col, []).extend(values.split(','))
+    return filters
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Stream the customers matching filters to CSV, Parquet or Excel')
+    parser.add_argument('out', help=f'output file ({", ".join("." + fmt for fmt in EXPORT_FORMATS)})')
+    parser.add_argument('--path', default=DATA_FILE, help='data file (or directory of partitions)')
+    parser.add_argument('--filter', action='append', default=[], metavar='COLUMN=VALUE[,VALUE...]',
+                        help='keep rows with one of the values; repeat to combine columns')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument('--limit', type=int, help='only consider the first LIMIT rows')
+    args = parser.parse_args()
+
+    stats = export_file(args.path, args.out, parse_filters(args.filter), args.chunksize, args.limit)
+    print(f"Exported {stats['rows']:,} of {stats['rows_read']:,} customers to {stats['path']} "
+          f"({stats['bytes'] / 1024:,.1f} KiB) in {stats['seconds']:.2f} s, "
+          f"{stats['rows_per_second']:,.0f} rows/s")
@@ -0,0 +1,62 @@
+# Shared feature engineering for the churn analysis
+
+import numpy as np
+import pandas as pd
+
+SAMPLE_ROWS = 5000
+
+AGE_BINS = [18, 30, 45, 60, 92]
+AGE_LABELS = ['18-30', '31-45', '46-60', '60+']
+CREDIT_SCORE_CATEGORIES = ['Low', 'Normal', 'High']
+
+NUMERICAL_COLS = ['CreditScore', 'Age', 'Tenure', 'Balance', 'NumOfProducts', 'EstimatedSalary']
+CORRELATION_COLS = ['Age', 'Balance', 'IsActiveMember', 'NumOfProducts', 'CreditScore', 'Tenure', 'HasCrCard', 'EstimatedSalary', 'Exited']
+
+
+def iqr_bounds(q1, q3):
+    """Return the (lower, upper) outlier fences for the given quartiles"""
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def credit_score_bounds(df, mode='auto'):
+    """Return the IQR outlier fences for CreditScore
+
+    mode is one of quantiles.QUANTILE_MODES; approximate bounds come from a
+    KLL sketch instead of sorting the column.
+    """
+    from quantiles import KLLSketch, use_sketch
+
+    if use_sketch(mode, len(df)):
+        return KLLSketch.from_values(df['CreditScore']).iqr_bounds()
+    return iqr_bounds(df['CreditScore'].quantile(0.25), df['CreditScore'].quantile(0.75))
+
+
+def add_age_group(df):
+    """Add the AgeGroup column"""
+    df['AgeGroup'] = pd.cut(df['Age'], bins=AGE_BINS, labels=AGE_LABELS)
+    return df
+
+
+def add_credit_score_category(df, bounds=None, mode='auto'):
+    """Add the categorical CreditScoreCategory column (Low / Normal / High)"""
+    lower_bound, upper_bound = bounds if bounds is not None else credit_score_bounds(df, mode)
+
+    scores = df['CreditScore'].to_numpy()
+    codes = np.where(scores < lower_bound, 0, np.where(scores > upper_bound, 2, 1))
+    df['CreditScoreCategory'] = pd.Categorical.from_codes(codes, CREDIT_SCORE_CATEGORIES)
+    return df
+
+
+def add_zero_balance(df):
+    """Add the ZeroBalance indicator column"""
+    df['ZeroBalance'] = df['Balance'] == 0
+    return df
+
+
+def add_derived_columns(df, bounds=None, mode='auto'):
+    """Add AgeGroup, CreditScoreCategory and ZeroBalance to a customer table"""
+    add_age_group(df)
+    add_credit_score_category(df, bounds, mode)
+    add_zero_balance(df)
+    return df
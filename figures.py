@@ -0,0 +1,260 @@
+# Matplotlib figures of the churn report, one function per chart
+#
+# Every function takes the row-level sample, the churn aggregates and the
+# confidence-interval method and returns a new Figure, so the same charts can
+# be shown interactively (main.py) or rendered headless in parallel (report.py).
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+from intervals import churn_rate_intervals
+from moments import association_table
+
+
+def add_error_bars(ax, rates):
+    """Draw churn_rate_intervals() error bars over a categorical bar plot"""
+    ax.errorbar(range(len(rates)), rates['Exited'], yerr=[rates['ErrorMinus'], rates['ErrorPlus']],
+                fmt='none', ecolor='black', capsize=4)
+
+
+# ! Correlation matrix to identify relationships between features
+
+def plot_correlation_matrix(df, agg, ci_method='wilson'):
+    fig = plt.figure(figsize=(8, 6))
+    sns.heatmap(agg.correlation(), annot=True, cmap='coolwarm')
+    plt.title('Correlation Matrix')
+    plt.tight_layout()
+    return fig
+
+
+def plot_associations(df, agg, ci_method='wilson'):
+    associations = association_table(agg)
+    fig = plt.figure(figsize=(8, 6))
+    sns.barplot(x='Association', y='Feature', hue='Measure', data=associations, palette='Set2', dodge=False)
+    plt.axvline(0, color='black', linewidth=0.8)
+    plt.title("Association with Churn (Cramér's V / Point-Biserial)")
+    plt.xlabel('Association with Exited')
+    plt.ylabel('')
+    plt.tight_layout()
+    return fig
+
+
+# ! Objective 1: Explore how customer background affects churn
+
+def plot_age_group_churn(df, agg, ci_method='wilson'):
+    age_churn = churn_rate_intervals(agg, 'AgeGroup', ci_method)
+    fig = plt.figure(figsize=(8, 6))
+    sns.barplot(x='AgeGroup', y='Exited', hue='AgeGroup', data=age_churn, palette='Set2')
+    add_error_bars(plt.gca(), age_churn)
+    plt.title('Churn Rate by Age Group')
+    plt.xlabel('Age Group')
+    plt.ylabel('Churn Rate')
+    return fig
+
+
+def plot_gender_churn(df, agg, ci_method='wilson'):
+    gender_churn = agg.churn_rate('Gender').set_index('Gender')['Exited']
+    fig = plt.figure(figsize=(8, 6))
+    plt.pie(
+        gender_churn,
+        labels=gender_churn.index,
+        autopct='%1.1f%%',
+        colors=['#8fd9b6', '#ff9999'],
+        startangle=90,
+        explode=(0.05, 0.05),
+        textprops={'fontsize': 12}
+    )
+    plt.title('Churn Rate by Gender', fontsize=24, fontweight='bold', color='black')
+    return fig
+
+
+def plot_geography_churn(df, agg, ci_method='wilson'):
+    geo_churn = churn_rate_intervals(agg, 'Geography', ci_method)
+    fig = plt.figure(figsize=(8, 6))
+    sns.barplot(x='Geography', y='Exited', hue='Geography', data=geo_churn, palette='Set2')
+    add_error_bars(plt.gca(), geo_churn)
+    plt.title('Churn Rate by Geography')
+    plt.xlabel('Geography')
+    plt.ylabel('Churn Rate')
+    return fig
+
+
+# ! Objective 2: Look into financial habits and their impact
+
+def plot_balance_boxplot(df, agg, ci_method='wilson'):
+    fig = plt.figure(figsize=(8, 6))
+    sns.boxplot(x="Exited", y="Balance", hue="Exited", data=df, palette="Pastel1")
+    plt.title("Account Balance Distribution by Exit/Churn Status")
+    plt.xlabel('Customer Churned (0=No, 1=Yes)')
+    plt.ylabel('Account Balance')
+    plt.tight_layout()
+    return fig
+
+
+def plot_products_churn(df, agg, ci_method='wilson'):
+    fig, axes = plt.subplots(1, 2, figsize=(12, 6))
+
+    ## ? Churn Rate by Number of Products
+    product_churn = agg.churn_rate('NumOfProducts')
+    sns.barplot(ax=axes[0], x='NumOfProducts', y='Exited', hue='Exited', data=product_churn, palette='Pastel1', legend=False)
+    axes[0].set_title('Churn Rate by Number of Products')
+    axes[0].set_xlabel('Number of Products')
+    axes[0].set_ylabel('Churn Rate')
+
+    for index, row in product_churn.iterrows():
+        axes[0].text(row['NumOfProducts'] - 1, row['Exited'] + 0.02, f"{row['Exited']:.2f}", ha='center', va='bottom', fontsize=10)
+
+    ## ? Distribution of products by churn status
+    product_count = agg.churn_counts('NumOfProducts')
+    sns.barplot(ax=axes[1], x='NumOfProducts', y='Count', hue='Exited', data=product_count, palette='Pastel1')
+    axes[1].set_title('Number of Products Distribution by Churn Status')
+    axes[1].set_xlabel('Number of Products')
+    axes[1].set_ylabel('Count')
+    axes[1].legend(title='Churned', labels=['No', 'Yes'])
+
+    plt.tight_layout()
+    return fig
+
+
+# ! Objective 3: Examine engagement levels
+
+def churn_pie(stayed, churned):
+    """Stayed/churned pie of one group, or a note when the group has no customers"""
+    if stayed + churned == 0:
+        plt.text(0.5, 0.5, 'No customers', ha='center', va='center')
+        plt.axis('off')
+        return
+    plt.pie([stayed, churned], labels=['Stayed', 'Churned'], autopct='%1.1f%%', colors=['#8fd9b6', '#ff9999'], startangle=90, explode=(0.05, 0.05))
+
+
+def plot_activity_churn(df, agg, ci_method='wilson'):
+    # Filters can leave no active or no inactive customers
+    activity = agg.table('IsActiveMember').reindex([0, 1], fill_value=0)
+    fig = plt.figure()
+
+    plt.subplot(1, 2, 1)
+    churn_pie(activity.loc[1, 'Count'] - activity.loc[1, 'Exited'], activity.loc[1, 'Exited'])
+    plt.title('Active Members Churn Rate')
+
+    plt.subplot(1, 2, 2)
+    churn_pie(activity.loc[0, 'Count'] - activity.loc[0, 'Exited'], activity.loc[0, 'Exited'])
+    plt.title('Inactive Members Churn Rate')
+
+    plt.suptitle('Churn Rate by Activity Status', fontsize=24, fontweight='bold', color='black')
+    plt.tight_layout()
+    return fig
+
+
+def plot_engagement_churn(df, agg, ci_method='wilson'):
+    activity = agg.table('IsActiveMember').reindex([0, 1])
+    credit_card = agg.table('HasCrCard').reindex([0, 1])
+
+    engagement_churn = pd.DataFrame({
+        'Active Members': [activity.loc[1, 'ChurnRate']],
+        'Inactive Members': [activity.loc[0, 'ChurnRate']],
+        'Credit Card Holders': [credit_card.loc[1, 'ChurnRate']],
+        'No Credit Card': [credit_card.loc[0, 'ChurnRate']]
+    })
+    engagement_churn = engagement_churn.T
+    engagement_churn.columns = ['Churn Rate']
+    engagement_churn = engagement_churn.sort_values('Churn Rate', ascending=False)
+
+    fig, ax = plt.subplots()
+    engagement_churn.plot(kind='barh', color=sns.color_palette('viridis', 4), ax=ax)
+
+    plt.title('Churn Rate by Engagement Type', fontsize=14)
+    plt.xlabel('Churn Rate (Proportion)', fontsize=10)
+
+    for i, v in enumerate(engagement_churn['Churn Rate']):
+        plt.text(v + 0.005, i, f'{v:.2%}', va='center', fontweight='bold')
+
+    plt.tight_layout()
+    return fig
+
+
+# ! Objective 4: Investigate the impact of customer tenure on churn
+
+def plot_tenure_churn(df, agg, ci_method='wilson'):
+    tenure_churn_rate = agg.churn_rate("Tenure")
+    fig = plt.figure(figsize=(10, 6))
+    sns.lineplot(data=tenure_churn_rate, x="Tenure", y="Exited", marker="o", color="red")
+    plt.title("Churn Rate by Tenure")
+    plt.xlabel("Tenure (Years)")
+    plt.ylabel("Churn Rate")
+    plt.grid(True)
+    plt.tight_layout()
+    return fig
+
+
+# ! Objective 5: Spot unusual credit behaviors
+
+def plot_credit_score_analysis(df, agg, ci_method='wilson'):
+    credit_churn = churn_rate_intervals(agg, 'CreditScoreCategory', ci_method)
+    credit_churn = credit_churn.set_index('CreditScoreCategory').reindex(['Low', 'Normal', 'High']).reset_index()
+
+    fig = plt.figure(figsize=(12, 5))
+
+    ## ? Subplot 1: Box Plot for CreditScore to Spot Outliers
+    plt.subplot(1, 2, 1)
+    sns.boxplot(y='CreditScore', data=df, color='skyblue')
+    plt.title('Box Plot of Credit Scores\n(Identifying Outliers)')
+    plt.ylabel('Credit Score')
+
+    ## ? Subplot 2: Bar Plot for Churn Rate by CreditScore Category
+    plt.subplot(1, 2, 2)
+    sns.barplot(x='CreditScoreCategory', y='Exited', data=credit_churn, hue='CreditScoreCategory',
+                palette='pastel', order=['Low', 'Normal', 'High'])
+    add_error_bars(plt.gca(), credit_churn)
+    plt.title('Churn Rate by Credit Score Category')
+    plt.xlabel('Credit Score Category')
+    plt.ylabel('Churn Rate')
+
+    plt.tight_layout()
+    return fig
+
+
+# ! Objective 6: Balance, number of products and churn
+
+def plot_balance_products_analysis(df, agg, ci_method='wilson'):
+    fig, axes = plt.subplots(1, 2, figsize=(12, 6))
+
+    ## ? Plot 1: Average Balance by Number of Products and Churn Status
+    pivot_data = agg.average_balance('NumOfProducts')
+    pivot_data.columns = ['Stayed', 'Churned']
+    pivot_data.plot(kind='bar', color=['#8fd9b6', '#ff9999'], ax=axes[0])
+
+    axes[0].set_title('Average Balance by Number of Products and Churn Status')
+    axes[0].set_xlabel('Number of Products')
+    axes[0].set_ylabel('Average Balance')
+    axes[0].legend(title='Churn Status', loc='upper center')
+
+    ## ? Plot 2: Churn Rate by Zero Balance Status
+    zero_balance_churn = agg.churn_rate('ZeroBalance')
+    sns.barplot(x='Exited', y='ZeroBalance', hue='ZeroBalance', data=zero_balance_churn, palette='Set2', orient='h', ax=axes[1])
+
+    axes[1].set_title('Churn Rate by Zero Balance Status')
+    axes[1].set_ylabel('Balance Status')
+    axes[1].set_xlabel('Churn Rate')
+    axes[1].set_yticks([0, 1])
+    axes[1].set_yticklabels(['Non-Zero Balance', 'Zero Balance'])
+
+    plt.tight_layout()
+    return fig
+
+
+# Report order: (name, title, builder)
+FIGURES = [
+    ('correlation_matrix', 'Correlation Matrix', plot_correlation_matrix),
+    ('associations', 'Association with Churn', plot_associations),
+    ('age_group_churn', 'Churn Rate by Age Group', plot_age_group_churn),
+    ('gender_churn', 'Churn Rate by Gender', plot_gender_churn),
+    ('geography_churn', 'Churn Rate by Geography', plot_geography_churn),
+    ('balance_boxplot', 'Account Balance by Churn Status', plot_balance_boxplot),
+    ('products_churn', 'Churn by Number of Products', plot_products_churn),
+    ('activity_churn', 'Churn Rate by Activity Status', plot_activity_churn),
+    ('engagement_churn', 'Churn Rate by Engagement Type', plot_engagement_churn),
+    ('tenure_churn', 'Churn Rate by Tenure', plot_tenure_churn),
+    ('credit_score_analysis', 'Credit Score Outliers and Churn', plot_credit_score_analysis),
+    ('balance_products_analysis', 'Balance, Products and Churn', plot_balance_products_analysis),
+]
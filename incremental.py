@@ -0,0 +1,308 @@
+# Incremental refresh of the customer table and its aggregates from daily
+# delta files keyed by CustomerId
+#
+#   python incremental.py --add deltas-2026-10-17.csv     (queue a delta file)
+#   python incremental.py [path] --verify                 (apply all, check against a rebuild)
+#
+# Delta files sit in <data file stem>.deltas/ next to the data file and are
+# applied in name order. A delta row carries a CustomerId, an optional Action
+# column ('upsert' by default, or 'delete') and the columns to set: unknown
+# customers are inserted (every column required), known ones are updated
+# with the non-missing values of the row, so a delta may carry only Exited
+# or Balance.
+
+import hashlib
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from aggregates import ChurnAggregates
+from cube import CUBE_DIMENSIONS, ChurnCube
+from data_cache import DATA_FILE, dataset_version, load_raw_data, read_source
+from features import SAMPLE_ROWS, add_derived_columns
+from quantiles import OrderStatistics
+from schema import compact_frame
+from shared_store import snapshot
+
+KEY = 'CustomerId'
+ACTION = 'Action'
+DELTA_EXTENSIONS = ('.csv', '.parquet', '.arrow', '.feather', '.xlsx')
+
+
+def delta_dir(path=DATA_FILE):
+    """Directory holding the delta files of a data file"""
+    return os.path.splitext(path)[0] + '.deltas'
+
+
+def delta_files(path=DATA_FILE):
+    """Delta files of a data file, in the order they are applied"""
+    directory = delta_dir(path)
+    if not os.path.isdir(directory):
+        return []
+    return [os.path.join(directory, name) for name in sorted(os.listdir(directory))
+            if name.lower().endswith(DELTA_EXTENSIONS)]
+
+
+def delta_version(path=DATA_FILE, base_version=None):
+    """Version of a data file with its deltas: the base content hash, extended
+    by the name, size and mtime of every delta file (no delta is read)"""
+    base_version = base_version or dataset_version(path)
+    files = delta_files(path)
+    if not files:
+        return base_version
+    digest = hashlib.sha256(base_version.encode())
+    for file in files:
+        stat = os.stat(file)
+        digest.update(f'{os.path.basename(file)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+class CustomerStore:
+    """The enriched customer table with aggregates maintained by delta
+
+    Every structure is updated by taking the old version of the changed rows
+    out and adding the new one: the group counts and balance sums
+    (ChurnAggregates), the churn cube, the correlation co-moments and the
+    sorted numerical columns (OrderStatistics) that give the exact outlier
+    fences and counts. CreditScoreCategory depends on the population-wide
+    CreditScore fences: when a delta moves them the derived column and the
+    cube are rebuilt from the table.
+
+    Row changes never copy the table: updated rows are overwritten in place
+    (only the columns that changed), deleted rows are marked dead and
+    inserted rows collected in a side table, both folded in when the table
+    is next read.
+    """
+
+    def __init__(self, table, path=None, base_version=None):
+        self.path = path
+        self.base_version = base_version
+        self.applied = []
+        self.lock = threading.RLock()
+        self._base = table.set_index(KEY, drop=False)
+        self._base.index.name = None
+        self._clear_pending()
+        self.columns = [col for col in table.columns if col not in ('AgeGroup', 'CreditScoreCategory', 'ZeroBalance')]
+        self.aggregates = ChurnAggregates.from_frame(self._base)
+        self.order = OrderStatistics.from_frame(self._base)
+        self.rebuild()
+
+    @classmethod
+    def from_source(cls, path=DATA_FILE):
+        """Load a data file and apply all of its deltas"""
+        store = cls(load_raw_data(path), path, dataset_version(path))
+        store.refresh()
+        return store
+
+    @property
+    def table(self):
+        """The customer table indexed by CustomerId, as a snapshot: rows
+        changed later are copied away from it, not written through"""
+        with self.lock:
+            self._compact()
+            return snapshot(self._base)
+
+    @property
+    def rows(self):
+        return len(self._base) - self._deleted + len(self._inserted)
+
+    @property
+    def version(self):
+        return delta_version(self.path, self.base_version)
+
+    def rebuild(self):
+        """Recompute the fence-dependent structures from the table"""
+        self.bounds = self.aggregates.credit_score_bounds()
+        self._compact()
+        add_derived_columns(self._base, self.bounds)
+        self.cube = ChurnCube.from_frame(self._base, self.bounds)
+        self._refence()
+
+    def _refence(self):
+        self.fences = self.order.bounds()
+        self.outlier_counts = self.order.outlier_counts(self.fences)
+
+    def _compact(self):
+        """Fold the dead rows and the inserted side table into the base table"""
+        if self._deleted or len(self._inserted):
+            self._base = pd.concat([self._base[self._live], self._inserted])
+            self._clear_pending()
+
+    def _clear_pending(self):
+        self._live = np.ones(len(self._base), dtype=bool)
+        self._deleted = 0
+        self._inserted = self._base.iloc[:0].copy()
+
+    def _locate(self, ids):
+        """Positions of live customers in the base table (-1 elsewhere) and
+        which customers sit in the inserted side table"""
+        pending = ids.isin(self._inserted.index)
+        positions = self._base.index.get_indexer(ids)
+        positions[pending] = -1
+        found = np.flatnonzero(positions >= 0)
+        positions[found[~self._live[positions[found]]]] = -1
+        return positions, pending
+
+    def sample(self, rows=SAMPLE_ROWS, mode='auto'):
+        """The first rows in compact dtypes, enriched as the dashboard enriches its sample"""
+        with self.lock:
+            df = compact_frame(self.table[self.columns].head(rows)).reset_index(drop=True)
+        return add_derived_columns(df, mode=mode)
+
+    def population_cube(self):
+        """The full-population cube as of now (apply() never mutates cells in place)"""
+        with self.lock:
+            return ChurnCube(self.cube.cells, self.cube.bounds)
+
+    def outliers(self):
+        """Outlier table shaped like DatasetProfile.outliers"""
+        return pd.DataFrame([(col, self.outlier_counts[col], lower, upper)
+                             for col, (lower, upper) in self.fences.items()],
+                            columns=['Column', 'Outlier_Count', 'Lower_Bound', 'Upper_Bound'])
+
+    def _prepare(self, delta):
+        """Split a delta into the old and new versions of the changed rows"""
+        if KEY not in delta:
+            raise ValueError(f'Delta rows need a {KEY} column')
+        delta = delta.drop_duplicates(KEY, keep='last')
+        actions = delta[ACTION].fillna('upsert').str.lower() if ACTION in delta else pd.Series('upsert', delta.index)
+        unknown = set(actions) - {'upsert', 'delete'}
+        if unknown:
+            raise ValueError(f'Unknown delta action(s): {", ".join(sorted(unknown))} (expected upsert or delete)')
+
+        rows = delta.drop(columns=[ACTION], errors='ignore').set_index(KEY, drop=False)
+        rows.index.name = None
+        positions, pending = self._locate(rows.index)
+        known = (positions >= 0) | pending
+        deleted = rows.index[(actions == 'delete').to_numpy() & known]
+        updates = rows[(actions == 'upsert').to_numpy() & known]
+        inserts = rows[(actions == 'upsert').to_numpy() & ~known]
+
+        missing = [col for col in self.columns if col not in inserts or inserts[col].isna().any()]
+        if len(inserts) and missing:
+            raise ValueError(f'Inserted customers need every column (missing: {", ".join(missing)})')
+
+        old = pd.concat([self._base.iloc[positions[positions >= 0]], self._inserted.loc[rows.index[pending]]])
+        updated = updates.reindex(columns=self.columns).combine_first(old.loc[updates.index, self.columns])
+        new = pd.concat([updated, inserts.reindex(columns=self.columns)])
+        new = new.astype({col: self._base[col].dtype for col in self.columns}, errors='ignore')
+        add_derived_columns(new, self.bounds)
+        return old, new, deleted, updates.index, inserts.index
+
+    def _write(self, old, new, deleted, updated, inserted):
+        """Change the rows of the table without copying it"""
+        positions, pending = self._locate(deleted)
+        self._live[positions[positions >= 0]] = False
+        self._deleted += int(np.count_nonzero(positions >= 0))
+        self._inserted = self._inserted.drop(index=deleted[pending])
+
+        positions, pending = self._locate(updated)
+        in_base = positions >= 0
+        changed = [col for col in new.columns if not new.loc[updated, col].equals(old.loc[updated, col])]
+        for col in changed:
+            values = new.loc[updated, col].to_numpy()
+            self._base.iloc[positions[in_base], self._base.columns.get_loc(col)] = values[in_base]
+        if pending.any():
+            self._inserted.loc[updated[pending], changed] = new.loc[updated[pending], changed]
+
+        if len(inserted):
+            self._inserted = pd.concat([self._inserted, new.loc[inserted]])
+
+    def apply(self, delta):
+        """Apply one delta DataFrame; returns what changed"""
+        with self.lock:
+            old, new, deleted, updated, inserted = self._prepare(delta)
+
+            self.aggregates.remove(old).update(new)
+            self.cube.remove(old).update(new)
+            self.order.remove(old).update(new)
+            self._write(old, new, deleted, updated, inserted)
+
+            # Moved CreditScore fences re-derive the categories and the cube;
+            # the outlier fences and counts are read off the sorted columns
+            rebuilt = self.aggregates.credit_score_bounds() != self.bounds
+            if rebuilt:
+                self.rebuild()
+            else:
+                self._refence()
+        return {'inserted': len(inserted), 'updated': len(updated), 'deleted': len(deleted), 'rebuilt': rebuilt}
+
+    def refresh(self):
+        """Apply the delta files that appeared since the last call
+
+        A changed base file (or a rewritten delta) means a full reload.
+        Returns the per-file results of the deltas applied.
+        """
+        with self.lock:
+            if self.path is None:
+                return []
+            files = delta_files(self.path)
+            if dataset_version(self.path) != self.base_version or files[:len(self.applied)] != self.applied:
+                fresh = CustomerStore(load_raw_data(self.path), self.path, dataset_version(self.path))
+                self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k != 'lock'})
+            results = []
+            for file in files[len(self.applied):]:
+                results.append((os.path.basename(file), self.apply(read_source(file))))
+                self.applied.append(file)
+            return results
+
+    def verify(self):
+        """Compare every maintained structure with a rebuild from the table;
+        returns the list of mismatches"""
+        fresh = CustomerStore(self.table.reset_index(drop=True)[self.columns])
+        failures = []
+        for dim in CUBE_DIMENSIONS:
+            try:
+                pd.testing.assert_frame_equal(self.aggregates.table(dim), fresh.aggregates.table(dim), check_dtype=False)
+                pd.testing.assert_frame_equal(self.cube.table(dim), fresh.cube.table(dim), check_dtype=False)
+            except AssertionError as e:
+                failures.append((dim, str(e).splitlines()[0]))
+        if not np.allclose(self.aggregates.correlation(), fresh.aggregates.correlation(), atol=1e-9, equal_nan=True):
+            failures.append(('correlation', 'co-moments differ'))
+        if self.fences != fresh.fences:
+            failures.append(('fences', f'{self.fences} != {fresh.fences}'))
+        if self.outlier_counts != fresh.outlier_counts:
+            failures.append(('outliers', f'{self.outlier_counts} != {fresh.outlier_counts}'))
+        return failures
+
+
+def add_delta(file, path=DATA_FILE):
+    """Queue a delta file for a data file (copied atomically into its delta directory)"""
+    directory = delta_dir(path)
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, os.path.basename(file))
+    tmp = target + '.tmp'
+    shutil.copyfile(file, tmp)
+    os.replace(tmp, target)
+    return target
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Apply customer delta files incrementally')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--add', metavar='FILE', help='queue a delta file for the data file')
+    parser.add_argument('--verify', action='store_true', help='check the maintained aggregates against a rebuild')
+    args = parser.parse_args()
+
+    if args.add:
+        print(f'Queued {add_delta(args.add, args.path)}')
+
+    start = time.perf_counter()
+    store = CustomerStore(load_raw_data(args.path), args.path, dataset_version(args.path))
+    loaded = time.perf_counter()
+    for name, result in store.refresh():
+        print(f'{name}: {result}')
+    applied = time.perf_counter()
+    print(f'{store.rows:,} customers, version {store.version[:12]}; '
+          f'load {loaded - start:.3f} s, deltas {applied - loaded:.3f} s')
+    if args.verify:
+        failures = store.verify()
+        for check, error in failures:
+            print(f'MISMATCH {check}: {error}')
+        print('Verified: aggregates match a rebuild' if not failures else f'{len(failures)} mismatches')
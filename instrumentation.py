@@ -0,0 +1,212 @@
+# Stage-level timing: wall time, CPU time and peak memory per named stage,
+# exported as JSON or Prometheus text
+#
+# Recording is off unless CHURN_TIMINGS=1 is set or a block runs inside
+# TIMINGS.recording(); while off, stage() hands back a shared no-op context
+# and @timed functions are called straight through. Peak memory comes from
+# tracemalloc, which slows allocation-heavy code noticeably, so it is only
+# tracked after set_memory(True).
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+METRIC_PREFIX = 'churn_stage'
+RECENT_EVENTS = 1000
+
+_NOOP = nullcontext()
+
+
+class StageStats:
+    """Running totals of one stage"""
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.max_wall_seconds = 0.0
+        self.last_wall_seconds = 0.0
+        self.peak_bytes = None
+
+    def add(self, wall, cpu, peak):
+        self.calls += 1
+        self.wall_seconds += wall
+        self.cpu_seconds += cpu
+        self.max_wall_seconds = max(self.max_wall_seconds, wall)
+        self.last_wall_seconds = wall
+        if peak is not None:
+            self.peak_bytes = max(self.peak_bytes or 0, peak)
+
+    def to_dict(self):
+        return {
+            'calls': self.calls, 'wall_seconds': self.wall_seconds, 'cpu_seconds': self.cpu_seconds,
+            'mean_wall_seconds': self.wall_seconds / self.calls if self.calls else 0.0,
+            'max_wall_seconds': self.max_wall_seconds, 'last_wall_seconds': self.last_wall_seconds,
+            'peak_bytes': self.peak_bytes,
+        }
+
+
+class _Frame:
+    __slots__ = ('start_bytes', 'peak_bytes')
+
+    def __init__(self, start_bytes):
+        self.start_bytes = start_bytes
+        self.peak_bytes = start_bytes
+
+
+class StageTimings:
+    """Process-wide store of stage measurements
+
+    Totals are shared by every thread (and so every dashboard session);
+    whether a thread records, its open stages and the events of its current
+    recording() block are per thread. CPU time is the thread's own.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.memory = False
+        self.stats = {}
+        self.events = deque(maxlen=RECENT_EVENTS)
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self._started_tracemalloc = False
+
+    def active(self):
+        return self.enabled or getattr(self.local, 'recording', False)
+
+    def set_memory(self, enabled):
+        """Track peak memory per stage (starts tracemalloc if nobody else has)"""
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        elif not enabled and self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+        self.memory = enabled
+
+    @contextmanager
+    def recording(self):
+        """Record every stage run by this thread inside the block; yields the
+        list of (stage, wall, cpu, peak) events recorded"""
+        previous = getattr(self.local, 'recording', False)
+        events = self.local.run = []
+        self.local.recording = True
+        try:
+            yield events
+        finally:
+            self.local.recording = previous
+
+    def stage(self, name):
+        """Context manager measuring one run of a stage"""
+        if not self.active():
+            return _NOOP
+        return self._measure(name)
+
+    @contextmanager
+    def _measure(self, name):
+        frames = self.local.__dict__.setdefault('frames', [])
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            self._close_peak(frames)
+            frames.append(_Frame(tracemalloc.get_traced_memory()[0]))
+        wall, cpu = time.perf_counter(), time.thread_time()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.thread_time() - cpu
+            peak = None
+            if memory:
+                self._close_peak(frames)
+                frame = frames.pop()
+                if frames:
+                    frames[-1].peak_bytes = max(frames[-1].peak_bytes, frame.peak_bytes)
+                peak = frame.peak_bytes - frame.start_bytes
+            # Failed runs are not recorded, so bad requests cannot add stages
+            if not failed:
+                self.record(name, wall, cpu, peak)
+
+    @staticmethod
+    def _close_peak(frames):
+        """Fold the traced peak since the last reset into the innermost open stage"""
+        if frames:
+            frames[-1].peak_bytes = max(frames[-1].peak_bytes, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+
+    def record(self, name, wall, cpu, peak=None):
+        event = (name, wall, cpu, peak)
+        with self.lock:
+            self.stats.setdefault(name, StageStats()).add(wall, cpu, peak)
+            self.events.append(event)
+        run = getattr(self.local, 'run', None)
+        if run is not None and getattr(self.local, 'recording', False):
+            run.append(event)
+
+    def reset(self):
+        with self.lock:
+            self.stats.clear()
+            self.events.clear()
+
+    def snapshot(self):
+        """Totals per stage, as plain dicts sorted by stage name"""
+        with self.lock:
+            return {name: stats.to_dict() for name, stats in sorted(self.stats.items())}
+
+    def to_json(self, indent=2):
+        return json.dumps({'timestamp': time.time(), 'stages': self.snapshot()}, indent=indent)
+
+    def to_prometheus(self, prefix=METRIC_PREFIX):
+        """Totals in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        metrics = [
+            ('calls_total', 'counter', 'Runs of the stage', 'calls'),
+            ('wall_seconds_total', 'counter', 'Wall-clock seconds spent in the stage', 'wall_seconds'),
+            ('cpu_seconds_total', 'counter', 'CPU seconds of the running thread spent in the stage', 'cpu_seconds'),
+            ('wall_seconds_max', 'gauge', 'Slowest run of the stage in seconds', 'max_wall_seconds'),
+            ('wall_seconds_last', 'gauge', 'Latest run of the stage in seconds', 'last_wall_seconds'),
+            ('peak_memory_bytes', 'gauge', 'Largest traced allocation peak of the stage', 'peak_bytes'),
+        ]
+        lines = []
+        for suffix, kind, help_text, key in metrics:
+            samples = [(name, stats[key]) for name, stats in snapshot.items() if stats[key] is not None]
+            if not samples:
+                continue
+            lines += [f'# HELP {prefix}_{suffix} {help_text}', f'# TYPE {prefix}_{suffix} {kind}']
+            lines += [f'{prefix}_{suffix}{{stage="{_escape_label(name)}"}} {value:.9g}' for name, value in samples]
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """Write the metrics atomically (e.g. for the node_exporter textfile collector)"""
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp, path)
+
+
+def _escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+TIMINGS = StageTimings(enabled=os.environ.get('CHURN_TIMINGS', '') not in ('', '0'))
+
+
+def timed(name=None, timings=TIMINGS):
+    """Decorator recording every call of a function as a stage (by default
+    named after the function)"""
+    def decorate(func):
+        stage = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not timings.active():
+                return func(*args, **kwargs)
+            with timings._measure(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
@@ -0,0 +1,82 @@
+# Confidence intervals for churn rates computed from group counts
+
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+
+CI_METHODS = ['wilson', 'normal', 'bootstrap']
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_BOOTSTRAP_SAMPLES = 1000
+
+
+def _z(confidence):
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_interval(successes, n, confidence=DEFAULT_CONFIDENCE):
+    """Wilson score interval for binomial proportions (vectorized)"""
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    z = _z(confidence)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = successes / n
+        denom = 1 + z ** 2 / n
+        centre = (p + z ** 2 / (2 * n)) / denom
+        half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denom
+    return centre - half, centre + half
+
+
+def normal_interval(successes, n, confidence=DEFAULT_CONFIDENCE):
+    """Normal-approximation (Wald) interval, clipped to [0, 1]"""
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = successes / n
+        half = _z(confidence) * np.sqrt(p * (1 - p) / n)
+    return np.clip(p - half, 0, 1), np.clip(p + half, 0, 1)
+
+
+def bootstrap_interval(successes, n, confidence=DEFAULT_CONFIDENCE, samples=DEFAULT_BOOTSTRAP_SAMPLES, seed=0):
+    """Percentile bootstrap interval, resampling group counts instead of rows
+
+    Resampling the n rows of a group with replacement gives a
+    Binomial(n, successes / n) count of successes, so every group and every
+    bootstrap replicate is drawn in one vectorized call; the cost depends on
+    the number of groups, not the number of rows.
+    """
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.int64)
+    rng = np.random.default_rng(seed)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = np.nan_to_num(successes / n)
+        draws = rng.binomial(n, p, size=(samples, len(n))) / n
+    alpha = (1 - confidence) / 2
+    lower, upper = np.quantile(draws, [alpha, 1 - alpha], axis=0)
+    return lower, upper
+
+
+def proportion_interval(successes, n, method='wilson', confidence=DEFAULT_CONFIDENCE):
+    """Interval for churn rates with the given method"""
+    if method == 'wilson':
+        return wilson_interval(successes, n, confidence)
+    if method == 'normal':
+        return normal_interval(successes, n, confidence)
+    if method == 'bootstrap':
+        return bootstrap_interval(successes, n, confidence)
+    raise ValueError(f'Unknown interval method: {method!r} (expected one of {CI_METHODS})')
+
+
+def churn_rate_intervals(agg, dim, method='wilson', confidence=DEFAULT_CONFIDENCE):
+    """Churn rate per value of a dimension with its confidence interval
+
+    Returns the churn_rate() frame with Lower and Upper columns and the
+    ErrorMinus / ErrorPlus distances used for error bars.
+    """
+    table = agg.table(dim)
+    lower, upper = proportion_interval(table['Exited'].to_numpy(), table['Count'].to_numpy(), method, confidence)
+    result = pd.DataFrame({dim: table.index, 'Exited': table['ChurnRate'].to_numpy(), 'Lower': lower, 'Upper': upper})
+    # Rounding can leave a rate of exactly 0 or 1 a hair outside its interval
+    result['ErrorMinus'] = (result['Exited'] - result['Lower']).clip(lower=0)
+    result['ErrorPlus'] = (result['Upper'] - result['Exited']).clip(lower=0)
+    return result
@@ -0,0 +1,159 @@
+# Indexed customer lookup: by CustomerId, Surname prefix and value ranges,
+# returned a page at a time
+#
+#   python lookup.py [path] --surname Ha --range Balance 50000 100000 --page 2
+
+import math
+
+import numpy as np
+import pandas as pd
+
+RANGE_COLUMNS = ['CreditScore', 'Balance', 'Age']
+PAGE_SIZE = 25
+
+
+class _Run:
+    """Row positions matching one condition, as a slice of an index's order"""
+    __slots__ = ('positions', 'check')
+
+    def __init__(self, positions, check):
+        self.positions = positions
+        self.check = check
+
+
+def _search(sorted_values, value, side):
+    """np.searchsorted for one bound, cast to the array's dtype first: a
+    bound of a wider type would make numpy convert the whole array"""
+    if value is None:
+        return 0 if side == 'left' else len(sorted_values)
+    if sorted_values.dtype.kind in 'iu':
+        info = np.iinfo(sorted_values.dtype)
+        value = math.ceil(value) if side == 'left' else math.floor(value)
+        if value < info.min or value > info.max:
+            return 0 if value < info.min else len(sorted_values)
+    return int(np.searchsorted(sorted_values, sorted_values.dtype.type(value), side))
+
+
+class CustomerIndex:
+    """Hash, prefix and range indexes over a customer table
+
+    - CustomerId: a pandas hash index, one hashtable probe per id.
+    - Surname: the distinct case-folded surnames in sorted order, with the
+      rows ordered by surname, so a prefix is two binary searches over the
+      distinct names and a contiguous run of rows.
+    - range_columns: the rows ordered by value, so a closed range is two
+      binary searches and a contiguous run of rows.
+
+    A search starts from the condition matching the fewest rows and checks
+    the others on those rows only. A search on one condition never touches
+    more rows than the page it returns, whatever the table size.
+    """
+
+    def __init__(self, df, range_columns=RANGE_COLUMNS):
+        self.df = df
+        self.n = len(df)
+        self.ids = pd.Index(df['CustomerId'].to_numpy(dtype=np.int64))
+
+        codes, names = pd.factorize(df['Surname'].astype(str).str.casefold(), sort=True)
+        self.names = names.to_numpy(dtype=object)
+        self.name_codes = codes
+        self.name_order = np.argsort(codes, kind='stable')
+        self.sorted_codes = codes[self.name_order]
+
+        self.ranges = {}
+        for col in range_columns:
+            values = df[col].to_numpy()
+            order = np.argsort(values, kind='stable')
+            self.ranges[col] = (values, order, values[order])
+
+    @property
+    def range_columns(self):
+        return list(self.ranges)
+
+    def bounds(self, col):
+        """Smallest and largest indexed value of a range column"""
+        sorted_values = self.ranges[col][2]
+        return (sorted_values[0], sorted_values[-1]) if self.n else (None, None)
+
+    def get(self, customer_ids):
+        """Rows of the given customer ids (unknown ids are skipped)"""
+        positions = self.ids.get_indexer_for(np.atleast_1d(customer_ids).astype(np.int64))
+        return self.df.take(positions[positions >= 0])
+
+    def _prefix_run(self, prefix):
+        prefix = prefix.casefold()
+        first = np.searchsorted(self.names, prefix, 'left')
+        last = np.searchsorted(self.names, prefix + '\U0010ffff', 'left')
+        start, stop = np.searchsorted(self.sorted_codes, [first, last], 'left')
+        codes = self.name_codes
+        return _Run(self.name_order[start:stop], lambda rows: (codes[rows] >= first) & (codes[rows] < last))
+
+    def _range_run(self, col, low, high):
+        values, order, sorted_values = self.ranges[col]
+        start, stop = _search(sorted_values, low, 'left'), _search(sorted_values, high, 'right')
+        low = -np.inf if low is None else low
+        high = np.inf if high is None else high
+        return _Run(order[start:stop], lambda rows: (values[rows] >= low) & (values[rows] <= high))
+
+    def search(self, surname=None, ranges=None, bits=None, offset=0, limit=PAGE_SIZE):
+        """One page of the rows matching every condition, and their total count
+
+        surname is a case-insensitive prefix; ranges maps range columns to
+        (low, high), both inclusive, either of which may be None; bits is a
+        packed row bitmap (see bitmaps.BitmapIndex.select) to restrict to.
+        Rows come in the order of the most selective index, or in table order
+        without conditions.
+        """
+        runs = [self._prefix_run(surname)] if surname else []
+        runs += [self._range_run(col, low, high) for col, (low, high) in (ranges or {}).items()]
+        if bits is not None:
+            in_bitmap = lambda rows: ((bits[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)  # noqa: E731
+            runs.append(_Run(None, in_bitmap))
+
+        if not runs:
+            return self.df.iloc[offset:offset + limit], self.n
+
+        indexed = [run for run in runs if run.positions is not None] or [_Run(np.arange(self.n), None)]
+        driver = min(indexed, key=lambda run: len(run.positions))
+        positions = driver.positions
+        others = [run for run in runs if run is not driver]
+        if others:
+            mask = np.ones(len(positions), dtype=bool)
+            for run in others:
+                mask &= run.check(positions)
+            positions = positions[mask]
+        page = self.df.take(positions[offset:offset + limit])
+        return page, len(positions)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from data_cache import DATA_FILE, load_raw_data
+
+    parser = argparse.ArgumentParser(description='Look customers up by id, surname prefix and value ranges')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--id', type=int, nargs='*', default=[], help='customer ids')
+    parser.add_argument('--surname', help='surname prefix (case-insensitive)')
+    parser.add_argument('--range', nargs=3, action='append', default=[], metavar=('COLUMN', 'LOW', 'HIGH'),
+                        help=f'inclusive range on one of {", ".join(RANGE_COLUMNS)}')
+    parser.add_argument('--page', type=int, default=1)
+    parser.add_argument('--page-size', type=int, default=PAGE_SIZE)
+    args = parser.parse_args()
+
+    df = load_raw_data(args.path, compact=True)
+    start = time.perf_counter()
+    index = CustomerIndex(df)
+    built = time.perf_counter()
+    if args.id:
+        result, total = index.get(args.id), None
+    else:
+        ranges = {col: (float(low), float(high)) for col, low, high in args.range}
+        result, total = index.search(args.surname, ranges, offset=(args.page - 1) * args.page_size,
+                                     limit=args.page_size)
+    elapsed = time.perf_counter() - built
+    print(f'{len(df):,} customers indexed in {built - start:.3f} s; query took {elapsed * 1000:.3f} ms')
+    if total is not None:
+        print(f'{total:,} matches, page {args.page} of {max(1, -(-total // args.page_size))}')
+    print(result.to_string(index=False))
@@ -0,0 +1,142 @@
+# Mergeable co-moments and association statistics with Exited
+
+import numpy as np
+import pandas as pd
+
+from features import CORRELATION_COLS
+
+# Association with Exited: Cramér's V for multi-valued categories, the
+# point-biserial (phi) coefficient for 0/1 columns, both from the per-value
+# Count/Exited tables of ChurnAggregates or ChurnCube; point-biserial for the
+# numerical columns from the co-moments.
+ASSOCIATION_CATEGORICAL = ['Geography', 'Gender', 'AgeGroup', 'NumOfProducts', 'Tenure', 'CreditScoreCategory']
+ASSOCIATION_BINARY = ['IsActiveMember', 'HasCrCard', 'ZeroBalance']
+ASSOCIATION_NUMERIC = ['CreditScore', 'Age', 'Balance', 'EstimatedSalary']
+
+
+class CoMoments:
+    """Count, means and centered cross-product sums of a set of columns
+
+    Chunks are reduced with one centered matrix product each and combined
+    with Chan et al.'s pairwise update (the batched form of Welford's
+    algorithm), which stays accurate where the naive sum-of-products formula
+    cancels catastrophically. One pass over chunks gives the full Pearson
+    matrix, and partial results from other chunks or workers merge exactly.
+    Rows with a missing value in any of the columns are skipped.
+    """
+
+    def __init__(self, columns=CORRELATION_COLS):
+        self.columns = list(columns)
+        self.n = 0
+        self.mean = np.zeros(len(self.columns))
+        self.m2 = np.zeros((len(self.columns), len(self.columns)))
+
+    @classmethod
+    def from_frame(cls, df, columns=CORRELATION_COLS):
+        return cls(columns).update(df)
+
+    def _chunk(self, chunk):
+        values = chunk[self.columns].to_numpy(dtype=np.float64)
+        values = values[~np.isnan(values).any(axis=1)]
+        other = CoMoments(self.columns)
+        if len(values):
+            other.n = len(values)
+            other.mean = values.mean(axis=0)
+            centered = values - other.mean
+            other.m2 = centered.T @ centered
+        return other
+
+    def update(self, chunk):
+        """Add a chunk of rows"""
+        return self.merge(self._chunk(chunk))
+
+    def remove(self, chunk):
+        """Take a chunk of previously added rows out again"""
+        return self.subtract(self._chunk(chunk))
+
+    def merge(self, other):
+        """Combine the co-moments of another set of rows into this one"""
+        if other.n == 0:
+            return self
+        if self.n == 0:
+            self.n, self.mean, self.m2 = other.n, other.mean.copy(), other.m2.copy()
+            return self
+        n = self.n + other.n
+        delta = other.mean - self.mean
+        self.m2 = self.m2 + other.m2 + np.outer(delta, delta) * (self.n * other.n / n)
+        self.mean = self.mean + delta * (other.n / n)
+        self.n = n
+        return self
+
+    def subtract(self, other):
+        """Take out the co-moments of a subset of the rows (the inverse of merge)"""
+        if other.n == 0:
+            return self
+        n = self.n - other.n
+        if n <= 0:
+            self.n, self.mean, self.m2 = 0, np.zeros_like(self.mean), np.zeros_like(self.m2)
+            return self
+        mean = (self.mean * self.n - other.mean * other.n) / n
+        delta = other.mean - mean
+        self.m2 = self.m2 - other.m2 - np.outer(delta, delta) * (n * other.n / self.n)
+        self.mean = mean
+        self.n = n
+        return self
+
+    def covariance(self, ddof=1):
+        """Covariance matrix, like df[columns].cov()"""
+        return pd.DataFrame(self.m2 / (self.n - ddof), index=self.columns, columns=self.columns)
+
+    def correlation(self):
+        """Pearson correlation matrix, like df[columns].corr()"""
+        std = np.sqrt(np.diag(self.m2))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            corr = self.m2 / np.outer(std, std)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+def cramers_v(table):
+    """Cramér's V between a dimension and Exited from its Count/Exited table"""
+    observed = np.column_stack([table['Count'] - table['Exited'], table['Exited']]).astype(np.float64)
+    observed = observed[observed.sum(axis=1) > 0]
+    observed = observed[:, observed.sum(axis=0) > 0]
+    n = observed.sum()
+    if min(observed.shape) < 2:
+        return np.nan
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / n
+    chi2 = ((observed - expected) ** 2 / expected).sum()
+    return float(np.sqrt(chi2 / n / (min(observed.shape) - 1)))
+
+
+def point_biserial_binary(table):
+    """Point-biserial (phi) correlation of a 0/1 dimension with Exited
+
+    Positive when customers with value 1 churn more often.
+    """
+    if len(table) != 2:
+        return np.nan
+    (n0, e0), (n1, e1) = table[['Count', 'Exited']].to_numpy(dtype=np.float64)
+    n, exited = n0 + n1, e0 + e1
+    denominator = np.sqrt(n0 * n1 * exited * (n - exited))
+    return float((n * e1 - n1 * exited) / denominator) if denominator else np.nan
+
+
+def association_table(agg, moments=None):
+    """Strength of association of every driver with Exited, strongest first
+
+    agg is a ChurnAggregates or ChurnCube; the numerical columns need
+    co-moments covering them and Exited (by default agg.moments when agg
+    has them).
+    """
+    rows = []
+    for dim in ASSOCIATION_CATEGORICAL:
+        rows.append((dim, "Cramér's V", cramers_v(agg.table(dim))))
+    for dim in ASSOCIATION_BINARY:
+        rows.append((dim, 'Point-biserial', point_biserial_binary(agg.table(dim))))
+    moments = moments if moments is not None else getattr(agg, 'moments', None)
+    if moments is not None and moments.n > 1:
+        corr = moments.correlation()['Exited']
+        rows += [(col, 'Point-biserial', corr[col]) for col in ASSOCIATION_NUMERIC if col in corr.index]
+    result = pd.DataFrame(rows, columns=['Feature', 'Measure', 'Association'])
+    return result.reindex(result['Association'].abs().sort_values(ascending=False).index).reset_index(drop=True)
@@ -0,0 +1,300 @@
+# Multi-core map-reduce over shards of the customer table
+#
+#   python parallel.py [path] --workers 8
+
+import os
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from aggregates import ChurnAggregates
+from cube import ChurnCube
+from data_cache import DATA_FILE, feather
+from features import NUMERICAL_COLS, add_credit_score_category
+from moments import association_table
+from quantiles import DEFAULT_K, ColumnSketches, count_outliers
+from streaming import DEFAULT_CHUNKSIZE, partitions, read_partition, stream_aggregates, stream_outliers
+
+SHARD_KEY = 'CustomerId'
+TASKS_PER_WORKER = 2
+# Columns the pipeline reads: the group and cube keys (AgeGroup and
+# ZeroBalance come from Age and Balance), the measures, the correlation
+# columns and the columns with outlier fences
+PIPELINE_COLUMNS = ['Geography', 'Gender', 'IsActiveMember', 'HasCrCard', 'Exited'] + NUMERICAL_COLS
+# Pieces that are parsed from text: phase one keeps their PIPELINE_COLUMNS in
+# an Arrow file so that phase two does not parse them again
+SPILLED_KINDS = ('csv', 'excel')
+
+
+class ShardSummary:
+    """Phase-one partial result of a shard: aggregates (with their co-moments) and sketches"""
+
+    def __init__(self, k=DEFAULT_K):
+        self.aggregates = ChurnAggregates()
+        self.sketches = ColumnSketches(NUMERICAL_COLS, k)
+
+    def update(self, chunk):
+        self.aggregates.update(chunk)
+        self.sketches.update(chunk)
+        return self
+
+    def merge(self, other):
+        self.aggregates.merge(other.aggregates)
+        self.sketches.merge(other.sketches)
+        return self
+
+
+class ShardCounts:
+    """Phase-two partial result of a shard: cube cells and outlier counts
+
+    Both need population-wide cut-offs (the CreditScore fences of the cube
+    and the sketched IQR fences), so they are computed once phase one has
+    been reduced.
+    """
+
+    def __init__(self, credit_score_bounds, fences):
+        self.cube = ChurnCube(credit_score_bounds=credit_score_bounds)
+        self.fences = fences
+        self.outlier_counts = dict.fromkeys(fences, 0)
+
+    def update(self, chunk):
+        self.cube.update(add_credit_score_category(chunk.copy(deep=False), self.cube.bounds))
+        for col, count in count_outliers(chunk, self.fences).items():
+            self.outlier_counts[col] += count
+        return self
+
+    def merge(self, other):
+        self.cube.merge(other.cube)
+        for col, count in other.outlier_counts.items():
+            self.outlier_counts[col] += count
+        return self
+
+
+class PipelineResult:
+    """Reduced structures consumed by the dashboard and the report"""
+
+    def __init__(self, summary, counts):
+        self.aggregates = summary.aggregates
+        self.sketches = summary.sketches
+        self.cube = counts.cube
+        self.outlier_counts = counts.outlier_counts
+
+    @property
+    def rows(self):
+        return self.aggregates.rows
+
+    def outliers(self):
+        """Outlier table shaped like DatasetProfile.outliers (sketched fences, exact counts)"""
+        return self.sketches.outlier_table(self.outlier_counts)
+
+    def correlation(self):
+        return self.aggregates.correlation()
+
+    def associations(self):
+        return association_table(self.cube, self.aggregates.moments)
+
+
+def shard_codes(df, shards, key=SHARD_KEY):
+    """Shard number of every row, from a hash of the shard key"""
+    return (pd.util.hash_array(df[key].to_numpy()) % np.uint64(shards)).astype(np.int64)
+
+
+def _read_shard(path, order_path, start, stop, columns=None):
+    """Rows of one hash shard, taken from the memory-mapped table and row order"""
+    import pyarrow as pa
+
+    rows = np.load(order_path, mmap_mode='r')[start:stop]
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        return (table if columns is None else table.select(columns)).take(rows).to_pandas()
+
+
+def _task_frames(task, columns=None):
+    """Yield the DataFrames of a task: pieces of a file, a hash shard or a
+    spilled task (all read by the worker), or an in-process frame"""
+    kind, value = task
+    if kind == 'parts':
+        parts, chunksize = value
+        for part in parts:
+            yield from read_partition(part, chunksize, columns)
+    elif kind == 'shard':
+        yield _read_shard(*value, columns=columns)
+    elif kind == 'spill':
+        yield from read_partition(('arrow', *value), DEFAULT_CHUNKSIZE)
+    else:
+        yield value
+
+
+def _spills(task):
+    return feather is not None and task[0] == 'parts' and any(part[0] in SPILLED_KINDS for part in task[1][0])
+
+
+def _summarise(numbered, k, directory):
+    """Phase one of a task: its ShardSummary, and the task phase two runs
+
+    Text pieces are parsed once: their PIPELINE_COLUMNS are written to an
+    Arrow file that phase two memory-maps instead.
+    """
+    index, task = numbered
+    summary = ShardSummary(k)
+    if not _spills(task):
+        for frame in _task_frames(task, PIPELINE_COLUMNS):
+            summary.update(frame)
+        return summary, task
+
+    import pyarrow as pa
+
+    path, writer, rows = os.path.join(directory, f'spill-{index:05d}.arrow'), None, 0
+    try:
+        for frame in _task_frames(task, PIPELINE_COLUMNS):
+            summary.update(frame)
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                writer = pa.ipc.new_file(path, table.schema)
+            writer.write_table(table)
+            rows += len(frame)
+    finally:
+        if writer is not None:
+            writer.close()
+    return summary, ('spill', (path, 0, rows)) if writer is not None else ('parts', ([], DEFAULT_CHUNKSIZE))
+
+
+def _count(task, make):
+    """Phase two of a task"""
+    counts = make()
+    for frame in _task_frames(task, PIPELINE_COLUMNS):
+        counts.update(frame)
+    return counts
+
+
+def _shard_tasks(frame, shards, directory):
+    """Share a DataFrame with the workers through memory-mapped files
+
+    The PIPELINE_COLUMNS of the frame are written once as uncompressed
+    Arrow IPC, with its row numbers ordered by shard in a .npy file; every
+    shard task names a range of that order, so workers take their own rows
+    instead of each receiving the whole frame.
+    """
+    import pyarrow.feather as feather
+
+    path, order_path = os.path.join(directory, 'frame.arrow'), os.path.join(directory, 'order.npy')
+    feather.write_feather(frame[PIPELINE_COLUMNS].reset_index(drop=True), path, compression='uncompressed')
+    codes = shard_codes(frame, shards)
+    np.save(order_path, np.argsort(codes.astype(np.min_scalar_type(shards)), kind='stable'))
+    stops = np.cumsum(np.bincount(codes, minlength=shards))
+    starts = stops - np.bincount(codes, minlength=shards)
+    return [('shard', (path, order_path, int(start), int(stop))) for start, stop in zip(starts, stops) if stop > start]
+
+
+def _plan(source, workers, shards, chunksize, pool, directory):
+    """Tasks for a source: runs of consecutive pieces of a file or directory,
+    or hash shards of a DataFrame, which the workers read themselves (the
+    whole frame is one task when running in-process)
+
+    Pieces are grouped into TASKS_PER_WORKER tasks per worker: enough to
+    even out the load, few enough that merging the partial results in the
+    parent stays cheap.
+    """
+    if isinstance(source, pd.DataFrame):
+        return [('frame', source)] if pool is None else _shard_tasks(source, shards, directory)
+    pieces = partitions(source, chunksize)
+    groups = np.array_split(np.arange(len(pieces)), min(len(pieces), TASKS_PER_WORKER * workers) or 1)
+    return [('parts', ([pieces[i] for i in group], chunksize)) for group in groups if len(group)]
+
+
+def _map(pool, function, tasks, in_flight):
+    """Yield function(task) for every task, in task order
+
+    At most in_flight tasks are submitted ahead, so partial results never
+    pile up in memory.
+    """
+    if pool is None:
+        yield from map(function, tasks)
+        return
+
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.submit(function, task))
+        if len(pending) >= in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def run_parallel(source=DATA_FILE, workers=None, shards=None, chunksize=DEFAULT_CHUNKSIZE, k=DEFAULT_K):
+    """Run the analysis pipeline as a two-phase map-reduce over a process pool
+
+    source is a DataFrame (sharded by a hash of CustomerId), a single file
+    or a directory of partition files; files are split into pieces of about
+    chunksize rows (see streaming.partitions) that every worker reads and
+    parses itself, so the parent only plans and merges. Phase one reduces
+    aggregates, quantile sketches and co-moments; phase two reduces the
+    cube and exact outlier counts against the fences found in phase one.
+    Only PIPELINE_COLUMNS are read, and text pieces are parsed once (see
+    _summarise). workers=1 runs everything in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = shards or workers
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    directory = tempfile.mkdtemp(prefix='churn-shards-')
+
+    try:
+        tasks = _plan(source, workers, shards, chunksize, pool, directory)
+        in_flight = 2 * workers
+        summary, later = ShardSummary(k), []
+        for partial_summary, task in _map(pool, partial(_summarise, k=k, directory=directory),
+                                          enumerate(tasks), in_flight):
+            summary.merge(partial_summary)
+            later.append(task)
+        make_counts = partial(ShardCounts, summary.aggregates.credit_score_bounds(), summary.sketches.bounds())
+        counts = make_counts()
+        for partial_counts in _map(pool, partial(_count, make=make_counts), later, in_flight):
+            counts.merge(partial_counts)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+    return PipelineResult(summary, counts)
+
+
+def population_outliers(path=DATA_FILE, workers=1):
+    """Full-population outlier counts as the dashboard reports them
+
+    One worker streams the file through a single sketch (streaming.
+    stream_outliers); more workers merge per-partition sketches, whose
+    fences can differ slightly, so callers that must agree with the default
+    view pass workers=1.
+    """
+    if workers > 1:
+        return run_parallel(path, workers).outliers()[['Column', 'Outlier_Count']]
+    return stream_outliers(path)[['Column', 'Outlier_Count']]
+
+
+def population_aggregates(path=DATA_FILE, workers=1):
+    """Full-population ChurnAggregates, with their co-moments (exact for any worker count)"""
+    if workers > 1:
+        return run_parallel(path, workers).aggregates
+    return stream_aggregates(path)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Run the churn pipeline as a parallel map-reduce')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    result = run_parallel(args.path, args.workers, chunksize=args.chunksize)
+    elapsed = time.perf_counter() - start
+    print(f'{result.rows:,} rows in {elapsed:.2f} s ({result.rows / elapsed:,.0f} rows/s)')
+    print(f'Churn rate: {result.aggregates.overall_churn_rate():.2%}')
+    print(result.outliers().to_string(index=False))
@@ -0,0 +1,187 @@
+# One-pass column profiling for the EDA views
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR
+from features import NUMERICAL_COLS, iqr_bounds
+from quantiles import ColumnSketches, use_sketch
+
+QUANTILES = [0.25, 0.5, 0.75]
+
+
+class DatasetProfile:
+    """Statistics describing a customer table
+
+    Holds everything the EDA views print: shape, dtypes, non-null, null and
+    unique counts, duplicates, the describe() summary and the IQR outlier
+    bounds and counts of the numerical columns. When approximate is set the
+    quartiles, unique counts of numeric columns and outliers are estimates.
+    """
+
+    def __init__(self, fingerprint, shape, dtypes, null_counts, nunique, duplicates, summary, outliers, memory_usage,
+                 approximate=False):
+        self.fingerprint = fingerprint
+        self.shape = shape
+        self.dtypes = dtypes
+        self.null_counts = null_counts
+        self.nunique = nunique
+        self.duplicates = duplicates
+        self.summary = summary
+        self.outliers = outliers
+        self.memory_usage = memory_usage
+        self.approximate = approximate
+
+    @property
+    def columns(self):
+        return self.dtypes.index.tolist()
+
+    def info_table(self):
+        """Return the per-column part of df.info() as a DataFrame"""
+        return pd.DataFrame({
+            'Non-Null Count': self.shape[0] - self.null_counts,
+            'Dtype': self.dtypes.astype(str),
+        })
+
+    def info_text(self):
+        """Render the profile the way df.info() prints it"""
+        lines = [f'RangeIndex: {self.shape[0]} entries',
+                 f'Data columns (total {self.shape[1]} columns):']
+        lines.append(self.info_table().to_string())
+        lines.append(f'memory usage: {self.memory_usage / 1024:.1f}+ KB')
+        return '\n'.join(lines)
+
+
+def dataset_fingerprint(df, row_hashes=None):
+    """Hash a table's column names, dtypes and row contents"""
+    if row_hashes is None:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256()
+    digest.update(repr(list(zip(df.columns, df.dtypes.astype(str)))).encode())
+    digest.update(row_hashes.tobytes())
+    return digest.hexdigest()
+
+
+def _sorted_quantiles(sorted_matrix, valid, q):
+    """Linear-interpolated quantiles of each column of a NaN-last sorted matrix"""
+    h = (valid - 1) * q
+    lo = np.floor(h).astype(np.int64).clip(min=0)
+    hi = np.ceil(h).astype(np.int64).clip(min=0)
+    cols = np.arange(sorted_matrix.shape[1])
+    lo_values = sorted_matrix[lo, cols]
+    return lo_values + (h - lo) * (sorted_matrix[hi, cols] - lo_values)
+
+
+def profile_frame(df, outlier_cols=NUMERICAL_COLS, row_hashes=None, mode='auto'):
+    """Compute a DatasetProfile from one sort of the numeric columns
+
+    The numeric columns are copied into a single float matrix and sorted once
+    along the rows. Quantiles, min/max, unique counts and outlier counts are
+    then read off the sorted matrix by position, so no column is rescanned
+    and no filtered copy of the table is made.
+
+    When mode selects approximate quantiles (see quantiles.use_sketch) the
+    sort is skipped: quartiles and IQR bounds come from KLL sketches and the
+    outliers are counted against those bounds.
+    """
+    if row_hashes is None:
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+    numeric = [col for col in df.columns
+               if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    matrix = df[numeric].to_numpy(dtype=np.float64)
+    n = len(df)
+    approximate = use_sketch(mode, n)
+
+    isnan = np.isnan(matrix)
+    valid = n - isnan.sum(axis=0)
+    filled = np.where(isnan, 0.0, matrix)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=0) / valid
+        std = np.sqrt((np.where(isnan, 0.0, matrix - mean) ** 2).sum(axis=0) / (valid - 1))
+
+    nunique = {}
+    if approximate:
+        sketches = ColumnSketches(numeric).update(df)
+        quantiles = [np.array([sketches[col].quantile(q) for col in numeric]) for q in QUANTILES]
+        minimum = np.array([sketches[col].min for col in numeric])
+        maximum = np.array([sketches[col].max for col in numeric])
+    else:
+        sorted_matrix = np.sort(matrix, axis=0)
+        quantiles = [_sorted_quantiles(sorted_matrix, valid, q) for q in QUANTILES]
+        cols = np.arange(len(numeric))
+        minimum = sorted_matrix[0, cols] if n else np.full(len(numeric), np.nan)
+        maximum = sorted_matrix[(valid - 1).clip(min=0), cols] if n else np.full(len(numeric), np.nan)
+
+        # Unique counts: value changes along the sorted columns
+        if n:
+            changes = np.diff(sorted_matrix, axis=0) != 0
+            for i, col in enumerate(numeric):
+                nunique[col] = int(changes[:valid[i] - 1, i].sum()) + 1 if valid[i] else 0
+
+    summary = pd.DataFrame(
+        [valid.astype(float), mean, std, minimum, *quantiles, maximum],
+        index=['count', 'mean', 'std', 'min', '25%', '50%', '75%', 'max'],
+        columns=numeric,
+    )
+
+    null_counts = dict(zip(numeric, (n - valid).tolist()))
+    for col in df.columns:
+        if col not in nunique:
+            nunique[col] = int(df[col].nunique())
+        if col not in null_counts:
+            null_counts[col] = int(df[col].isna().sum())
+
+    outliers = []
+    for col in outlier_cols:
+        i = numeric.index(col)
+        lower_bound, upper_bound = iqr_bounds(quantiles[0][i], quantiles[2][i])
+        if approximate:
+            # Fences are estimates, but counting against them is exact and needs no sort
+            count = np.count_nonzero((matrix[:, i] < lower_bound) | (matrix[:, i] > upper_bound))
+        else:
+            column = sorted_matrix[:valid[i], i]
+            count = np.searchsorted(column, lower_bound, side='left') + valid[i] - np.searchsorted(column, upper_bound, side='right')
+        outliers.append((col, int(count), lower_bound, upper_bound))
+
+    return DatasetProfile(
+        fingerprint=dataset_fingerprint(df, row_hashes),
+        shape=df.shape,
+        dtypes=df.dtypes,
+        null_counts=pd.Series(null_counts)[df.columns],
+        nunique=pd.Series(nunique)[df.columns],
+        duplicates=int(pd.Series(row_hashes).duplicated().sum()),
+        summary=summary,
+        outliers=pd.DataFrame(outliers, columns=['Column', 'Outlier_Count', 'Lower_Bound', 'Upper_Bound']),
+        memory_usage=int(df.memory_usage().sum()),
+        approximate=approximate,
+    )
+
+
+def profile_dataset(df, mode='auto', cache_dir=CACHE_DIR):
+    """Return the profile of a table, reusing the cached one when its fingerprint matches"""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    fingerprint = dataset_fingerprint(df, row_hashes)
+    approximate = use_sketch(mode, len(df))
+    path = os.path.join(cache_dir, f"profile-{fingerprint[:16]}-{'approx' if approximate else 'exact'}.pkl")
+
+    try:
+        with open(path, 'rb') as f:
+            profile = pickle.load(f)
+        if profile.fingerprint == fingerprint:
+            return profile
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    profile = profile_frame(df, row_hashes=row_hashes, mode=mode)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(path, 'wb') as f:
+            pickle.dump(profile, f)
+    except OSError:
+        pass
+    return profile
@@ -0,0 +1,261 @@
+# Mergeable quantile sketches for IQR bounds on data too large to sort
+
+import numpy as np
+import pandas as pd
+
+from features import NUMERICAL_COLS, iqr_bounds
+
+DEFAULT_K = 200
+
+# Above this many rows the 'auto' quantile mode switches to sketches
+EXACT_ROW_LIMIT = 1_000_000
+QUANTILE_MODES = ['auto', 'exact', 'approx']
+
+
+def use_sketch(mode, rows):
+    """Decide whether quantiles should come from a sketch"""
+    if mode not in QUANTILE_MODES:
+        raise ValueError(f'Unknown quantile mode: {mode!r} (expected one of {QUANTILE_MODES})')
+    return mode == 'approx' or (mode == 'auto' and rows > EXACT_ROW_LIMIT)
+
+
+class KLLSketch:
+    """KLL quantile sketch (Karnin, Lang & Liberty, 2016)
+
+    Keeps a hierarchy of compactors: items at level h stand for 2**h input
+    values, and a level that outgrows its capacity is sorted and every other
+    item (random offset) is promoted to the next level. Memory stays around
+    3k items plus O(log n) regardless of the input size.
+
+    Error bounds: for k=200 the normalized rank error of a single quantile is
+    about 1.3% at 99% confidence (about 1.7% simultaneously over all
+    quantiles), and shrinks roughly in proportion to 1/k. Sketches built on
+    separate chunks or workers can be merged without losing these bounds.
+    Min and max are tracked exactly.
+    """
+
+    def __init__(self, k=DEFAULT_K, seed=0):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    @classmethod
+    def from_values(cls, values, k=DEFAULT_K):
+        return cls(k).update(values)
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            leftover = items[:len(items) % 2]
+            items = items[len(leftover):]
+            promoted = items[self._rng.integers(2)::2]
+
+            self.levels[level] = leftover
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # Adding a level shrinks the capacities below it, so start over
+            level = 0
+
+    def update(self, values):
+        """Add an array of values (NaNs are ignored)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+
+        self.n += len(values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        """Combine another sketch into this one"""
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(items, kind='stable')
+        return items[order], weights[order]
+
+    def quantile(self, q):
+        """Estimate the q-th quantile"""
+        if self.n == 0:
+            return np.nan
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        items, weights = self._weighted_items()
+        cum = np.cumsum(weights)
+        return items[min(np.searchsorted(cum, q * cum[-1]), len(items) - 1)]
+
+    def rank(self, value, inclusive=False):
+        """Estimate how many input values are below (or at most) value"""
+        if self.n == 0:
+            return 0
+        items, weights = self._weighted_items()
+        side = 'right' if inclusive else 'left'
+        below = weights[:np.searchsorted(items, value, side=side)].sum()
+        return int(round(below * self.n / weights.sum()))
+
+    def iqr_bounds(self):
+        """Return the IQR outlier fences"""
+        return iqr_bounds(self.quantile(0.25), self.quantile(0.75))
+
+    def outlier_count(self, bounds=None):
+        """Estimate how many values fall outside the IQR fences
+
+        The estimate carries the sketch's rank error (about 1.3% of n for
+        k=200), which is coarse next to the usual outlier share; when the data
+        can be read again, count against iqr_bounds() instead.
+        """
+        lower_bound, upper_bound = bounds if bounds is not None else self.iqr_bounds()
+        return self.rank(lower_bound) + self.n - self.rank(upper_bound, inclusive=True)
+
+    def box_stats(self):
+        """Quartiles and Tukey whiskers, as used by box plots"""
+        q1, median, q3 = self.quantile(0.25), self.quantile(0.5), self.quantile(0.75)
+        lower_bound, upper_bound = iqr_bounds(q1, q3)
+        items, _ = self._weighted_items()
+        inside = items[(items >= lower_bound) & (items <= upper_bound)]
+        lower_whisker = self.min if self.min >= lower_bound else (inside.min() if len(inside) else q1)
+        upper_whisker = self.max if self.max <= upper_bound else (inside.max() if len(inside) else q3)
+        return {'q1': q1, 'median': median, 'q3': q3,
+                'lowerfence': lower_whisker, 'upperfence': upper_whisker,
+                'min': self.min, 'max': self.max, 'count': self.n}
+
+
+class ColumnSketches:
+    """One KLL sketch per numerical column"""
+
+    def __init__(self, columns=NUMERICAL_COLS, k=DEFAULT_K):
+        self.sketches = {col: KLLSketch(k) for col in columns}
+
+    def __getitem__(self, col):
+        return self.sketches[col]
+
+    def update(self, chunk):
+        for col, sketch in self.sketches.items():
+            sketch.update(chunk[col].to_numpy(dtype=np.float64))
+        return self
+
+    def merge(self, other):
+        for col, sketch in other.sketches.items():
+            self.sketches[col].merge(sketch)
+        return self
+
+    def bounds(self):
+        """Return the IQR outlier fences of every column"""
+        return {col: sketch.iqr_bounds() for col, sketch in self.sketches.items()}
+
+    def outlier_table(self, counts=None):
+        """Return IQR outlier counts, shaped like DatasetProfile.outliers
+
+        counts maps columns to exact counts against bounds() (see
+        count_outliers); without it the sketch estimates are used.
+        """
+        rows = []
+        for col, (lower_bound, upper_bound) in self.bounds().items():
+            if counts is not None:
+                count = counts[col]
+            else:
+                count = self.sketches[col].outlier_count((lower_bound, upper_bound))
+            rows.append((col, count, lower_bound, upper_bound))
+        return pd.DataFrame(rows, columns=['Column', 'Outlier_Count', 'Lower_Bound', 'Upper_Bound'])
+
+
+class OrderStatistics:
+    """Every numerical column kept sorted, for exact quartiles and outlier
+    counts of a population that also loses rows (deletes and updates)
+
+    Each update or removal is a binary search plus one array shift per
+    column, and quantiles and outlier counts are read by position.
+    """
+
+    def __init__(self, columns=NUMERICAL_COLS):
+        self.values = {col: np.empty(0) for col in columns}
+
+    @classmethod
+    def from_frame(cls, df, columns=NUMERICAL_COLS):
+        stats = cls(columns)
+        for col in columns:
+            stats.values[col] = _sorted_values(df[col])
+        return stats
+
+    def update(self, chunk):
+        for col, values in self.values.items():
+            new = _sorted_values(chunk[col])
+            self.values[col] = np.insert(values, np.searchsorted(values, new), new)
+        return self
+
+    def remove(self, chunk):
+        """Take previously added rows out again"""
+        for col, values in self.values.items():
+            old = _sorted_values(chunk[col])
+            # equal values taken out together sit at consecutive positions
+            positions = np.searchsorted(values, old) + np.arange(len(old)) - np.searchsorted(old, old)
+            self.values[col] = np.delete(values, positions)
+        return self
+
+    def quantile(self, col, q):
+        """Exact quantile, interpolated as np.quantile does by default"""
+        values = self.values[col]
+        if not len(values):
+            return np.nan
+        position = (len(values) - 1) * q
+        below = int(position)
+        a, b = values[below], values[min(below + 1, len(values) - 1)]
+        t = position - below
+        return float(a + (b - a) * t if t < 0.5 else b - (b - a) * (1 - t))
+
+    def bounds(self):
+        """Return the IQR outlier fences of every column"""
+        return {col: iqr_bounds(self.quantile(col, 0.25), self.quantile(col, 0.75)) for col in self.values}
+
+    def outlier_counts(self, bounds):
+        """count_outliers over every row added, by binary search"""
+        counts = {}
+        for col, (lower_bound, upper_bound) in bounds.items():
+            values = self.values[col]
+            counts[col] = int(np.searchsorted(values, lower_bound) + len(values)
+                              - np.searchsorted(values, upper_bound, side='right'))
+        return counts
+
+
+def _sorted_values(series):
+    values = series.to_numpy(dtype=np.float64)
+    return np.sort(values[~np.isnan(values)])
+
+
+def count_outliers(chunk, bounds):
+    """Count the rows of a chunk outside the given per-column fences"""
+    counts = {}
+    for col, (lower_bound, upper_bound) in bounds.items():
+        values = chunk[col].to_numpy()
+        counts[col] = int(np.count_nonzero((values < lower_bound) | (values > upper_bound)))
+    return counts
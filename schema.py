@@ -0,0 +1,172 @@
+# Compact in-memory dtypes for the customer table
+#
+#   python schema.py     # memory report, then a parity check of every aggregate
+
+import numpy as np
+import pandas as pd
+
+from features import CREDIT_SCORE_CATEGORIES
+
+# Narrowest integer type per column; a column whose values do not fit keeps its dtype
+COMPACT_INTEGERS = {
+    'RowNumber': np.int32,
+    'CustomerId': np.int32,
+    'CreditScore': np.int16,
+    'Age': np.int16,
+    'Tenure': np.int16,
+    'NumOfProducts': np.int8,
+    'HasCrCard': np.int8,
+    'IsActiveMember': np.int8,
+    'Exited': np.int8,
+}
+CATEGORICAL_COLS = ['Surname', 'Geography', 'Gender']
+# Downcast to float32 only when every value survives the round trip exactly
+FLOAT32_COLS = ['Balance', 'EstimatedSalary']
+CREDIT_SCORE_DTYPE = pd.CategoricalDtype(CREDIT_SCORE_CATEGORIES)
+# dtypes of the source columns, pinned when a text file is parsed in pieces so
+# that every piece agrees (a missing value in an integer column is an error)
+SOURCE_DTYPES = {**dict.fromkeys(COMPACT_INTEGERS, np.int64), **dict.fromkeys(CATEGORICAL_COLS, str),
+                 **dict.fromkeys(FLOAT32_COLS, np.float64)}
+
+
+def _downcast_int(values, dtype):
+    info = np.iinfo(dtype)
+    if len(values) and (values.min() < info.min or values.max() > info.max):
+        return values
+    return values.astype(dtype)
+
+
+def _downcast_float(values):
+    narrow = values.astype(np.float32)
+    if np.array_equal(narrow.astype(values.dtype), values, equal_nan=True):
+        return narrow
+    return values
+
+
+def compact_series(name, series):
+    """Return a column in its compact dtype (unchanged when it has none)"""
+    if name in COMPACT_INTEGERS and pd.api.types.is_integer_dtype(series) and not series.hasnans:
+        return pd.Series(_downcast_int(series.to_numpy(), COMPACT_INTEGERS[name]), index=series.index, name=name)
+    if name in CATEGORICAL_COLS:
+        return series.astype('category')
+    if name == 'CreditScoreCategory':
+        return series.astype(CREDIT_SCORE_DTYPE)
+    if name == 'ZeroBalance':
+        return series.astype(bool)
+    if name in FLOAT32_COLS and pd.api.types.is_float_dtype(series):
+        return pd.Series(_downcast_float(series.to_numpy()), index=series.index, name=name)
+    return series
+
+
+def compact_frame(df):
+    """Return a copy of a customer table in compact dtypes"""
+    return pd.DataFrame({col: compact_series(col, df[col]) for col in df.columns}, index=df.index)
+
+
+def compact_table(table):
+    """Convert an Arrow table straight to a compact DataFrame
+
+    String columns are dictionary-encoded in Arrow, so they arrive as
+    categoricals without a Python string per row; numeric columns are read
+    zero-copy and then narrowed, so no full-width pandas copy is built.
+    """
+    import pyarrow as pa
+
+    columns = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name in CATEGORICAL_COLS and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+            columns[name] = column.dictionary_encode().to_pandas()
+        else:
+            columns[name] = compact_series(name, column.to_pandas())
+    return pd.DataFrame(columns)
+
+
+def memory_report(raw, compact):
+    """Per-column dtype and memory before and after compaction, with a total row"""
+    raw_bytes = raw.memory_usage(deep=True, index=False)
+    compact_bytes = compact.memory_usage(deep=True, index=False)
+    report = pd.DataFrame({
+        'Raw Dtype': raw.dtypes.astype(str),
+        'Compact Dtype': compact.dtypes.astype(str),
+        'Raw KiB': raw_bytes / 1024,
+        'Compact KiB': compact_bytes / 1024,
+    })
+    report.loc['Total'] = ['', '', raw_bytes.sum() / 1024, compact_bytes.sum() / 1024]
+    report['Saving'] = 1 - report['Compact KiB'] / report['Raw KiB']
+    report.index.name = 'Column'
+    return report
+
+
+def parity_check(raw):
+    """Compare every aggregate computed from raw and compact dtypes
+
+    raw is a customer table with the derived columns. Returns a list of
+    (check, error) for every mismatch; an empty list means the compact
+    representation changes none of the numbers.
+    """
+    from aggregates import DIMENSIONS, ChurnAggregates
+    from bitmaps import FILTER_DIMENSIONS, BitmapIndex
+    from cube import CUBE_DIMENSIONS, ChurnCube
+    from features import CORRELATION_COLS
+    from intervals import churn_rate_intervals
+    from moments import association_table
+    from profiling import profile_frame
+    from scoring import ChurnModel
+
+    compact = compact_frame(raw)
+    frames = {}
+
+    for name, df in [('raw', raw), ('compact', compact)]:
+        agg, cube = ChurnAggregates.from_frame(df), ChurnCube.from_frame(df)
+        profile = profile_frame(df)
+        checks = {}
+        for dim in DIMENSIONS:
+            checks[f'aggregates.table({dim})'] = agg.table(dim).reset_index()
+            checks[f'aggregates.average_balance({dim})'] = agg.average_balance(dim).reset_index()
+            checks[f'intervals({dim})'] = churn_rate_intervals(agg, dim)
+        for dim in CUBE_DIMENSIONS:
+            checks[f'cube.table({dim})'] = cube.table(dim).reset_index()
+        checks['cube.average_tenure'] = pd.DataFrame([cube.average_tenure()])
+        checks['profile.summary'] = profile.summary
+        checks['profile.outliers'] = profile.outliers
+        checks['profile.counts'] = pd.DataFrame({'nulls': profile.null_counts, 'nunique': profile.nunique})
+        checks['profile.duplicates'] = pd.DataFrame([profile.duplicates])
+        checks['correlation'] = df[CORRELATION_COLS].corr()
+        checks['moments.correlation'] = agg.correlation()
+        checks['associations'] = association_table(agg)
+        index = BitmapIndex(df)
+        checks['bitmaps'] = pd.DataFrame([(col, str(v), index.count(index.select({col: [v]})))
+                                          for col in FILTER_DIMENSIONS for v in index.values(col)])
+        checks['scores'] = pd.DataFrame({'score': ChurnModel.fit(raw, holdout=0).score(df)})
+        frames[name] = checks
+
+    failures = []
+    for check, expected in frames['raw'].items():
+        try:
+            pd.testing.assert_frame_equal(frames['compact'][check], expected, check_dtype=False,
+                                          check_index_type=False, check_column_type=False, check_categorical=False)
+        except AssertionError as e:
+            failures.append((check, str(e)))
+    return failures
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    from data_cache import DATA_FILE, load_raw_data
+    from features import add_derived_columns
+
+    parser = argparse.ArgumentParser(description='Report compact-dtype memory use and check aggregate parity')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    args = parser.parse_args()
+
+    raw = add_derived_columns(load_raw_data(args.path))
+    print(memory_report(raw, compact_frame(raw)).round(3).to_string())
+
+    failures = parity_check(raw)
+    for check, error in failures:
+        print(f'\nMISMATCH {check}\n{error}')
+    print(f'\nParity: {"all aggregates unchanged" if not failures else f"{len(failures)} mismatches"}')
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,211 @@
+# Churn scoring: logistic regression trained offline, scored with pure NumPy
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_cache import CACHE_DIR, DATA_FILE, cache_paths, dataset_version, load_raw_data
+
+SCORE_NUMERIC = ['CreditScore', 'Age', 'Tenure', 'Balance', 'NumOfProducts',
+                 'HasCrCard', 'IsActiveMember', 'EstimatedSalary']
+SCORE_CATEGORICAL = ['Geography', 'Gender']
+SCORE_FEATURES = SCORE_NUMERIC + SCORE_CATEGORICAL
+
+
+def _sigmoid(z):
+    """In-place logistic function of a float array"""
+    np.negative(z, out=z)
+    np.exp(z, out=z)
+    z += 1
+    np.reciprocal(z, out=z)
+    return z
+
+
+def roc_auc(y, scores):
+    """Area under the ROC curve from the Mann-Whitney rank sum (ties averaged)"""
+    y = np.asarray(y, dtype=bool)
+    ranks = pd.Series(scores).rank().to_numpy()
+    positives = y.sum()
+    negatives = len(y) - positives
+    if positives == 0 or negatives == 0:
+        return float('nan')
+    return float((ranks[y].sum() - positives * (positives + 1) / 2) / (positives * negatives))
+
+
+class ChurnModel:
+    """Logistic churn model stored as raw-unit weights and per-category offsets
+
+    Standardization is folded into the weights when the model is trained, so
+    a score is weights . x + intercept + one table lookup per categorical
+    column: no scaling pass and no one-hot matrix. Unknown or missing
+    categories score like the reference (first) category.
+    """
+
+    def __init__(self, weights, intercept, categories, offsets, metrics=None):
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.categories = {col: list(values) for col, values in categories.items()}
+        self.offsets = {col: np.asarray(offsets[col], dtype=np.float64) for col in SCORE_CATEGORICAL}
+        self.lookups = {col: dict(zip(self.categories[col], self.offsets[col].tolist()))
+                        for col in SCORE_CATEGORICAL}
+        self.metrics = metrics or {}
+
+    @staticmethod
+    def design(df, categories):
+        """Standardizable numeric matrix and one-hot (drop-first) columns for training"""
+        numeric = df[SCORE_NUMERIC].to_numpy(dtype=np.float64)
+        dummies = [
+            (pd.Categorical(df[col], categories=categories[col]).codes[:, None] == np.arange(1, len(categories[col])))
+            for col in SCORE_CATEGORICAL
+        ]
+        return numeric, np.hstack(dummies).astype(np.float64)
+
+    @classmethod
+    def fit(cls, df, l2=1.0, iterations=25, tol=1e-8, holdout=0.2, seed=0):
+        """Fit by Newton's method (IRLS) with an L2 penalty on standardized features
+
+        A random holdout share of the rows is kept out of training to report
+        the AUC and log loss stored with the model.
+        """
+        categories = {col: sorted(df[col].dropna().unique().tolist()) for col in SCORE_CATEGORICAL}
+        test = np.random.default_rng(seed).random(len(df)) < holdout
+        train_df = df[~test]
+
+        numeric, dummies = cls.design(train_df, categories)
+        mean, scale = numeric.mean(axis=0), numeric.std(axis=0)
+        scale[scale == 0] = 1
+        X = np.hstack([np.ones((len(train_df), 1)), (numeric - mean) / scale, dummies])
+        y = train_df['Exited'].to_numpy(dtype=np.float64)
+
+        beta = np.zeros(X.shape[1])
+        penalty = np.full(X.shape[1], l2)
+        penalty[0] = 0
+        for _ in range(iterations):
+            p = _sigmoid(X @ beta)
+            gradient = X.T @ (p - y) + penalty * beta
+            hessian = (X * (p * (1 - p))[:, None]).T @ X + np.diag(penalty)
+            step = np.linalg.solve(hessian, gradient)
+            beta -= step
+            if np.abs(step).max() < tol:
+                break
+
+        n_numeric = len(SCORE_NUMERIC)
+        weights = beta[1:1 + n_numeric] / scale
+        intercept = beta[0] - (weights * mean).sum()
+        offsets, start = {}, 1 + n_numeric
+        for col in SCORE_CATEGORICAL:
+            levels = len(categories[col])
+            offsets[col] = np.concatenate([[0.0], beta[start:start + levels - 1]])
+            start += levels - 1
+
+        model = cls(weights, intercept, categories, offsets)
+        if test.any():
+            y_test = df.loc[test, 'Exited'].to_numpy()
+            p_test = np.clip(model.score(df[test]), 1e-12, 1 - 1e-12)
+            model.metrics = {
+                'train_rows': int((~test).sum()), 'test_rows': int(test.sum()),
+                'auc': roc_auc(y_test, p_test),
+                'log_loss': float(-np.mean(y_test * np.log(p_test) + (1 - y_test) * np.log(1 - p_test))),
+            }
+        return model
+
+    def score(self, df):
+        """Churn probability for every row of a DataFrame (batch path)"""
+        return _sigmoid(self.log_odds(df))
+
+    def log_odds(self, df):
+        """Log-odds of churn for every row of a DataFrame"""
+        z = df[SCORE_NUMERIC].to_numpy(dtype=np.float64) @ self.weights
+        z += self.intercept
+        for col in SCORE_CATEGORICAL:
+            # Hash-factorize the column, then map its few distinct values
+            codes, uniques = pd.factorize(df[col])
+            lookup = self.lookups[col]
+            table = np.array([lookup.get(value, 0.0) for value in uniques] + [0.0])
+            z += table[codes]
+        return z
+
+    def score_records(self, records):
+        """Churn probabilities for a small list of dicts (micro-batch path)
+
+        Skips pandas entirely: builds the numeric matrix straight from the
+        records and maps categories through plain dict lookups.
+        """
+        numeric = np.array([[record[col] for col in SCORE_NUMERIC] for record in records], dtype=np.float64)
+        z = numeric @ self.weights
+        z += self.intercept
+        for col in SCORE_CATEGORICAL:
+            lookup = self.lookups[col]
+            z += np.array([lookup.get(record[col], 0.0) for record in records])
+        return _sigmoid(z)
+
+    def score_batches(self, chunks):
+        """Score an iterable of DataFrame chunks, yielding one array per chunk"""
+        for chunk in chunks:
+            yield self.score(chunk)
+
+    def coefficients(self):
+        """Log-odds contribution per raw unit (numeric) or versus the reference category"""
+        rows = [(col, None, w) for col, w in zip(SCORE_NUMERIC, self.weights)]
+        rows += [(col, value, offset) for col in SCORE_CATEGORICAL
+                 for value, offset in zip(self.categories[col], self.offsets[col])]
+        return pd.DataFrame(rows, columns=['Feature', 'Category', 'Coefficient'])
+
+    def save(self, path, version=None):
+        """Persist the model as a small .npz plus a JSON sidecar"""
+        np.savez(path, weights=self.weights, intercept=self.intercept,
+                 **{f'offsets_{col}': self.offsets[col] for col in SCORE_CATEGORICAL})
+        with open(path + '.json', 'w') as f:
+            json.dump({'version': version, 'categories': self.categories, 'metrics': self.metrics}, f)
+
+    @classmethod
+    def load(cls, path, version=None):
+        """Load a saved model, or return None when missing or trained on another version"""
+        try:
+            with open(path + '.json') as f:
+                meta = json.load(f)
+            if version is not None and meta['version'] != version:
+                return None
+            with np.load(path) as arrays:
+                offsets = {col: arrays[f'offsets_{col}'] for col in SCORE_CATEGORICAL}
+                return cls(arrays['weights'], arrays['intercept'], meta['categories'], offsets, meta['metrics'])
+        except (OSError, ValueError, KeyError):
+            return None
+
+
+def model_path(path=DATA_FILE, cache_dir=CACHE_DIR):
+    return os.path.splitext(cache_paths(path, cache_dir)[0])[0] + '.model.npz'
+
+
+def train_model(path=DATA_FILE, cache_dir=CACHE_DIR, l2=1.0):
+    """Train on the whole source file and save the artifact next to the cache"""
+    model = ChurnModel.fit(load_raw_data(path, cache_dir=cache_dir), l2=l2)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        model.save(model_path(path, cache_dir), dataset_version(path, cache_dir))
+    except OSError:
+        pass
+    return model
+
+
+def load_model(path=DATA_FILE, cache_dir=CACHE_DIR):
+    """Return the saved model for a source file, training it only when the source changed"""
+    model = ChurnModel.load(model_path(path, cache_dir), dataset_version(path, cache_dir))
+    return model if model is not None else train_model(path, cache_dir)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Train the churn scoring model for a data file')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--l2', type=float, default=1.0, help='L2 penalty on standardized coefficients')
+    args = parser.parse_args()
+
+    model = train_model(args.path, l2=args.l2)
+    print(model.coefficients().to_string(index=False))
+    print(', '.join(f'{key}: {value:.4g}' if isinstance(value, float) else f'{key}: {value}'
+                    for key, value in model.metrics.items()))
+    print(f'Saved to {model_path(args.path)}')
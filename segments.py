@@ -0,0 +1,166 @@
+# Top-k high-churn segments: combinations of dimension values (such as
+# Germany x 46-60 x inactive x 1 product) churning far above the baseline
+#
+#   python segments.py [path] --k 10 --min-support 0.01 --max-size 4
+#
+# The search runs over the cells of a ChurnCube, so its cost depends on the
+# number of cells (a few tens of thousands at most), never on the number of
+# customers.
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_DIMENSIONS
+from intervals import DEFAULT_CONFIDENCE, proportion_interval
+
+SEGMENT_DIMENSIONS = CUBE_DIMENSIONS
+SEGMENT_COLUMNS = ['Segment', 'Size', 'Customers', 'Exited', 'ChurnRate', 'Lower', 'Upper', 'Lift', 'Support',
+                   'Filters']
+RANK_BY = ['lower', 'lift', 'rate']
+
+
+class _Segment:
+    __slots__ = ('items', 'cells', 'last_dim', 'count', 'exited')
+
+    def __init__(self, items, cells, last_dim, count, exited):
+        self.items = items
+        self.cells = cells
+        self.last_dim = last_dim
+        self.count = count
+        self.exited = exited
+
+
+def _encode(cells, dimensions):
+    """Integer codes and values of every dimension of the cube cells
+
+    Cells without a value (code -1 from pd.factorize) get the extra code
+    len(values), which is never turned into a segment item.
+    """
+    codes, values = [], []
+    for dim in dimensions:
+        dim_codes, dim_values = pd.factorize(cells[dim], sort=True)
+        codes.append(np.where(dim_codes < 0, len(dim_values), dim_codes))
+        values.append(dim_values)
+    return codes, values
+
+
+def _best_subset_rate(items, rates):
+    """Highest churn rate among the evaluated segments one value smaller"""
+    subsets = (items[:i] + items[i + 1:] for i in range(len(items)))
+    return max(rates.get(subset, 0.0) for subset in subsets)
+
+
+def find_segments(cube, k=10, dimensions=SEGMENT_DIMENSIONS, min_support=0.01, min_lift=1.2, max_size=4,
+                  beam_width=200, min_improvement=0.01, rank_by='lower', method='wilson',
+                  confidence=DEFAULT_CONFIDENCE):
+    """Top-k segments of a cube by churn, with confidence intervals
+
+    The combination lattice is searched level by level, Apriori style: a
+    segment of size s + 1 extends a segment of size s with one value of a
+    later dimension, so every combination is generated once, and its counts
+    come from one np.bincount over the cells of its parent. Segments are
+    pruned when
+
+    - fewer than min_support of the customers fall in them (no extension
+      can gain customers), or
+    - even their min_support-sized subsets churning only their churners
+      could not reach min_lift (no extension can beat that bound).
+
+    Only the beam_width most promising segments of a level are extended,
+    which bounds the search on wide lattices. A segment is reported when
+    its lift over the overall churn rate is at least min_lift and its rate
+    beats every segment one value smaller (among those evaluated) by at
+    least min_improvement, so supersets that add nothing are dropped.
+    Segments are ranked by the lower bound of their interval ('lower', which
+    discounts small noisy segments), their 'lift' or their churn 'rate'.
+    """
+    if rank_by not in RANK_BY:
+        raise ValueError(f'Unknown ranking: {rank_by!r} (expected one of {RANK_BY})')
+    cells = cube.cells
+    counts = cells['Count'].to_numpy(dtype=np.float64)
+    exited = cells['Exited'].to_numpy(dtype=np.float64)
+    total, total_exited = counts.sum(), exited.sum()
+    if total == 0 or total_exited == 0:
+        return pd.DataFrame(columns=SEGMENT_COLUMNS)
+
+    baseline = total_exited / total
+    min_count = max(1, math.ceil(min_support * total))
+    codes, values = _encode(cells, dimensions)
+
+    found = []
+    rates = {(): baseline}
+    frontier = [_Segment((), np.arange(len(cells)), -1, total, total_exited)]
+    for size in range(1, max_size + 1):
+        children = []
+        for parent in frontier:
+            for d in range(parent.last_dim + 1, len(dimensions)):
+                dim_codes = codes[d][parent.cells]
+                n = len(values[d])
+                child_counts = np.bincount(dim_codes, weights=counts[parent.cells], minlength=n + 1)[:n]
+                child_exited = np.bincount(dim_codes, weights=exited[parent.cells], minlength=n + 1)[:n]
+                for v in np.flatnonzero(child_counts >= min_count):
+                    child = _Segment(parent.items + ((d, v),), None, d, child_counts[v], child_exited[v])
+                    rate = rates[child.items] = child.exited / child.count
+                    improvement = rate - _best_subset_rate(child.items, rates)
+                    if rate / baseline >= min_lift and improvement >= min_improvement:
+                        found.append(child)
+                    if size < max_size and child.exited / min_count / baseline >= min_lift:
+                        children.append((child, parent))
+
+        # Extend the segments with the most churners above the baseline first
+        children.sort(key=lambda pair: pair[0].exited - baseline * pair[0].count, reverse=True)
+        frontier = []
+        for child, parent in children[:beam_width]:
+            d, v = child.items[-1]
+            child.cells = parent.cells[codes[d][parent.cells] == v]
+            frontier.append(child)
+        if not frontier:
+            break
+
+    if not found:
+        return pd.DataFrame(columns=SEGMENT_COLUMNS)
+    n = np.array([s.count for s in found])
+    e = np.array([s.exited for s in found])
+    lower, upper = proportion_interval(e, n, method, confidence)
+    filters = [{dimensions[d]: values[d][v] for d, v in s.items} for s in found]
+    result = pd.DataFrame({
+        'Segment': [' × '.join(f'{dim}={value}' for dim, value in f.items()) for f in filters],
+        'Size': [len(s.items) for s in found],
+        'Customers': n.astype(np.int64),
+        'Exited': e.astype(np.int64),
+        'ChurnRate': e / n,
+        'Lower': lower,
+        'Upper': upper,
+        'Lift': e / n / baseline,
+        'Support': n / total,
+        'Filters': filters,
+    })
+    key = {'lower': 'Lower', 'lift': 'Lift', 'rate': 'ChurnRate'}[rank_by]
+    return result.sort_values([key, 'Customers'], ascending=False, kind='stable').head(k).reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    from cube import load_cube
+    from data_cache import DATA_FILE
+
+    parser = argparse.ArgumentParser(description='Find the customer segments churning most above the baseline')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--k', type=int, default=10)
+    parser.add_argument('--min-support', type=float, default=0.01, help='minimum share of customers')
+    parser.add_argument('--min-lift', type=float, default=1.2)
+    parser.add_argument('--max-size', type=int, default=4, help='most dimensions per segment')
+    parser.add_argument('--rank-by', choices=RANK_BY, default='lower')
+    args = parser.parse_args()
+
+    cube = load_cube(args.path)
+    start = time.perf_counter()
+    segments = find_segments(cube, args.k, min_support=args.min_support, min_lift=args.min_lift,
+                             max_size=args.max_size, rank_by=args.rank_by)
+    elapsed = time.perf_counter() - start
+    print(f'{len(cube.cells):,} cells, {cube.rows:,} customers, searched in {elapsed:.3f} s')
+    print(segments.drop(columns='Filters').to_string(index=False, float_format='{:.3f}'.format))
@@ -0,0 +1,47 @@
+# Read-only customer table shared by every dashboard session
+
+import pandas as pd
+
+
+def copy_on_write():
+    """Whether pandas copies on write: always from pandas 3, opt-in in pandas 2"""
+    return int(pd.__version__.split('.')[0]) >= 3 or pd.get_option('mode.copy_on_write') is True
+
+
+def snapshot(df):
+    """A copy of df that later writes to either side never reach: shallow
+    under copy-on-write, deep otherwise"""
+    return df.copy(deep=not copy_on_write())
+
+
+class SharedDataset:
+    """A customer table and its bitmap index, held once per process
+
+    Sessions call view() to get a shallow DataFrame over the shared column
+    buffers instead of a deserialized copy. Adding, reassigning or editing
+    columns on a view never reaches the shared table, and raw numpy writes
+    fail because the exposed arrays are read-only. Both rest on copy-on-write
+    (pandas 3, or pandas 2 with mode.copy_on_write set); without it every
+    view is a full copy. Nothing here changes process-wide pandas options.
+    """
+
+    def __init__(self, df, index=None):
+        self._df = df
+        self.index = index
+
+    def __len__(self):
+        return len(self._df)
+
+    @property
+    def nbytes(self):
+        return int(self._df.memory_usage(deep=True).sum())
+
+    def view(self):
+        """Return a view of the table (see snapshot)"""
+        return snapshot(self._df)
+
+    def filter(self, filters=None):
+        """Return the rows matching the filters, using the bitmap index"""
+        if not filters:
+            return self.view()
+        return self.index.filter(self._df, filters)
@@ -0,0 +1,233 @@
+# Monte Carlo what-if simulation of retention interventions over the churn cube
+#
+#   python simulation.py --segment IsActiveMember=0 --convert IsActiveMember=1 --share 0.2
+#   python simulation.py --segment ZeroBalance=True --reduce 0.1 --share 0.5 --trials 20000
+#
+# Trials are vectorized over customer strata (cube cells rolled up to a few
+# churn drivers), never over customers, so the cost is trials x strata
+# whatever the population size.
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from cube import CUBE_MEASURES
+
+STRATA = ['Geography', 'Gender', 'AgeGroup', 'NumOfProducts', 'IsActiveMember', 'ZeroBalance']
+DEFAULT_TRIALS = 10_000
+BATCH_TRIALS = 1_000
+DEFAULT_INTERVAL = 0.9
+
+
+class SimulationResult:
+    """Per-trial churned customers and balance at risk, without and with the intervention"""
+
+    def __init__(self, baseline_churned, scenario_churned, baseline_balance, scenario_balance,
+                 segment_customers, reached_customers, seconds):
+        self.baseline_churned = baseline_churned
+        self.scenario_churned = scenario_churned
+        self.baseline_balance = baseline_balance
+        self.scenario_balance = scenario_balance
+        self.segment_customers = segment_customers
+        self.reached_customers = reached_customers
+        self.seconds = seconds
+
+    @property
+    def trials(self):
+        return len(self.baseline_churned)
+
+    @property
+    def saved_churners(self):
+        return self.baseline_churned - self.scenario_churned
+
+    @property
+    def retained_balance(self):
+        return self.baseline_balance - self.scenario_balance
+
+    def summary(self, interval=DEFAULT_INTERVAL):
+        """Mean, median and central interval of every simulated quantity"""
+        tail = (1 - interval) / 2
+        rows = {
+            'Churned customers (baseline)': self.baseline_churned,
+            'Churned customers (scenario)': self.scenario_churned,
+            'Churners saved': self.saved_churners,
+            'Balance at risk (baseline)': self.baseline_balance,
+            'Balance at risk (scenario)': self.scenario_balance,
+            'Balance retained': self.retained_balance,
+        }
+        return pd.DataFrame([(name, values.mean(), *np.quantile(values, [tail, 0.5, 1 - tail]))
+                             for name, values in rows.items()],
+                            columns=['Quantity', 'Mean', 'Lower', 'Median', 'Upper']).set_index('Quantity')
+
+
+def _segment_mask(cells, segment):
+    mask = np.ones(len(cells), dtype=bool)
+    for dim, allowed in (segment or {}).items():
+        if not isinstance(allowed, (list, tuple, set)):
+            allowed = [allowed]
+        mask &= cells[dim].isin(list(allowed)).to_numpy()
+    return mask
+
+
+def _conversion_targets(cells, reached, dim, value):
+    """Position of the cell every reached cell converts into (same strata but
+    dim=value), or -1 when no customer of the population is there"""
+    keys = [col for col in cells.columns if col not in CUBE_MEASURES and col != dim]
+    positions = np.flatnonzero(cells[dim] == value)
+    if not keys:
+        return np.full(reached.sum(), positions[0] if len(positions) else -1)
+    targets = cells.loc[positions, keys].assign(_target=positions)
+    matched = cells.loc[reached, keys].merge(targets, on=keys, how='left')
+    return matched['_target'].fillna(-1).to_numpy(dtype=np.int64)
+
+
+def simulate_retention(cube, segment, share, convert=None, reduction=None, trials=DEFAULT_TRIALS, seed=0,
+                       strata=STRATA):
+    """Distribution of churned customers and balance at risk under an intervention
+
+    The intervention reaches share of the segment's customers (a cube
+    filter, e.g. {'IsActiveMember': 0}). With convert=(dimension, value) the
+    reached customers move to that value and churn like the customers
+    already there who match them on every stratum, e.g. "convert 20% of
+    inactive members to active"; customers without such a match fall back
+    to the segment-wide rate ratio. With reduction=r their churn
+    probability drops by the fraction r instead.
+
+    Every trial draws the churn probability of each stratum from its Beta
+    posterior (Exited + 1, stayed + 1) and its churners from a binomial; the
+    scenario removes (or adds) the reached customers whose churn the
+    intervention changes. It shares the probability draws and every churner
+    the intervention does not affect with the baseline, so their difference
+    is not swamped by sampling noise. Strata the intervention does not reach
+    enter as one normal total. Balance at risk weights churners by the
+    average balance of the stratum's churned customers.
+    """
+    if (convert is None) == (reduction is None):
+        raise ValueError('Pass exactly one intervention: convert=(dimension, value) or reduction')
+    if not 0 <= share <= 1 or (reduction is not None and not 0 <= reduction <= 1):
+        raise ValueError('share and reduction are fractions between 0 and 1')
+    start = time.perf_counter()
+
+    dims = list(dict.fromkeys(list(strata) + list(segment or {}) + ([convert[0]] if convert else [])))
+    # dropna=False keeps customers outside every age band (AgeGroup NaN)
+    cells = cube.cells.groupby(dims, observed=True, dropna=False)[CUBE_MEASURES].sum().reset_index()
+    cells = cells[cells['Count'] > 0].reset_index(drop=True)
+    counts = cells['Count'].to_numpy(dtype=np.int64)
+    exited = cells['Exited'].to_numpy(dtype=np.float64)
+    balance = np.where(exited > 0, cells['BalanceExited'] / np.maximum(exited, 1), cells['Balance'] / counts)
+
+    in_segment = _segment_mask(cells, segment)
+    reached = in_segment.copy()
+    if convert is not None:
+        dim, value = convert
+        reached &= (cells[dim] != value).to_numpy()
+        targets = _conversion_targets(cells, reached, dim, value)
+        at_value = (cells[dim] == value).to_numpy()
+        target_rate = exited[at_value].sum() / max(counts[at_value].sum(), 1)
+        source_rate = exited[reached].sum() / max(counts[reached].sum(), 1)
+        fallback_ratio = target_rate / source_rate if source_rate else 1.0
+    reached_counts = counts[reached]
+
+    # Strata the intervention does not reach churn alike in the baseline and
+    # the scenario, so only their total matters: it is drawn from a normal
+    # with the exact Beta-binomial mean and (count, balance) covariance
+    # instead of per-stratum draws
+    a, b = exited + 1, counts - exited + 1
+    mean = a / (a + b)
+    variance = counts * mean * (1 - mean) * (a + b + counts) / (a + b + 1)
+    other = ~reached
+    count_mean, balance_mean = (counts * mean)[other].sum(), (counts * mean * balance)[other].sum()
+    count_var, balance_var = variance[other].sum(), (variance * balance ** 2)[other].sum()
+    # Balance given the count: the regression on the count plus independent
+    # noise (the covariance is often singular, e.g. zero balances)
+    slope = (variance * balance)[other].sum() / count_var if count_var > 0 else 0.0
+    residual_sd = np.sqrt(max(balance_var - slope ** 2 * count_var, 0.0))
+
+    # Probabilities are only drawn for the reached strata and the strata they convert into
+    drawn = np.flatnonzero(reached)
+    if convert is not None:
+        drawn = np.union1d(drawn, targets[targets >= 0])
+    column = np.full(len(counts), -1)
+    column[drawn] = np.arange(len(drawn))
+    reached_cols = column[reached]
+    reached_balance = balance[reached]
+
+    rng = np.random.default_rng(seed)
+    baseline_churned, scenario_churned = np.empty(trials), np.empty(trials)
+    baseline_balance, scenario_balance = np.empty(trials), np.empty(trials)
+    for first in range(0, trials, BATCH_TRIALS):
+        batch = slice(first, min(first + BATCH_TRIALS, trials))
+        size = batch.stop - batch.start
+        count_noise = np.sqrt(count_var) * rng.standard_normal(size)
+        other_churned = np.maximum(count_mean + count_noise, 0)
+        other_balance = balance_mean + slope * count_noise + residual_sd * rng.standard_normal(size)
+        p = rng.beta(a[drawn], b[drawn], size=(size, len(drawn)))
+
+        # Reached strata: every customer is reached independently with
+        # probability share, so the scenario thins the baseline churners (or
+        # converts some baseline stayers) and only differs from the baseline
+        # by the effect of the intervention
+        p_reached = p[:, reached_cols]
+        if convert is not None:
+            p_new = np.where(targets >= 0, p[:, column[np.maximum(targets, 0)]],
+                             np.minimum(p_reached * fallback_ratio, 1))
+        else:
+            p_new = p_reached * (1 - reduction)
+        churned = rng.binomial(reached_counts, p_reached)
+        removed = rng.binomial(churned, share * np.clip(1 - p_new / np.maximum(p_reached, 1e-12), 0, 1))
+        added = rng.binomial(reached_counts - churned,
+                             share * np.clip((p_new - p_reached) / np.maximum(1 - p_reached, 1e-12), 0, 1))
+        scenario = churned - removed + added
+
+        baseline_churned[batch] = other_churned + churned.sum(axis=1)
+        scenario_churned[batch] = other_churned + scenario.sum(axis=1)
+        baseline_balance[batch] = other_balance + churned @ reached_balance
+        scenario_balance[batch] = other_balance + scenario @ reached_balance
+
+    return SimulationResult(baseline_churned, scenario_churned, baseline_balance, scenario_balance,
+                            int(counts[in_segment].sum()), share * reached_counts.sum(),
+                            time.perf_counter() - start)
+
+
+def typed_filters(cube, filters):
+    """Map string filter values (e.g. from the command line) to the cube's values"""
+    typed = {}
+    for dim, values in filters.items():
+        known = {str(value): value for value in cube.cells[dim].unique()}
+        unknown = [value for value in values if value not in known]
+        if unknown:
+            raise ValueError(f'Unknown {dim} value(s): {", ".join(unknown)} (expected one of {", ".join(known)})')
+        typed[dim] = [known[value] for value in values]
+    return typed
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from cube import load_cube
+    from data_cache import DATA_FILE
+    from export import parse_filters
+
+    parser = argparse.ArgumentParser(description='Simulate the effect of a retention intervention on churn')
+    parser.add_argument('path', nargs='?', default=DATA_FILE)
+    parser.add_argument('--segment', action='append', default=[], metavar='COLUMN=VALUE[,VALUE...]',
+                        help='customers targeted; repeat to combine columns')
+    intervention = parser.add_mutually_exclusive_group(required=True)
+    intervention.add_argument('--convert', metavar='COLUMN=VALUE', help='move reached customers to this value')
+    intervention.add_argument('--reduce', type=float, help='relative churn reduction of reached customers')
+    parser.add_argument('--share', type=float, default=0.2, help='share of the segment reached')
+    parser.add_argument('--trials', type=int, default=DEFAULT_TRIALS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    cube = load_cube(args.path)
+    segment = typed_filters(cube, parse_filters(args.segment))
+    convert = None
+    if args.convert:
+        (dim, values), = typed_filters(cube, parse_filters([args.convert])).items()
+        convert = (dim, values[0])
+    result = simulate_retention(cube, segment, args.share, convert, args.reduce, args.trials, args.seed)
+    print(f'{result.segment_customers:,} customers in the segment, {result.reached_customers:,.0f} reached; '
+          f'{result.trials:,} trials in {result.seconds:.3f} s')
+    print(result.summary().to_string(float_format='{:,.1f}'.format))
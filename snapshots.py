@@ -0,0 +1,174 @@
+# Monthly snapshots of the customer table and the churn trends across them
+#
+#   python snapshots.py --register exports/Bank_Churn_2026-09.xlsx [--month 2026-09]
+#   python snapshots.py [--workers 4] [--dimension Geography]
+#
+# Snapshots are registered in .cache/snapshots.json (month -> file). Every
+# snapshot keeps its own Arrow cache and churn cube in .cache/snapshots/<month>/,
+# so registering a new month only processes that month's file.
+
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from aggregates import ChurnAggregates
+from cube import CUBE_DIMENSIONS, ChurnCube, cube_path
+from data_cache import CACHE_DIR, dataset_version, load_raw_data
+from features import add_derived_columns
+
+REGISTRY_FILE = os.path.join(CACHE_DIR, 'snapshots.json')
+MONTH_PATTERN = re.compile(r'(\d{4})[-_]?(0[1-9]|1[0-2])')
+TREND_COLUMNS = ['Month', 'Dimension', 'Value', 'Count', 'Exited', 'ChurnRate', 'AvgBalance',
+                 'ChurnRateChange', 'CountChange']
+
+
+def snapshot_month(path):
+    """The YYYY-MM month in a snapshot file name"""
+    match = MONTH_PATTERN.search(os.path.basename(path))
+    if match is None:
+        raise ValueError(f'No YYYY-MM month in {path}; pass the month explicitly')
+    return f'{match.group(1)}-{match.group(2)}'
+
+
+def load_registry(registry=REGISTRY_FILE):
+    """Registered snapshots as {month: path}, oldest first"""
+    try:
+        with open(registry) as f:
+            return dict(sorted(json.load(f).items()))
+    except (OSError, ValueError):
+        return {}
+
+
+def register_snapshot(path, month=None, registry=REGISTRY_FILE):
+    """Register (or replace) the snapshot of a month; returns the month"""
+    if not os.path.exists(path):
+        raise FileNotFoundError(path)
+    match = MONTH_PATTERN.fullmatch(month or snapshot_month(path))
+    if match is None:
+        raise ValueError(f'Months look like YYYY-MM, got {month!r}')
+    month = f'{match.group(1)}-{match.group(2)}'
+    snapshots = load_registry(registry)
+    snapshots[month] = os.path.abspath(path)
+    os.makedirs(os.path.dirname(registry) or '.', exist_ok=True)
+    tmp = f'{registry}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(dict(sorted(snapshots.items())), f, indent=2)
+    os.replace(tmp, registry)
+    return month
+
+
+def snapshots_version(snapshots):
+    """Fingerprint of the registered files (names, sizes and mtimes; nothing is read)"""
+    digest = hashlib.sha256()
+    for month, path in sorted(snapshots.items()):
+        stat = os.stat(path)
+        digest.update(f'{month}:{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return digest.hexdigest()
+
+
+def snapshot_cache_dir(month, cache_dir=CACHE_DIR):
+    return os.path.join(cache_dir, 'snapshots', month)
+
+
+def _build_snapshot(task):
+    """Load, enrich and aggregate one snapshot, persisting its cube (runs in a worker)"""
+    month, path, cache_dir = task
+    df = load_raw_data(path, cache_dir=cache_dir)
+    bounds = ChurnAggregates.from_frame(df).credit_score_bounds()
+    cube = ChurnCube(credit_score_bounds=bounds).update(add_derived_columns(df, bounds))
+    try:
+        cube.save(cube_path(path, cache_dir), dataset_version(path, cache_dir))
+    except (OSError, ImportError):
+        pass
+    return month, cube
+
+
+def load_snapshots(snapshots=None, workers=1, cache_dir=CACHE_DIR):
+    """Churn cubes of the snapshots, {month: ChurnCube} oldest first
+
+    Cubes persisted for the current version of their file are loaded as
+    they are; the others are built over a pool of workers processes, one
+    snapshot per task.
+    """
+    snapshots = load_registry() if snapshots is None else snapshots
+    cubes, stale = {}, []
+    for month, path in snapshots.items():
+        month_dir = snapshot_cache_dir(month, cache_dir)
+        os.makedirs(month_dir, exist_ok=True)
+        cube = ChurnCube.load(cube_path(path, month_dir), dataset_version(path, month_dir))
+        if cube is None:
+            stale.append((month, path, month_dir))
+        else:
+            cubes[month] = cube
+
+    if workers > 1 and len(stale) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as pool:
+            cubes.update(pool.map(_build_snapshot, stale))
+    else:
+        cubes.update(map(_build_snapshot, stale))
+    return dict(sorted(cubes.items()))
+
+
+def snapshot_trends(cubes, dimensions=CUBE_DIMENSIONS, filters=None):
+    """Month-over-month churn of every dimension value (and overall)
+
+    One row per month, dimension and value, with the change in churn rate
+    (in rate points) and in customers since the previous snapshot.
+    filters slices every cube first, e.g. {'Geography': 'Germany'}.
+    """
+    rows = []
+    for month, cube in cubes.items():
+        cube = cube.slice(filters)
+        rows.append((month, 'Overall', 'All', cube.rows, cube.total_exited,
+                     cube.overall_churn_rate(), cube.cells['Balance'].sum() / cube.rows if cube.rows else None))
+        for dim in dimensions:
+            table = cube.table(dim)
+            for value, row in table.iterrows():
+                rows.append((month, dim, str(value), row['Count'], row['Exited'], row['ChurnRate'],
+                             row['Balance'] / row['Count']))
+    trends = pd.DataFrame(rows, columns=TREND_COLUMNS[:-2]).astype({'Count': 'int64', 'Exited': 'int64'})
+    trends['Dimension'] = pd.Categorical(trends['Dimension'], ['Overall'] + list(dimensions))
+    trends = trends.sort_values(['Dimension', 'Month'], kind='stable').reset_index(drop=True)
+    groups = trends.groupby(['Dimension', 'Value'], observed=True, sort=False)
+    trends['ChurnRateChange'] = groups['ChurnRate'].diff()
+    trends['CountChange'] = groups['Count'].diff()
+    return trends
+
+
+def month_deltas(trends, month=None):
+    """Per-segment changes into one month (the latest by default), largest churn moves first"""
+    month = month or trends['Month'].max()
+    deltas = trends[(trends['Month'] == month) & trends['ChurnRateChange'].notna()]
+    order = deltas['ChurnRateChange'].abs().sort_values(ascending=False, kind='stable').index
+    return deltas.loc[order].reset_index(drop=True)
+
+
+if __name__ == '__main__':
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description='Register monthly snapshots and report churn trends')
+    parser.add_argument('--register', metavar='FILE', nargs='+', help='snapshot files to register')
+    parser.add_argument('--month', help='month of a single registered file (default: from its name)')
+    parser.add_argument('--workers', type=int, default=1, help='processes building new snapshots')
+    parser.add_argument('--dimension', default='Overall', help='dimension to print the trend of')
+    args = parser.parse_args()
+
+    for path in args.register or []:
+        print(f'Registered {register_snapshot(path, args.month if len(args.register) == 1 else None)}: {path}')
+
+    start = time.perf_counter()
+    cubes = load_snapshots(workers=args.workers)
+    elapsed = time.perf_counter() - start
+    if not cubes:
+        parser.exit(message='No snapshots registered (use --register FILE)\n')
+    print(f'{len(cubes)} snapshots loaded in {elapsed:.2f} s')
+    trends = snapshot_trends(cubes)
+    print(trends[trends['Dimension'] == args.dimension].to_string(index=False, float_format='{:.4f}'.format))
+    if len(cubes) > 1:
+        print(f'\nLargest moves into {max(cubes)}:')
+        print(month_deltas(trends).head(10).to_string(index=False, float_format='{:.4f}'.format))
@@ -0,0 +1,229 @@
+# Out-of-core chunked ingestion of customer data
+
+import glob
+import io
+import mmap
+import os
+
+import pandas as pd
+
+from aggregates import ChurnAggregates
+from data_cache import build_cache, cache_paths, cache_status, feather
+from features import NUMERICAL_COLS
+from quantiles import DEFAULT_K, ColumnSketches, count_outliers
+from schema import SOURCE_DTYPES
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def _iter_excel(path, chunksize):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = list(next(rows))
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+
+def _iter_parquet(path, chunksize):
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def _iter_arrow(path, chunksize):
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        table = pa.ipc.open_file(source).read_all()
+        for batch in table.to_batches(max_chunksize=chunksize):
+            yield batch.to_pandas()
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Yield a customer file (or a directory of partitions) as bounded-size DataFrames
+
+    Supports CSV, Parquet, Arrow IPC and Excel. Excel workbooks are read from
+    the columnar cache when it is up to date, otherwise row by row through
+    openpyxl's read-only mode.
+    """
+    if os.path.isdir(path):
+        for part in sorted(glob.glob(os.path.join(path, '*'))):
+            yield from iter_chunks(part, chunksize)
+        return
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        yield from pd.read_csv(path, chunksize=chunksize)
+    elif ext == '.parquet':
+        yield from _iter_parquet(path, chunksize)
+    elif ext in ('.arrow', '.feather'):
+        yield from _iter_arrow(path, chunksize)
+    elif ext in ('.xlsx', '.xlsm'):
+        valid, _ = cache_status(path)
+        if valid:
+            yield from _iter_arrow(cache_paths(path)[0], chunksize)
+        else:
+            yield from _iter_excel(path, chunksize)
+    else:
+        raise ValueError(f'Unsupported file type: {path}')
+
+
+def _arrow_rows(path):
+    import pyarrow as pa
+
+    with pa.memory_map(path) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+
+def _row_starts(data, step):
+    """Offsets of rows about step bytes apart, from the row after the header
+
+    A row starts after a newline outside quoted fields: the parity of the
+    quote characters is followed from the start of the file, so a quoted
+    field spanning lines is never split.
+    """
+    quotes, pos, target = 0, 0, 0
+    while True:
+        quotes += data[pos:target].count(b'"')
+        pos = max(pos, target)
+        while True:
+            end = data.find(b'\n', pos)
+            if end < 0:
+                return
+            quotes += data[pos:end].count(b'"')
+            pos = end + 1
+            if quotes % 2 == 0:
+                break
+        if pos < len(data):
+            yield pos
+        target = pos + step - 1
+
+
+def _csv_ranges(path, chunksize):
+    """Byte ranges of about chunksize rows each, after the header line, that
+    start and end on row boundaries"""
+    size = os.path.getsize(path)
+    if not size:
+        return []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        header = data.find(b'\n') + 1
+        sample = data[header:header + (1 << 20)]
+        row_bytes = len(sample) / max(sample.count(b'\n'), 1) if sample else 1
+        starts = list(_row_starts(data, max(int(row_bytes * chunksize), 1 << 16)))
+    return list(zip(starts, starts[1:] + [size]))
+
+
+def _read_csv_range(path, start, stop, columns=None):
+    """Parse one range of _csv_ranges (about chunksize rows) in one go"""
+    with open(path, 'rb') as f:
+        names = pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns
+        f.seek(start)
+        data = f.read(stop - start)
+    dtype = {col: SOURCE_DTYPES[col] for col in names if col in SOURCE_DTYPES}
+    return pd.read_csv(io.BytesIO(data), header=None, names=names, dtype=dtype, usecols=columns)
+
+
+def partitions(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Split a customer file (or a directory of them) into pieces readable independently
+
+    Every piece is a small (kind, path, start, stop) tuple that any process
+    can turn into DataFrames with read_partition, so workers parse their own
+    rows instead of receiving them from a reader: row ranges of about
+    chunksize rows of an Arrow IPC file (memory-mapped), row groups of a
+    Parquet file, byte ranges of a CSV file. Excel workbooks go through their
+    columnar cache, which is built first when it is missing or stale.
+    """
+    if os.path.isdir(path):
+        return [part for name in sorted(glob.glob(os.path.join(path, '*')))
+                for part in partitions(name, chunksize)]
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        if feather is None:
+            return [('excel', path, None, None)]
+        if not cache_status(path)[0]:
+            build_cache(path)
+        path, ext = cache_paths(path)[0], '.arrow'
+    if ext in ('.arrow', '.feather'):
+        rows = _arrow_rows(path)
+        return [('arrow', path, start, min(start + chunksize, rows)) for start in range(0, rows, chunksize)]
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+
+        return [('parquet', path, i, i + 1) for i in range(pq.ParquetFile(path).metadata.num_row_groups)]
+    if ext == '.csv':
+        return [('csv', path, start, stop) for start, stop in _csv_ranges(path, chunksize)]
+    raise ValueError(f'Unsupported file type: {path}')
+
+
+def read_partition(part, chunksize=DEFAULT_CHUNKSIZE, columns=None):
+    """Yield the rows of one piece from partitions() as bounded-size DataFrames
+
+    columns, when given, limits the columns read (columnar pieces then never
+    decode the others).
+    """
+    kind, path, start, stop = part
+    if kind == 'arrow':
+        import pyarrow as pa
+
+        with pa.memory_map(path) as source:
+            table = pa.ipc.open_file(source).read_all()
+            if columns is not None:
+                table = table.select(columns)
+            for offset in range(start, stop, chunksize):
+                yield table.slice(offset, min(chunksize, stop - offset)).to_pandas()
+    elif kind == 'parquet':
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, row_groups=range(start, stop),
+                                                       columns=columns):
+            yield batch.to_pandas()
+    elif kind == 'csv':
+        yield _read_csv_range(path, start, stop, columns)
+    else:
+        for chunk in _iter_excel(path, chunksize):
+            yield chunk if columns is None else chunk[columns]
+
+
+def stream_aggregates(path, chunksize=DEFAULT_CHUNKSIZE):
+    """Build churn aggregates over a whole file in constant memory"""
+    agg = ChurnAggregates()
+    for chunk in iter_chunks(path, chunksize):
+        agg.update(chunk)
+    return agg
+
+
+def stream_sketches(path, columns=NUMERICAL_COLS, chunksize=DEFAULT_CHUNKSIZE, k=DEFAULT_K):
+    """Build quantile sketches of the numerical columns over a whole file"""
+    sketches = ColumnSketches(columns, k)
+    for chunk in iter_chunks(path, chunksize):
+        sketches.update(chunk)
+    return sketches
+
+
+def stream_outliers(path, columns=NUMERICAL_COLS, chunksize=DEFAULT_CHUNKSIZE, k=DEFAULT_K):
+    """Approximate IQR fences and exact outlier counts over a whole file
+
+    The first pass builds the sketches, the second counts the rows outside
+    their fences, so memory stays bounded by the chunk size.
+    """
+    sketches = stream_sketches(path, columns, chunksize, k)
+    bounds = sketches.bounds()
+    counts = dict.fromkeys(columns, 0)
+    for chunk in iter_chunks(path, chunksize):
+        for col, count in count_outliers(chunk, bounds).items():
+            counts[col] += count
+    return sketches.outlier_table(counts)
@@ -1,12 +1,45 @@
 # Bank Customer Churn Analysis - Streamlit Dashboard
 
+import hashlib
+import os
+import time
+from contextlib import nullcontext
+
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
+
+from bitmaps import FILTER_DIMENSIONS, BitmapIndex
+from bundle import open_bundle
+from cube import CUBE_DIMENSIONS, ChurnCube, load_cube
+from dashboard_figures import (
+    create_activity_analysis, create_age_group_churn, create_association_chart, create_balance_boxplot,
+    create_balance_histogram, create_balance_products_analysis, create_correlation_heatmap,
+    create_credit_score_analysis, create_gender_churn_pie, create_geography_churn, create_products_analysis,
+    create_score_by_geography, create_score_histogram, create_segment_chart, create_simulation_chart,
+    create_tenure_analysis, create_trend_chart, figure_key)
+from data_cache import CACHE_DIR, DATA_FILE, load_raw_data
+from features import SAMPLE_ROWS, add_derived_columns, credit_score_bounds
+from instrumentation import TIMINGS, timed
+from intervals import CI_METHODS
+from profiling import profile_dataset, profile_frame
+from quantiles import QUANTILE_MODES
+from shared_store import SharedDataset
+
+FILTER_LABELS = {
+    'Geography': 'Country',
+    'Gender': 'Gender',
+    'AgeGroup': 'Age Group',
+    'NumOfProducts': 'Number of Products',
+    'IsActiveMember': 'Active Member',
+    'HasCrCard': 'Credit Card Holder',
+}
+# Prometheus text file rewritten after every page run, when set
+METRICS_FILE = os.environ.get('CHURN_METRICS_FILE')
+
+FILTER_FORMATS = {
+    'IsActiveMember': lambda value: 'Yes' if value else 'No',
+    'HasCrCard': lambda value: 'Yes' if value else 'No',
+}
 
 # Set page configuration
 st.set_page_config(
@@ -39,212 +72,278 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)   
 
-@st.cache_data  
-def load_data():
-    """Load and preprocess the dataset"""
-    data = pd.read_excel('Bank_Churn.xlsx')
-    df = data.head(5000).copy()
-    
-    # Add age groups
-    df['AgeGroup'] = pd.cut(df['Age'], bins=[18, 30, 45, 60, 92], labels=['18-30', '31-45', '46-60', '60+'])
-    
-    # Add credit score categories
-    Q1 = df['CreditScore'].quantile(0.25)
-    Q3 = df['CreditScore'].quantile(0.75)
-    IQR = Q3 - Q1
-    lower_bound = Q1 - 1.5 * IQR
-    upper_bound = Q3 + 1.5 * IQR
-    
-    df['CreditScoreCategory'] = 'Normal'
-    df.loc[df['CreditScore'] < lower_bound, 'CreditScoreCategory'] = 'Low'
-    df.loc[df['CreditScore'] > upper_bound, 'CreditScoreCategory'] = 'High'
+@st.cache_resource
+def load_store():
+    """The customer table kept current from the delta files (see incremental.py)"""
+    from incremental import CustomerStore
+
+    return CustomerStore.from_source(DATA_FILE)
+
+def has_deltas():
+    """Whether delta files are queued for the data file"""
+    from incremental import delta_files
+
+    return bool(delta_files(DATA_FILE))
+
+def current_version():
+    """Version of the data file and its deltas, applying deltas that arrived
+    since the last run; the loaders below take it as a cache key, so a new
+    version is picked up without restarting the server"""
+    from incremental import delta_files, delta_version
+
+    if not delta_files(DATA_FILE):
+        return delta_version(DATA_FILE)
+    store = load_store()
+    store.refresh()
+    return store.version
+
+@st.cache_resource(max_entries=1)
+def open_warm_bundle(version=None):
+    bundle = open_bundle(DATA_FILE)
+    return bundle if bundle is not None and version in (None, bundle.version) else None
+
+def load_bundle(version=None):
+    """The prebuilt warm-start bundle of the current data file (see bundle.py), or None
+
+    Bundles are built from the base file, so none is used once deltas apply.
+    A miss is not kept, so a bundle built while the server runs is picked up
+    on the next run.
+    """
+    bundle = open_warm_bundle(version)
+    if bundle is None:
+        open_warm_bundle.clear()
+    return bundle
+
+def warm_bundle(quantile_mode='auto', version=None):
+    """The warm-start bundle when it was built for this quantile mode"""
+    bundle = load_bundle(version)
+    return bundle if bundle is not None and bundle.quantile_mode == quantile_mode else None
+
+@st.cache_resource(max_entries=len(QUANTILE_MODES))
+@timed()
+def load_data(quantile_mode='auto', version=None):
+    """Load and preprocess the dataset
+
+    Held once per server process and shared read-only by every session
+    (see shared_store.SharedDataset) instead of being copied per rerun;
+    at most one table per quantile mode is kept, so a new data version
+    evicts the superseded one.
+    The enriched table comes from the warm-start bundle when there is one,
+    and from the delta-maintained store when there are deltas.
+    """
+    bundle = warm_bundle(quantile_mode, version)
+    if bundle is not None:
+        df = bundle.table()
+    elif has_deltas():
+        df = load_store().sample(mode=quantile_mode)
+    else:
+        df = load_raw_data(DATA_FILE, compact=True).head(SAMPLE_ROWS).copy()
+        
+        # Add age groups, credit score categories and zero balance indicator
+        add_derived_columns(df, mode=quantile_mode)
     
-    # Add zero balance indicator
-    df['ZeroBalance'] = df['Balance'] == 0
+    # Bitmap indexes for the sidebar filters
+    index = BitmapIndex(df)
     
-    return df
+    return SharedDataset(df, index)
+
+@st.cache_data
+def load_aggregates(full_population=False, workers=1, version=None, quantile_mode='auto'):
+    """Load the churn cube for the sample or the full population
+
+    The full-population cube is persisted next to the data cache and only
+    rebuilt (in chunked passes, over workers processes) when the source
+    file changes; with deltas it is the one the store maintains. The sample
+    cube is built from the table the page renders, so its CreditScoreCategory
+    bounds follow the same quantile mode.
+    """
+    if full_population:
+        if has_deltas():
+            return load_store().population_cube()
+        return load_cube(DATA_FILE, workers=workers)
+    bundle = warm_bundle(quantile_mode, version)
+    if bundle is not None:
+        return bundle.cube()
+    return ChurnCube.from_frame(load_data(quantile_mode, version).view())
+
+@st.cache_data
+def load_profile(quantile_mode='auto', filters=None, version=None):
+    """Profile the dataset once (cached on disk by dataset fingerprint) or a filtered view of it"""
+    shared = load_data(quantile_mode, version)
+    if filters:
+        return profile_frame(shared.filter(filters), mode=quantile_mode)
+    bundle = warm_bundle(quantile_mode, version)
+    if bundle is not None:
+        return bundle.summary('profile')
+    return profile_dataset(shared.view(), quantile_mode)
+
+@st.cache_data
+def load_memory_report(version=None):
+    """Memory per column of the raw-dtype table against the compact one in use"""
+    from schema import memory_report
+
+    bundle = load_bundle(version)
+    if bundle is not None:
+        return bundle.summary('memory_report')
+    if has_deltas():
+        store = load_store()
+        raw = add_derived_columns(store.table[store.columns].head(SAMPLE_ROWS).reset_index(drop=True))
+    else:
+        raw = add_derived_columns(load_raw_data(DATA_FILE).head(SAMPLE_ROWS).copy())
+    return memory_report(raw, load_data(version=version).view())
+
+@st.cache_data
+def load_population_outliers(workers=1, version=None):
+    """Outlier counts over the full population, against sketched IQR bounds
+    (exact ones, maintained by delta, when there are deltas)"""
+    from parallel import population_outliers
+
+    bundle = load_bundle(version)
+    if bundle is not None:
+        return bundle.summary('population_outliers')
+    if has_deltas():
+        return load_store().outliers()[['Column', 'Outlier_Count']]
+    return population_outliers(DATA_FILE, workers)
+
+@st.cache_data
+def load_population_moments(workers=1, version=None):
+    """Co-moments of the correlation columns over the full population, in one chunked pass"""
+    from parallel import population_aggregates
+
+    bundle = load_bundle(version)
+    if bundle is not None:
+        return bundle.summary('population_moments')
+    if has_deltas():
+        return load_store().aggregates.moments
+    return population_aggregates(DATA_FILE, workers).moments
+
+@st.cache_resource(max_entries=1)
+def load_customer_index(full_population=False, workers=1, version=None, quantile_mode='auto'):
+    """Lookup indexes (see lookup.py) and filter bitmaps over the sample or the full population
+
+    Only the latest index is kept: a new data version or scope replaces it.
+    Full-population CreditScoreCategory uses the exact bounds of the
+    full-population cube, so a customer is in the category the cube counts.
+    """
+    from lookup import CustomerIndex
+
+    if not full_population:
+        shared = load_data(quantile_mode, version)
+        return CustomerIndex(shared.view()), shared.index
+    if has_deltas():
+        store = load_store()
+        df = store.table[store.columns].reset_index(drop=True)
+    else:
+        df = load_raw_data(DATA_FILE, compact=True)
+    add_derived_columns(df, load_aggregates(True, workers, version).bounds)
+    return CustomerIndex(df), BitmapIndex(df)
 
-def calculate_outliers(df):
+@st.cache_data
+def load_snapshot_cubes(registry_version, workers=1):
+    """Churn cubes of the registered monthly snapshots; only new or changed snapshots are processed"""
+    from snapshots import load_snapshots
+
+    return load_snapshots(workers=workers)
+
+@st.cache_data
+def load_simulation(full_population, workers, version, filters, segment, share, convert=None, reduction=None,
+                    trials=None, quantile_mode='auto'):
+    """Monte Carlo trials of a retention scenario over the selected customers, cached per scenario"""
+    from simulation import DEFAULT_TRIALS, simulate_retention
+
+    cube = load_aggregates(full_population, workers, version, quantile_mode).slice(filters)
+    return simulate_retention(cube, segment, share, convert, reduction, trials or DEFAULT_TRIALS)
+
+@st.cache_resource
+def load_scoring_model():
+    """Load the trained churn model (trained once and saved next to the data cache)"""
+    from scoring import load_model
+
+    return load_model(DATA_FILE)
+
+def sidebar_filters(index):
+    """Render the sidebar filters and return the selected values per dimension"""
+    filters = {}
+    with st.sidebar.expander("🔎 Filter Customers"):
+        for col in FILTER_DIMENSIONS:
+            selected = st.multiselect(FILTER_LABELS[col], index.values(col),
+                                      format_func=FILTER_FORMATS.get(col, str))
+            if selected:
+                filters[col] = selected
+    return filters
+
+def export_source(full_population, workers, quantile_mode, version):
+    """Raw chunks, CreditScore fences and row limit of the customers behind the current view"""
+    from streaming import DEFAULT_CHUNKSIZE, iter_chunks
+
+    if has_deltas():
+        store = load_store()
+        table, columns = store.table, store.columns
+        chunks = (table.iloc[i:i + DEFAULT_CHUNKSIZE][columns] for i in range(0, len(table), DEFAULT_CHUNKSIZE))
+    else:
+        chunks = iter_chunks(DATA_FILE)
+    if full_population:
+        return chunks, load_aggregates(True, workers, version).bounds, None
+    return chunks, credit_score_bounds(load_data(quantile_mode, version).view(), quantile_mode), SAMPLE_ROWS
+
+def export_panel(filters, full_population, workers, quantile_mode, version):
+    """Sidebar export of the selected customers, streamed to a file chunk by chunk"""
+    from export import EXPORT_FORMATS, export_chunks
+
+    with st.sidebar.expander("⬇️ Export Customers"):
+        fmt = st.selectbox("Format:", EXPORT_FORMATS)
+        key = (version, full_population, quantile_mode, repr(sorted(filters.items())), fmt)
+        if st.button("Prepare export", help="Writes the customers matching the filters, with the derived columns."):
+            chunks, bounds, limit = export_source(full_population, workers, quantile_mode, version)
+            out = os.path.join(CACHE_DIR, 'exports', f"customers-{hashlib.sha256(repr(key).encode()).hexdigest()[:16]}.{fmt}")
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            with TIMINGS.stage(f'export[{fmt}]'):
+                st.session_state['export'] = (key, export_chunks(chunks, out, filters, bounds, limit))
+        export = st.session_state.get('export')
+        if export is not None and export[0] == key and os.path.exists(export[1]['path']):
+            stats = export[1]
+            st.caption(f"{stats['rows']:,} customers, {stats['bytes'] / 1024:,.1f} KiB, "
+                       f"{stats['rows_per_second']:,.0f} rows/s")
+            with open(stats['path'], 'rb') as f:
+                st.download_button("Download", f, file_name=f"customers.{fmt}", on_click='ignore')
+
+@timed()
+def calculate_outliers(profile):
     """Calculate outliers for numerical columns"""
-    numerical_cols = ['CreditScore', 'Age', 'Tenure', 'Balance', 'NumOfProducts', 'EstimatedSalary']
-    outlier = {}
-    
-    for col in numerical_cols:
-        Q1 = df[col].quantile(0.25)
-        Q3 = df[col].quantile(0.75)
-        IQR = Q3 - Q1
-        lower_bound = Q1 - 1.5 * IQR
-        upper_bound = Q3 + 1.5 * IQR
-        outliers = df[(df[col] < lower_bound) | (df[col] > upper_bound)]
-        outlier[col] = len(outliers)
-    
-    return pd.DataFrame(list(outlier.items()), columns=['Column', 'Outlier_Count'])
+    return profile.outliers[['Column', 'Outlier_Count']]
 
-def create_correlation_heatmap(df):
-    """Create correlation heatmap"""
-    selected_columns = ['Age', 'Balance', 'IsActiveMember','NumOfProducts','CreditScore','Tenure','HasCrCard' ,'EstimatedSalary', 'Exited']
-    corr_matrix = df[selected_columns].corr()
-    
-    fig = px.imshow(corr_matrix, 
-                    text_auto=True, 
-                    aspect="auto",
-                    color_continuous_scale='RdBu',
-                    title="Correlation Matrix of Key Features")
-    fig.update_layout(width=800, height=600)
-    return fig
-
-def create_age_group_churn(df):
-    """Create age group churn analysis"""
-    age_churn = df.groupby('AgeGroup')['Exited'].mean().reset_index()
-    
-    fig = px.bar(age_churn, x='AgeGroup', y='Exited', 
-                 title='Churn Rate by Age Group',
-                 labels={'Exited': 'Churn Rate', 'AgeGroup': 'Age Group'},
-                 color='Exited',
-                 color_continuous_scale='Reds')
-    fig.update_layout(showlegend=False)
-    return fig
-
-def create_gender_churn_pie(df):
-    """Create gender churn pie chart"""
-    gender_churn = df.groupby('Gender')['Exited'].mean().reset_index()
-    
-    fig = px.pie(gender_churn, values='Exited', names='Gender',
-                 title='Churn Rate by Gender',
-                 color_discrete_sequence=['#8fd9b6', '#ff9999'])
-    return fig
-
-def create_geography_churn(df):
-    """Create geography churn analysis"""
-    geo_churn = df.groupby('Geography')['Exited'].mean().reset_index()
-    
-    fig = px.bar(geo_churn, x='Geography', y='Exited',
-                 title='Churn Rate by Geography',
-                 labels={'Exited': 'Churn Rate'},
-                 color='Exited',
-                 color_continuous_scale='Blues')
-    fig.update_layout(showlegend=False)
-    return fig
-
-def create_balance_boxplot(df):
-    """Create balance distribution boxplot"""
-    fig = px.box(df, x='Exited', y='Balance',
-                 title='Account Balance Distribution by Churn Status',
-                 labels={'Exited': 'Customer Churned (0=No, 1=Yes)', 'Balance': 'Account Balance'},
-                 color='Exited',
-                 color_discrete_sequence=['#8fd9b6', '#ff9999'])
-    return fig
-
-def create_products_analysis(df):
-    """Create number of products analysis"""
-    product_churn = df.groupby('NumOfProducts')['Exited'].mean().reset_index()
-    product_count = df.groupby(['NumOfProducts', 'Exited']).size().reset_index(name='Count')
-    
-    # Create subplots
-    fig = make_subplots(rows=1, cols=2, 
-                        subplot_titles=('Churn Rate by Number of Products', 
-                                      'Product Distribution by Churn Status'))
-    
-    # Churn rate plot
-    fig.add_trace(go.Bar(x=product_churn['NumOfProducts'], 
-                         y=product_churn['Exited'],
-                         name='Churn Rate',
-                         marker_color='lightcoral'), row=1, col=1)
-    
-    # Product distribution plot
-    for exit_status in [0, 1]:
-        data = product_count[product_count['Exited'] == exit_status]
-        fig.add_trace(go.Bar(x=data['NumOfProducts'], 
-                             y=data['Count'],
-                             name=f'{"Churned" if exit_status else "Stayed"}',
-                             marker_color='#ff9999' if exit_status else '#8fd9b6'), row=1, col=2)
-    
-    fig.update_layout(height=500, showlegend=True)
-    return fig
-
-def create_activity_analysis(df):
-    """Create activity member analysis"""
-    engagement_data = {
-        'Active Members': df[df['IsActiveMember'] == 1]['Exited'].mean(),
-        'Inactive Members': df[df['IsActiveMember'] == 0]['Exited'].mean(),
-        'Credit Card Holders': df[df['HasCrCard'] == 1]['Exited'].mean(),
-        'No Credit Card': df[df['HasCrCard'] == 0]['Exited'].mean()
-    }
-    
-    engagement_df = pd.DataFrame(list(engagement_data.items()), 
-                                columns=['Engagement_Type', 'Churn_Rate'])
-    engagement_df = engagement_df.sort_values('Churn_Rate', ascending=True)
-    
-    fig = px.bar(engagement_df, x='Churn_Rate', y='Engagement_Type',
-                 orientation='h',
-                 title='Churn Rate by Engagement Type',
-                 labels={'Churn_Rate': 'Churn Rate', 'Engagement_Type': 'Engagement Type'},
-                 color='Churn_Rate',
-                 color_continuous_scale='Viridis')
-    return fig
-
-def create_tenure_analysis(df):
-    """Create tenure analysis"""
-    tenure_churn = df.groupby('Tenure')['Exited'].mean().reset_index()
-    
-    fig = px.line(tenure_churn, x='Tenure', y='Exited',
-                  title='Churn Rate by Tenure',
-                  labels={'Exited': 'Churn Rate', 'Tenure': 'Tenure (Years)'},
-                  markers=True,
-                  line_shape='linear')
-    fig.update_traces(line_color='red', marker_color='red')
-    return fig
-
-def create_credit_score_analysis(df):
-    """Create credit score analysis"""
-    # Boxplot for credit scores
-    fig1 = px.box(df, y='CreditScore',
-                  title='Credit Score Distribution (Identifying Outliers)')
-    
-    # Churn rate by credit score category
-    credit_churn = df.groupby('CreditScoreCategory')['Exited'].mean().reset_index()
-    credit_churn = credit_churn.sort_values('Exited')
-    
-    fig2 = px.bar(credit_churn, x='CreditScoreCategory', y='Exited',
-                  title='Churn Rate by Credit Score Category',
-                  labels={'Exited': 'Churn Rate', 'CreditScoreCategory': 'Credit Score Category'},
-                  color='Exited',
-                  color_continuous_scale='Pastel1')
-    
-    return fig1, fig2
-
-def create_balance_products_analysis(df):
-    """Create balance and products combined analysis"""
-    # Average balance by number of products and churn status
-    pivot_data = df.pivot_table(index='NumOfProducts', columns='Exited', 
-                               values='Balance', aggfunc='mean').reset_index()
-    pivot_data = pivot_data.melt(id_vars=['NumOfProducts'], 
-                                value_vars=[0, 1],
-                                var_name='Exited', value_name='Average_Balance')
-    pivot_data['Churn_Status'] = pivot_data['Exited'].map({0: 'Stayed', 1: 'Churned'})
-    
-    fig1 = px.bar(pivot_data, x='NumOfProducts', y='Average_Balance', 
-                  color='Churn_Status',
-                  title='Average Balance by Number of Products and Churn Status',
-                  labels={'Average_Balance': 'Average Balance', 'NumOfProducts': 'Number of Products'},
-                  color_discrete_sequence=['#8fd9b6', '#ff9999'],
-                  barmode='group')
-    
-    # Churn rate by zero balance status
-    zero_balance_churn = df.groupby('ZeroBalance')['Exited'].mean().reset_index()
-    zero_balance_churn['Balance_Status'] = zero_balance_churn['ZeroBalance'].map({True: 'Zero Balance', False: 'Non-Zero Balance'})
-    
-    fig2 = px.bar(
-    zero_balance_churn,
-    x='Balance_Status',
-    y='Exited',
-    title='Churn Rate by Balance Status',
-    labels={'Exited': 'Churn Rate', 'Balance_Status': 'Balance Status'},
-    color='Balance_Status',
-    color_discrete_sequence=['#8fd9b6', '#ff9999']
-)
-    
-    return fig1, fig2
+def warm_figure(bundle, builder, *args):
+    """Call a figure builder, or load its prebuilt figures from the warm-start bundle"""
+    if bundle is not None and bundle.has_figure(figure_key(builder, args)):
+        with TIMINGS.stage('bundle_figure'):
+            return bundle.figure(figure_key(builder, args))
+    return builder(*args)
+
+def render_chart(fig):
+    """Render a Plotly figure, timed as a stage named after its title"""
+    if not TIMINGS.active():
+        return st.plotly_chart(fig, use_container_width=True)
+    with TIMINGS.stage(f"plotly_chart[{fig.layout.title.text or 'untitled'}]"):
+        return st.plotly_chart(fig, use_container_width=True)
+
+def performance_panel(run):
+    """Sidebar panel with the stage timings of this run and the totals since the server started"""
+    columns = ['Stage', 'Wall (ms)', 'CPU (ms)', 'Peak (MiB)']
+    events = pd.DataFrame([(name, wall * 1000, cpu * 1000, peak / 2**20 if peak is not None else None)
+                           for name, wall, cpu, peak in run], columns=columns)
+    totals = pd.DataFrame([(name, s['calls'], s['mean_wall_seconds'] * 1000, s['max_wall_seconds'] * 1000)
+                           for name, s in TIMINGS.snapshot().items()],
+                          columns=['Stage', 'Calls', 'Mean (ms)', 'Max (ms)'])
+    with st.sidebar.expander("⏱️ Performance", expanded=True):
+        st.write("**This run** (cached loaders only appear when they recompute)")
+        st.dataframe(events.sort_values('Wall (ms)', ascending=False), hide_index=True)
+        st.write("**Since the server started**")
+        st.dataframe(totals.sort_values('Mean (ms)', ascending=False), hide_index=True)
+        st.download_button("Download JSON", TIMINGS.to_json(), file_name='timings.json', mime='application/json')
+        st.download_button("Download Prometheus", TIMINGS.to_prometheus(), file_name='timings.prom',
+                           mime='text/plain')
+        if st.button("Reset totals"):
+            TIMINGS.reset()
 
 # Main Streamlit App
 def main():
@@ -258,11 +357,52 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Load data
-    df = load_data()
-    
     # Sidebar
     st.sidebar.title("📊 Explore Analysis Sections")
+    data_scope = st.sidebar.radio("Data Scope:", [f"Sample (first {SAMPLE_ROWS:,} rows)", "Full population (streamed)"])
+    full_population = data_scope.startswith("Full")
+    workers = 1
+    if full_population:
+        workers = st.sidebar.number_input("Workers:", min_value=1, max_value=os.cpu_count() or 1, value=1,
+                                          help="Processes used to rebuild full-population aggregates.")
+    quantile_mode = st.sidebar.selectbox("Quantile Mode:", QUANTILE_MODES,
+                                         help="'approx' uses quantile sketches instead of sorting; "
+                                              "'auto' switches to them for very large tables.")
+    ci_method = st.sidebar.selectbox("Confidence Intervals:", CI_METHODS,
+                                     help="95% intervals on churn rates, computed from group counts.")
+    performance = st.sidebar.checkbox("⏱️ Performance", help="Time every stage of this page and show the results.")
+    if performance:
+        TIMINGS.set_memory(st.sidebar.checkbox("Track peak memory", help="Uses tracemalloc; slows the page down."))
+    
+    with TIMINGS.recording() if performance else nullcontext() as run:
+        show_sections(full_population, workers, quantile_mode, ci_method, current_version())
+    if performance:
+        performance_panel(run)
+    if METRICS_FILE:
+        TIMINGS.write_prometheus(METRICS_FILE)
+    
+    # Footer
+    st.markdown("---")
+    st.markdown("**Dashboard created with Streamlit** 🚀")
+
+def show_sections(full_population, workers, quantile_mode, ci_method, version=None):
+    """Render the selected analysis section for the sidebar filters"""
+    # Load data and apply the sidebar filters: aggregates come from the cube,
+    # row-level views from the bitmap-selected rows
+    shared = load_data(quantile_mode, version)
+    filters = sidebar_filters(shared.index)
+    df = shared.filter(filters)
+    agg = load_aggregates(full_population, workers, version, quantile_mode).slice(filters)
+    st.sidebar.caption(f"{agg.rows:,} customers selected")
+    export_panel(filters, full_population, workers, quantile_mode, version)
+    
+    # Charts of the unfiltered sample come prebuilt from the warm-start bundle
+    bundle = warm_bundle(quantile_mode, version) if not full_population and not filters else None
+    
+    if agg.rows == 0 or len(df) == 0:
+        st.warning("No customers match the selected filters.")
+        return
+    
     analysis_sections = [
         "📈 Dataset Overview",
         "🔍 Exploratory Data Analysis", 
@@ -271,167 +411,392 @@ def main():
         "📱 Customer Engagement",
         "⏱️ Customer Tenure",
         "💳 Credit Score Analysis",
-        "🔄 Balance & Products Analysis"
+        "🔄 Balance & Products Analysis",
+        "🎯 Churn Scores",
+        "🧩 High-Churn Segments",
+        "🔎 Customer Lookup",
+        "📅 Churn Trends",
+        "🎲 Retention Simulator"
     ]
     
     selected_section = st.sidebar.selectbox("Choose Analysis Section:", analysis_sections)
     
-    if selected_section == "📈 Dataset Overview":
-        st.markdown('<div class="objective-header">Dataset Overview</div>', unsafe_allow_html=True)
-        
-        # Key metrics
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Customers", len(df))
-        with col2:
-            st.metric("Churned Customers", df['Exited'].sum())
-        with col3:
-            st.metric("Churn Rate", f"{df['Exited'].mean():.2%}")
-        with col4:
-            st.metric("Active Members", df['IsActiveMember'].sum())
-        
-        # Dataset info
-        st.subheader("Dataset Information")
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            st.write("**First 5 rows of the dataset:**")
-            st.dataframe(df.head())
+    with TIMINGS.stage(f"section[{selected_section.split(' ', 1)[1]}]"):
+        if selected_section == "📈 Dataset Overview":
+            st.markdown('<div class="objective-header">Dataset Overview</div>', unsafe_allow_html=True)
+        
+            # Key metrics
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Customers", agg.rows)
+            with col2:
+                st.metric("Churned Customers", agg.total_exited)
+            with col3:
+                st.metric("Churn Rate", f"{agg.overall_churn_rate():.2%}")
+            with col4:
+                st.metric("Active Members", agg.table('IsActiveMember')['Count'].get(1, 0))
+        
+            # Dataset info
+            st.subheader("Dataset Information")
+            col1, col2 = st.columns(2)
+        
+            with col1:
+                st.write("**First 5 rows of the dataset:**")
+                st.dataframe(df.head())
             
-        with col2:
-            st.write("**Dataset Statistics:**")
-            st.write(f"- **Shape:** {df.shape}")
-            st.write(f"- **Missing Values:** {df.isnull().sum().sum()}")
-            st.write(f"- **Duplicates:** {df.duplicated().sum()}")
-            st.write(f"- **Columns:** {', '.join(df.columns.tolist())}")
-    
-    elif selected_section == "🔍 Exploratory Data Analysis":
-        st.markdown('<div class="objective-header">Exploratory Data Analysis</div>', unsafe_allow_html=True)
-        
-        # Statistical summary
-        st.subheader("Statistical Summary")
-        st.dataframe(df.describe())
-        
-        # Outlier detection
-        st.subheader("Outlier Detection (IQR Method)")
-        outlier_df = calculate_outliers(df)
-        st.dataframe(outlier_df)
-        
-        # Correlation matrix
-        st.subheader("Feature Correlation Analysis")
-        fig_corr = create_correlation_heatmap(df)
-        st.plotly_chart(fig_corr, use_container_width=True)
-    
-    elif selected_section == "👥 Customer Demographics":
-        st.markdown('<div class="objective-header">Objective 1: Customer Demographics Impact on Churn</div>', 
-                    unsafe_allow_html=True)
+            with col2:
+                st.write("**Dataset Statistics:**")
+                profile = load_profile(quantile_mode, filters, version)
+                st.write(f"- **Shape:** {profile.shape}")
+                st.write(f"- **Missing Values:** {profile.null_counts.sum()}")
+                st.write(f"- **Duplicates:** {profile.duplicates}")
+                st.write(f"- **Columns:** {', '.join(profile.columns)}")
         
-        st.write("Exploring how customer background affects churn rates.")
+            # Memory footprint of the compact dtypes
+            st.subheader("Memory Usage")
+            report = load_memory_report(version)
+            total = report.loc['Total']
+            st.write(f"Compact dtypes hold the table in **{total['Compact KiB']:,.1f} KiB** "
+                     f"instead of {total['Raw KiB']:,.1f} KiB ({total['Saving']:.0%} less).")
+            st.dataframe(report.style.format({'Raw KiB': '{:,.1f}', 'Compact KiB': '{:,.1f}', 'Saving': '{:.0%}'}))
+    
+        elif selected_section == "🔍 Exploratory Data Analysis":
+            from moments import CoMoments, association_table
+
+            st.markdown('<div class="objective-header">Exploratory Data Analysis</div>', unsafe_allow_html=True)
+        
+            profile = load_profile(quantile_mode, filters, version)
         
-        # Age group analysis
-        st.subheader("Churn Rate by Age Group")
-        fig_age = create_age_group_churn(df)
-        st.plotly_chart(fig_age, use_container_width=True)
+            # Statistical summary
+            st.subheader("Statistical Summary")
+            st.dataframe(profile.summary)
         
-        col1, col2 = st.columns(2)
+            # Outlier detection
+            st.subheader("Outlier Detection (IQR Method)")
+            if full_population and not filters:
+                outlier_df = load_population_outliers(workers, version)
+            else:
+                outlier_df = calculate_outliers(profile)
+            st.dataframe(outlier_df)
         
-        with col1:
-            st.subheader("Churn Rate by Gender")
-            fig_gender = create_gender_churn_pie(df)
-            st.plotly_chart(fig_gender, use_container_width=True)
+            # Correlation matrix and association with churn, from mergeable co-moments
+            if full_population and not filters:
+                moments = load_population_moments(workers, version)
+            else:
+                moments = CoMoments.from_frame(df)
+            st.subheader("Feature Correlation Analysis")
+            if full_population and filters:
+                st.caption("Correlations of the filtered customers are computed on the sample.")
+            fig_corr = warm_figure(bundle, create_correlation_heatmap, moments)
+            render_chart(fig_corr)
         
-        with col2:
-            st.subheader("Churn Rate by Geography")
-            fig_geo = create_geography_churn(df)
-            st.plotly_chart(fig_geo, use_container_width=True)
+            st.subheader("Association with Churn")
+            fig_assoc = warm_figure(bundle, create_association_chart, association_table(agg, moments))
+            render_chart(fig_assoc)
     
-    elif selected_section == "💰 Financial Habits":
-        st.markdown('<div class="objective-header">Objective 2: Financial Habits Impact</div>', 
-                    unsafe_allow_html=True)
+        elif selected_section == "👥 Customer Demographics":
+            st.markdown('<div class="objective-header">Objective 1: Customer Demographics Impact on Churn</div>', 
+                        unsafe_allow_html=True)
         
-        st.write("Analyzing how account balance and number of products influence churn decisions.")
+            st.write("Exploring how customer background affects churn rates.")
         
-        # Balance analysis
-        st.subheader("Account Balance Distribution by Churn Status")
-        fig_balance = create_balance_boxplot(df)
-        st.plotly_chart(fig_balance, use_container_width=True)
+            # Age group analysis
+            st.subheader("Churn Rate by Age Group")
+            fig_age = warm_figure(bundle, create_age_group_churn, agg, ci_method)
+            render_chart(fig_age)
         
-        # Products analysis
-        st.subheader("Number of Products Analysis")
-        fig_products = create_products_analysis(df)
-        st.plotly_chart(fig_products, use_container_width=True)
-    
-    elif selected_section == "📱 Customer Engagement":
-        st.markdown('<div class="objective-header">Objective 3: Customer Engagement Levels</div>', 
-                    unsafe_allow_html=True)
-        
-        st.write("Examining if being an active member or credit card ownership affects churn.")
-        
-        # Activity analysis
-        st.subheader("Churn Rate by Engagement Type")
-        fig_engagement = create_activity_analysis(df)
-        st.plotly_chart(fig_engagement, use_container_width=True)
-        
-        # Activity status breakdown
-        col1, col2 = st.columns(2)
-        with col1:
-            active_churn = df[df['IsActiveMember'] == 1]['Exited'].mean()
-            st.metric("Active Members Churn Rate", f"{active_churn:.2%}")
-        with col2:
-            inactive_churn = df[df['IsActiveMember'] == 0]['Exited'].mean()
-            st.metric("Inactive Members Churn Rate", f"{inactive_churn:.2%}")
-    
-    elif selected_section == "⏱️ Customer Tenure":
-        st.markdown('<div class="objective-header">Objective 4: Customer Tenure Impact</div>', 
-                    unsafe_allow_html=True)
+            col1, col2 = st.columns(2)
         
-        st.write("Investigating how the length of customer relationship affects churn likelihood.")
+            with col1:
+                st.subheader("Churn Rate by Gender")
+                fig_gender = warm_figure(bundle, create_gender_churn_pie, agg)
+                render_chart(fig_gender)
         
-        st.subheader("Churn Rate by Tenure")
-        fig_tenure = create_tenure_analysis(df)
-        st.plotly_chart(fig_tenure, use_container_width=True)
+            with col2:
+                st.subheader("Churn Rate by Geography")
+                fig_geo = warm_figure(bundle, create_geography_churn, agg, ci_method)
+                render_chart(fig_geo)
+    
+        elif selected_section == "💰 Financial Habits":
+            st.markdown('<div class="objective-header">Objective 2: Financial Habits Impact</div>', 
+                        unsafe_allow_html=True)
         
-        # Tenure insights
-        avg_tenure_churned = df[df['Exited'] == 1]['Tenure'].mean()
-        avg_tenure_stayed = df[df['Exited'] == 0]['Tenure'].mean()
+            st.write("Analyzing how account balance and number of products influence churn decisions.")
         
-        col1, col2 = st.columns(2)
-        with col1:
-            st.metric("Average Tenure (Churned)", f"{avg_tenure_churned:.1f} years")
-        with col2:
-            st.metric("Average Tenure (Stayed)", f"{avg_tenure_stayed:.1f} years")
-    
-    elif selected_section == "💳 Credit Score Analysis":
-        st.markdown('<div class="objective-header">Objective 5: Credit Score Outliers</div>', 
-                    unsafe_allow_html=True)
+            # Balance analysis
+            st.subheader("Account Balance Distribution by Churn Status")
+            fig_balance = warm_figure(bundle, create_balance_boxplot, df)
+            render_chart(fig_balance)
         
-        st.write("Identifying customers with unusual credit scores and their churn patterns.")
+            fig_balance_hist = warm_figure(bundle, create_balance_histogram, df)
+            render_chart(fig_balance_hist)
         
-        fig_credit_box, fig_credit_churn = create_credit_score_analysis(df)
+            # Products analysis
+            st.subheader("Number of Products Analysis")
+            fig_products = warm_figure(bundle, create_products_analysis, agg, ci_method)
+            render_chart(fig_products)
+    
+        elif selected_section == "📱 Customer Engagement":
+            st.markdown('<div class="objective-header">Objective 3: Customer Engagement Levels</div>', 
+                        unsafe_allow_html=True)
         
-        col1, col2 = st.columns(2)
-        with col1:
-            st.plotly_chart(fig_credit_box, use_container_width=True)
-        with col2:
-            st.plotly_chart(fig_credit_churn, use_container_width=True)
-    
-    elif selected_section == "🔄 Balance & Products Analysis":
-        st.markdown('<div class="objective-header">Objective 6: Balance & Products Relationship</div>', 
-                    unsafe_allow_html=True)
+            st.write("Examining if being an active member or credit card ownership affects churn.")
+        
+            # Activity analysis
+            st.subheader("Churn Rate by Engagement Type")
+            fig_engagement = warm_figure(bundle, create_activity_analysis, agg)
+            render_chart(fig_engagement)
+        
+            # Activity status breakdown
+            activity_churn = agg.table('IsActiveMember')['ChurnRate']
+            col1, col2 = st.columns(2)
+            with col1:
+                active_churn = activity_churn.get(1, float('nan'))
+                st.metric("Active Members Churn Rate", f"{active_churn:.2%}")
+            with col2:
+                inactive_churn = activity_churn.get(0, float('nan'))
+                st.metric("Inactive Members Churn Rate", f"{inactive_churn:.2%}")
+    
+        elif selected_section == "⏱️ Customer Tenure":
+            st.markdown('<div class="objective-header">Objective 4: Customer Tenure Impact</div>', 
+                        unsafe_allow_html=True)
+        
+            st.write("Investigating how the length of customer relationship affects churn likelihood.")
+        
+            st.subheader("Churn Rate by Tenure")
+            fig_tenure = warm_figure(bundle, create_tenure_analysis, agg)
+            render_chart(fig_tenure)
+        
+            # Tenure insights
+            avg_tenure_stayed, avg_tenure_churned = agg.average_tenure()
+        
+            col1, col2 = st.columns(2)
+            with col1:
+                st.metric("Average Tenure (Churned)", f"{avg_tenure_churned:.1f} years")
+            with col2:
+                st.metric("Average Tenure (Stayed)", f"{avg_tenure_stayed:.1f} years")
+    
+        elif selected_section == "💳 Credit Score Analysis":
+            st.markdown('<div class="objective-header">Objective 5: Credit Score Outliers</div>', 
+                        unsafe_allow_html=True)
+        
+            st.write("Identifying customers with unusual credit scores and their churn patterns.")
+        
+            fig_credit_box, fig_credit_churn = warm_figure(bundle, create_credit_score_analysis, df, agg, ci_method)
+        
+            col1, col2 = st.columns(2)
+            with col1:
+                render_chart(fig_credit_box)
+            with col2:
+                render_chart(fig_credit_churn)
+    
+        elif selected_section == "🔄 Balance & Products Analysis":
+            st.markdown('<div class="objective-header">Objective 6: Balance & Products Relationship</div>', 
+                        unsafe_allow_html=True)
         
-        st.write("Analyzing the relationship between account balance and number of products held.")
+            st.write("Analyzing the relationship between account balance and number of products held.")
         
-        fig_balance_products, fig_zero_balance = create_balance_products_analysis(df)
+            fig_balance_products, fig_zero_balance = warm_figure(bundle, create_balance_products_analysis, agg)
         
-        st.subheader("Average Balance by Products and Churn Status")
-        st.plotly_chart(fig_balance_products, use_container_width=True)
+            st.subheader("Average Balance by Products and Churn Status")
+            render_chart(fig_balance_products)
         
-        st.subheader("Churn Rate by Balance Status")
-        st.plotly_chart(fig_zero_balance, use_container_width=True)
+            st.subheader("Churn Rate by Balance Status")
+            render_chart(fig_zero_balance)
     
-    # Footer
-    st.markdown("---")
-    st.markdown("**Dashboard created with Streamlit** 🚀")
+        elif selected_section == "🎯 Churn Scores":
+            st.markdown('<div class="objective-header">Churn Risk Scores</div>', unsafe_allow_html=True)
+        
+            st.write("Scoring every selected customer with a logistic churn model trained on the full dataset.")
+        
+            model = load_scoring_model()
+            scored = df.assign(ChurnScore=model.score(df))
+        
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Model AUC (holdout)", f"{model.metrics.get('auc', float('nan')):.3f}")
+            with col2:
+                st.metric("Mean Predicted Churn", f"{scored['ChurnScore'].mean():.2%}")
+            with col3:
+                st.metric("Actual Churn Rate", f"{scored['Exited'].mean():.2%}")
+        
+            render_chart(create_score_histogram(scored))
+            render_chart(create_score_by_geography(scored))
+        
+            col1, col2 = st.columns(2)
+            with col1:
+                st.subheader("Highest-Risk Customers")
+                st.dataframe(scored.nlargest(10, 'ChurnScore')[['CustomerId', 'Surname', 'ChurnScore', 'Exited']])
+            with col2:
+                st.subheader("Model Coefficients (log-odds)")
+                st.dataframe(model.coefficients())
+    
+        elif selected_section == "🧩 High-Churn Segments":
+            from segments import RANK_BY, find_segments
+
+            st.markdown('<div class="objective-header">High-Churn Segments</div>', unsafe_allow_html=True)
+        
+            st.write("Combinations of customer attributes churning far above the overall rate, "
+                     "mined from the churn cube's group counts.")
+        
+            col1, col2, col3, col4, col5 = st.columns(5)
+            with col1:
+                k = st.number_input("Segments", min_value=1, max_value=50, value=10)
+            with col2:
+                min_support = st.number_input("Min. customers (%)", min_value=0.1, max_value=50.0, value=1.0,
+                                              step=0.5) / 100
+            with col3:
+                min_lift = st.number_input("Min. lift", min_value=1.0, max_value=10.0, value=1.2, step=0.1)
+            with col4:
+                max_size = st.number_input("Max. attributes", min_value=1, max_value=6, value=4)
+            with col5:
+                rank_by = st.selectbox("Rank by", RANK_BY,
+                                       help="'lower' ranks by the lower confidence bound, discounting small segments.")
+        
+            segments = find_segments(agg, k, min_support=min_support, min_lift=min_lift, max_size=max_size,
+                                     rank_by=rank_by, method=ci_method)
+            if len(segments) == 0:
+                st.info("No segment reaches the minimum lift with enough customers.")
+            else:
+                render_chart(create_segment_chart(segments, agg.overall_churn_rate()))
+                formats = {'ChurnRate': '{:.1%}', 'Lower': '{:.1%}', 'Upper': '{:.1%}', 'Lift': '{:.2f}',
+                           'Support': '{:.1%}'}
+                st.dataframe(segments.drop(columns='Filters').style.format(formats), hide_index=True)
+        
+        elif selected_section == "🔎 Customer Lookup":
+            from lookup import PAGE_SIZE
+
+            st.markdown('<div class="objective-header">Customer Lookup</div>', unsafe_allow_html=True)
+        
+            index, bitmaps = load_customer_index(full_population, workers, version, quantile_mode)
+            col1, col2 = st.columns(2)
+            with col1:
+                id_text = st.text_input("Customer IDs:", help="Comma-separated; the other fields are ignored when set.")
+            with col2:
+                surname = st.text_input("Surname starts with:")
+            ranges = {}
+            for col in st.multiselect("Value ranges:", index.range_columns):
+                low, high = (value.item() for value in index.bounds(col))
+                ranges[col] = st.slider(col, low, high, (low, high))
+            col1, col2 = st.columns(2)
+            with col1:
+                page_size = st.selectbox("Rows per page:", [PAGE_SIZE, 50, 100])
+            with col2:
+                page_number = st.number_input("Page:", min_value=1, value=1)
+        
+            start = time.perf_counter()
+            with TIMINGS.stage('customer_search'):
+                if id_text.strip():
+                    try:
+                        ids = [int(value) for value in id_text.replace(' ', '').split(',') if value]
+                    except ValueError:
+                        st.error("Customer IDs must be whole numbers.")
+                        return
+                    page = index.get(ids)
+                    total = len(page)
+                else:
+                    bits = bitmaps.select(filters) if filters else None
+                    page, total = index.search(surname.strip() or None, ranges, bits,
+                                               offset=(page_number - 1) * page_size, limit=page_size)
+            elapsed = time.perf_counter() - start
+        
+            pages = max(1, -(-total // page_size))
+            st.caption(f"{total:,} matching customers · page {min(page_number, pages)} of {pages:,} · "
+                       f"found in {elapsed * 1000:.2f} ms")
+            if total == 0:
+                st.info("No customer matches the search.")
+            else:
+                st.dataframe(page, hide_index=True)
+        
+        elif selected_section == "📅 Churn Trends":
+            from snapshots import load_registry, month_deltas, snapshot_trends, snapshots_version
+
+            st.markdown('<div class="objective-header">Churn Trends</div>', unsafe_allow_html=True)
+        
+            snapshots = load_registry()
+            if not snapshots:
+                st.info("No monthly snapshots are registered yet. Register snapshot files with "
+                        "`python snapshots.py --register Bank_Churn_2026-09.xlsx`.")
+                return
+            cubes = load_snapshot_cubes(snapshots_version(snapshots), workers)
+            trends = snapshot_trends(cubes, filters=filters)
+            overall = trends[trends['Dimension'] == 'Overall'].iloc[-1]
+        
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Snapshots", len(cubes), help=f"{min(cubes)} to {max(cubes)}")
+            with col2:
+                change = overall['ChurnRateChange']
+                st.metric(f"Churn Rate ({overall['Month']})", f"{overall['ChurnRate']:.2%}",
+                          None if pd.isna(change) else f"{change * 100:+.2f} pp", delta_color="inverse")
+            with col3:
+                change = overall['CountChange']
+                st.metric("Customers", f"{overall['Count']:,}", None if pd.isna(change) else f"{change:+,.0f}")
+        
+            dimension = st.selectbox("Trend of:", ['Overall'] + CUBE_DIMENSIONS)
+            render_chart(create_trend_chart(trends, dimension))
+        
+            if len(cubes) > 1:
+                st.subheader(f"Largest Changes into {max(cubes)}")
+                deltas = month_deltas(trends).head(15).drop(columns='Month')
+                formats = {'ChurnRate': '{:.1%}', 'AvgBalance': '{:,.0f}', 'ChurnRateChange': '{:+.2%}',
+                           'CountChange': '{:+,.0f}'}
+                st.dataframe(deltas.style.format(formats), hide_index=True)
+        
+        elif selected_section == "🎲 Retention Simulator":
+            from simulation import DEFAULT_INTERVAL, DEFAULT_TRIALS, STRATA
+
+            st.markdown('<div class="objective-header">Retention Simulator</div>', unsafe_allow_html=True)
+        
+            st.write("Simulating how many churners a retention campaign would save, from the churn rates "
+                     "of the selected customers and their uncertainty.")
+        
+            col1, col2 = st.columns(2)
+            with col1:
+                dimension = st.selectbox("Target customers by:", STRATA, index=STRATA.index('IsActiveMember'),
+                                         format_func=lambda dim: FILTER_LABELS.get(dim, dim))
+            values = list(agg.table(dimension).index)
+            with col2:
+                targeted = st.multiselect("Targeted values:", values, default=values[:1])
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                intervention = st.radio("Intervention:", ["Convert to", "Reduce churn by"])
+            with col2:
+                if intervention == "Convert to":
+                    convert, reduction = (dimension, st.selectbox("Converted value:", values, index=len(values) - 1)), None
+                else:
+                    convert, reduction = None, st.slider("Churn reduction:", 0.0, 1.0, 0.2, 0.05)
+            with col3:
+                share = st.slider("Share of targeted customers reached:", 0.0, 1.0, 0.2, 0.05)
+                trials = st.number_input("Trials:", min_value=1_000, max_value=100_000, value=DEFAULT_TRIALS,
+                                         step=1_000)
+            if not targeted:
+                st.info("Select the targeted values.")
+                return
+        
+            with TIMINGS.stage('simulation'):
+                result = load_simulation(full_population, workers, version, filters, {dimension: targeted},
+                                         share, convert, reduction, int(trials), quantile_mode)
+            summary = result.summary()
+        
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Customers Reached", f"{result.reached_customers:,.0f}",
+                          help=f"{result.segment_customers:,} targeted customers")
+            with col2:
+                saved = summary.loc['Churners saved']
+                st.metric("Churners Saved", f"{saved['Mean']:,.0f}",
+                          help=f"{DEFAULT_INTERVAL:.0%} interval: {saved['Lower']:,.0f} to {saved['Upper']:,.0f}")
+            with col3:
+                retained = summary.loc['Balance retained']
+                st.metric("Balance Retained", f"{retained['Mean']:,.0f}",
+                          help=f"{DEFAULT_INTERVAL:.0%} interval: {retained['Lower']:,.0f} to {retained['Upper']:,.0f}")
+            st.caption(f"{result.trials:,} trials simulated in {result.seconds:.2f} s; "
+                       f"intervals are central {DEFAULT_INTERVAL:.0%} ranges over the trials.")
+        
+            render_chart(create_simulation_chart(result))
+            st.dataframe(summary.style.format('{:,.1f}'))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,133 @@
+# Server-side summarised box plots and histograms for Plotly
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from features import iqr_bounds
+
+MAX_OUTLIER_POINTS = 200
+HISTOGRAM_BINS = 40
+
+
+def box_summary(values, max_outliers=MAX_OUTLIER_POINTS):
+    """Quartiles, Tukey whiskers, mean and a capped sample of outliers
+
+    Quartiles use linear interpolation, like Plotly's default quartilemethod.
+    At most max_outliers outlier points are kept, evenly spread over the
+    sorted outliers so both extremes are always shown.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return None
+
+    q1, median, q3 = np.percentile(values, [25, 50, 75])
+    lower_bound, upper_bound = iqr_bounds(q1, q3)
+    inside = (values >= lower_bound) & (values <= upper_bound)
+    outliers = np.sort(values[~inside])
+    if len(outliers) > max_outliers:
+        outliers = outliers[np.linspace(0, len(outliers) - 1, max_outliers).round().astype(int)]
+
+    return {
+        'q1': q1, 'median': median, 'q3': q3,
+        'lowerfence': values[inside].min(), 'upperfence': values[inside].max(),
+        'mean': values.mean(), 'count': len(values), 'outliers': outliers,
+    }
+
+
+def box_traces(stats, name, color=None, orientation='v'):
+    """Build a precomputed go.Box trace plus a marker trace for its outliers"""
+    box = go.Box(
+        name=str(name),
+        q1=[stats['q1']], median=[stats['median']], q3=[stats['q3']],
+        lowerfence=[stats['lowerfence']], upperfence=[stats['upperfence']],
+        mean=[stats['mean']] if 'mean' in stats else None,
+        marker_color=color, boxpoints=False, orientation=orientation,
+        x=[str(name)] if orientation == 'v' else None,
+        y=[str(name)] if orientation == 'h' else None,
+    )
+    traces = [box]
+    if len(stats['outliers']):
+        labels = [str(name)] * len(stats['outliers'])
+        traces.append(go.Scatter(
+            x=labels if orientation == 'v' else stats['outliers'],
+            y=stats['outliers'] if orientation == 'v' else labels,
+            mode='markers', marker=dict(color=color, size=4),
+            name=f'{name} outliers', showlegend=False,
+        ))
+    return traces
+
+
+def group_color(colors, key, position):
+    """Colour of a group: colors maps group keys to colours, or is a sequence
+    cycled over the group positions"""
+    if not colors:
+        return None
+    if isinstance(colors, dict):
+        return colors.get(key)
+    return colors[position % len(colors)]
+
+
+def _groups(df, by):
+    """(position, key, rows) of every group; positions follow the categories of
+    a categorical column, so a filter dropping a group keeps the others' colours"""
+    keys = list(df[by].cat.categories) if isinstance(df[by].dtype, pd.CategoricalDtype) else None
+    for i, (key, group) in enumerate(df.groupby(by, sort=True)):
+        yield (keys.index(key) if keys is not None else i), key, group
+
+
+def summarised_box(df, y, x=None, colors=None, names=None):
+    """Box plot figure whose statistics are computed on the server
+
+    Groups by x when given (like px.box(df, x=x, y=y)). The figure carries
+    five numbers and at most MAX_OUTLIER_POINTS points per group, so its size
+    does not depend on the number of rows. colors is a {key: colour} dict or
+    a sequence (see group_color).
+    """
+    fig = go.Figure()
+    groups = [(0, None, df)] if x is None else _groups(df, x)
+
+    for i, key, group in groups:
+        stats = box_summary(group[y].to_numpy())
+        if stats is None:
+            continue
+        name = y if key is None else (names or {}).get(key, key)
+        for trace in box_traces(stats, name, group_color(colors, key, i)):
+            fig.add_trace(trace)
+    return fig
+
+
+def histogram_bins(values, bins=HISTOGRAM_BINS, value_range=None):
+    """Bin counts and edges, computed with np.histogram"""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    return np.histogram(values, bins=bins, range=value_range)
+
+
+def histogram_trace(counts, edges, name=None, color=None, opacity=None):
+    """Bar trace drawing precomputed histogram bins"""
+    return go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges),
+        name=name, marker_color=color, marker_line_width=0, opacity=opacity,
+    )
+
+
+def summarised_histogram(df, x, color=None, colors=None, names=None, bins=HISTOGRAM_BINS):
+    """Histogram figure built from server-side bins, optionally split by a column
+
+    Groups share the bins and are overlaid semi-transparently, each bar
+    spanning its bin exactly.
+    """
+    fig = go.Figure()
+    values = df[x].to_numpy(dtype=np.float64)
+    value_range = (np.nanmin(values), np.nanmax(values)) if len(values) else None
+    groups = [(0, None, df)] if color is None else _groups(df, color)
+
+    for i, key, group in groups:
+        counts, edges = histogram_bins(group[x], bins, value_range)
+        name = x if key is None else str((names or {}).get(key, key))
+        fig.add_trace(histogram_trace(counts, edges, name, group_color(colors, key, i),
+                                      None if color is None else 0.6))
+    fig.update_layout(barmode='overlay', bargap=0)
+    return fig
@@ -0,0 +1,101 @@
+# Deterministic synthetic customers with the workbook's schema and marginals
+#
+#   python synthetic.py 1000000 --out data/customers_1m.parquet --seed 0
+
+import numpy as np
+import pandas as pd
+
+from data_cache import DATA_FILE, load_raw_data
+
+DISCRETE_COLS = ['CreditScore', 'Geography', 'Gender', 'Age', 'Tenure', 'NumOfProducts', 'HasCrCard', 'IsActiveMember']
+CONTINUOUS_COLS = ['Balance', 'EstimatedSalary']
+FIRST_CUSTOMER_ID = 15_000_000
+
+
+def _sample_discrete(rng, values, rows):
+    """Draw from the empirical distribution of a column (exact marginal)"""
+    uniques, counts = np.unique(np.asarray(values), return_counts=True)
+    return uniques[rng.choice(len(uniques), size=rows, p=counts / counts.sum())]
+
+
+def _sample_continuous(rng, values, rows):
+    """Inverse-CDF draw from a column, interpolating between observed values
+
+    A point mass at zero (e.g. zero balances) is kept as its own probability
+    so that no draws land between 0 and the smallest positive value.
+    """
+    values = np.sort(np.asarray(values, dtype=np.float64))
+    zero_share = np.mean(values == 0)
+    positive = values[values != 0]
+    u = rng.random(rows)
+    out = np.interp(u, np.linspace(0, 1, len(positive)), positive).round(2)
+    if zero_share:
+        out[rng.random(rows) < zero_share] = 0.0
+    return out
+
+
+def _calibrate_intercept(z, target, iterations=20):
+    """Shift log-odds so that the mean churn probability equals target"""
+    shift = 0.0
+    for _ in range(iterations):
+        p = 1 / (1 + np.exp(-(z + shift)))
+        error = p.mean() - target
+        if abs(error) < 1e-7:
+            break
+        shift -= error / max((p * (1 - p)).mean(), 1e-9)
+    return shift
+
+
+def generate_customers(rows, seed=0, reference=None):
+    """Generate rows synthetic customers, deterministically for a given seed
+
+    Every column is drawn independently from the reference table's marginal
+    distribution (the workbook by default). Exited is drawn from a churn model
+    fitted on the reference, with its intercept calibrated to the reference
+    churn rate, so churn keeps its dependence on age, activity, geography etc.
+    All draws are vectorized; ten million rows take a few seconds.
+    """
+    from scoring import ChurnModel
+
+    reference = load_raw_data(DATA_FILE) if reference is None else reference
+    rng = np.random.default_rng(seed)
+
+    columns = {'CustomerId': np.arange(FIRST_CUSTOMER_ID, FIRST_CUSTOMER_ID + rows, dtype=np.int64)}
+    surnames = pd.Index(reference['Surname'].unique())
+    columns['Surname'] = surnames.take(rng.integers(0, len(surnames), rows))
+    for col in DISCRETE_COLS:
+        columns[col] = _sample_discrete(rng, reference[col], rows)
+    for col in CONTINUOUS_COLS:
+        columns[col] = _sample_continuous(rng, reference[col], rows)
+    df = pd.DataFrame(columns)[list(reference.columns.drop('Exited'))]
+
+    model = ChurnModel.fit(reference, holdout=0)
+    calibration = df.iloc[:200_000]
+    model.intercept += _calibrate_intercept(model.log_odds(calibration), reference['Exited'].mean())
+    df['Exited'] = (rng.random(rows) < model.score(df)).astype(np.int64)
+    return df
+
+
+if __name__ == '__main__':
+    import argparse
+    import os
+
+    from streaming import DEFAULT_CHUNKSIZE
+
+    parser = argparse.ArgumentParser(description='Write synthetic customers to a CSV, Parquet or Arrow file')
+    parser.add_argument('rows', type=int)
+    parser.add_argument('--out', required=True, help='output file (.csv, .parquet, .arrow or .feather)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = generate_customers(args.rows, args.seed)
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    ext = os.path.splitext(args.out)[1].lower()
+    if ext == '.parquet':
+        # Row groups of one chunk each: the pieces parallel workers read on their own
+        df.to_parquet(args.out, index=False, row_group_size=DEFAULT_CHUNKSIZE)
+    elif ext in ('.arrow', '.feather'):
+        df.to_feather(args.out)
+    else:
+        df.to_csv(args.out, index=False)
+    print(f'Wrote {len(df):,} customers to {args.out} (churn rate {df["Exited"].mean():.2%})')
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from data_cache import DATA_FILE  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def data_file():
+    """The bundled workbook, skipping the tests that need it when it is absent"""
+    path = os.path.join(ROOT, DATA_FILE)
+    if not os.path.exists(path):
+        pytest.skip(f'{DATA_FILE} is not available')
+    return path
+
+
+@pytest.fixture(scope='session')
+def cache_dir(tmp_path_factory):
+    """A private columnar cache, so tests never touch the working .cache"""
+    return str(tmp_path_factory.mktemp('cache'))
@@ -0,0 +1,69 @@
+# Aggregates built chunk by chunk must equal a groupby over the whole table
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import DIMENSIONS, ChurnAggregates, weighted_quantile
+from data_cache import load_raw_data
+from features import add_derived_columns, credit_score_bounds
+from streaming import iter_chunks, stream_aggregates
+
+
+@pytest.fixture(scope='module')
+def raw(data_file, cache_dir):
+    return load_raw_data(data_file, cache_dir=cache_dir)
+
+
+def assert_matches(agg, df):
+    df = add_derived_columns(df.copy(), agg.credit_score_bounds())
+    assert agg.rows == len(df) and agg.total_exited == df['Exited'].sum()
+    for dim in DIMENSIONS:
+        expected = df.groupby(dim, observed=True).agg(Count=('Exited', 'size'), Exited=('Exited', 'sum'),
+                                                      Balance=('Balance', 'sum'))
+        result = agg.table(dim)
+        np.testing.assert_array_equal(result.index.astype(str), expected.index.astype(str))
+        np.testing.assert_array_equal(result['Count'], expected['Count'])
+        np.testing.assert_array_equal(result['Exited'], expected['Exited'])
+        np.testing.assert_allclose(result['Balance'], expected['Balance'], rtol=1e-12)
+
+
+@pytest.mark.parametrize('pieces', [1, 4, 37])
+def test_merged_chunks(raw, pieces):
+    agg = ChurnAggregates()
+    for rows in np.array_split(np.arange(len(raw)), pieces):
+        agg.merge(ChurnAggregates.from_frame(raw.iloc[rows]))
+    assert_matches(agg, raw)
+
+
+def test_credit_score_bounds_are_population_wide(raw):
+    agg = ChurnAggregates()
+    for rows in np.array_split(np.arange(len(raw)), 9):
+        agg.update(raw.iloc[rows])
+    assert agg.credit_score_bounds() == pytest.approx(credit_score_bounds(raw, 'exact'))
+    for q in [0.1, 0.25, 0.5, 0.75, 0.9]:
+        counts = raw['CreditScore'].value_counts()
+        assert weighted_quantile(counts.index, counts.values, q) == pytest.approx(raw['CreditScore'].quantile(q))
+
+
+def test_remove_and_narrow_dtypes(raw):
+    agg = ChurnAggregates.from_frame(raw).remove(raw.iloc[:2500])
+    assert_matches(agg, raw.iloc[2500:])
+    narrow = raw.astype({'Tenure': np.int8, 'NumOfProducts': np.int8, 'IsActiveMember': np.int8})
+    assert_matches(ChurnAggregates.from_frame(narrow), raw)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet', 'xlsx'])
+def test_streamed_files(raw, tmp_path, fmt):
+    path = tmp_path / f'customers.{fmt}'
+    if fmt == 'csv':
+        raw.to_csv(path, index=False)
+    elif fmt == 'parquet':
+        raw.to_parquet(path, index=False)
+    else:
+        raw = raw.head(3000)
+        raw.to_excel(path, index=False)
+    assert sum(len(chunk) for chunk in iter_chunks(str(path), 700)) == len(raw)
+    assert_matches(stream_aggregates(str(path), chunksize=700), raw)
+    pd.testing.assert_frame_equal(stream_aggregates(str(path), chunksize=700).moments.correlation(),
+                                  ChurnAggregates.from_frame(raw).moments.correlation(), atol=1e-12)
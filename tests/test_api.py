@@ -0,0 +1,62 @@
+# The API must answer every request, and cache equivalent ones once
+
+import asyncio
+from functools import partial
+
+import pytest
+
+import api as api_module
+from api import ChurnAPI, ChurnService
+from data_cache import dataset_version, load_raw_data
+
+
+@pytest.fixture
+def api(data_file, cache_dir, monkeypatch):
+    monkeypatch.setattr(api_module, 'load_raw_data', partial(load_raw_data, cache_dir=cache_dir))
+    monkeypatch.setattr(api_module, 'dataset_version', partial(dataset_version, cache_dir=cache_dir))
+    api = ChurnAPI(ChurnService(data_file))
+    yield api
+    api.executor.shutdown()
+
+
+async def exchange(api, target, requests):
+    """Send requests over one keep-alive connection; returns their status lines"""
+    server = await asyncio.start_server(api.handle_connection, '127.0.0.1', 0)
+    reader, writer = await asyncio.open_connection('127.0.0.1', server.sockets[0].getsockname()[1])
+    statuses = []
+    for _ in range(requests):
+        writer.write(f'GET {target} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        statuses.append(await reader.readline())
+        length = 0
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.partition(b':')
+            if name.lower() == b'content-length':
+                length = int(value)
+        await reader.readexactly(length)
+    writer.close()
+    server.close()
+    await server.wait_closed()
+    return statuses
+
+
+def test_filter_order_shares_a_cache_entry(api):
+    first = asyncio.run(api.respond('/churn/tenure?geography=France,Spain'))
+    second = asyncio.run(api.respond('/churn/tenure?geography=Spain,France,France'))
+    assert first == second
+    assert (api.cache.misses, api.cache.hits) == (1, 1)
+
+
+def test_unexpected_errors_answer_500(api, monkeypatch):
+    def fail(route, params, state=None):
+        raise KeyError('Geography')
+
+    monkeypatch.setattr(api.service, 'handle', fail)
+    assert asyncio.run(exchange(api, '/churn/tenure', 2)) == [b'HTTP/1.1 500 Error\r\n'] * 2
+
+
+def test_requests_compute_against_the_state_they_started_with(api):
+    state = api.service.state
+    api.service.state = api_module.ServiceState('next', None, None)
+    payload = api.service.handle('/churn/tenure', {}, state)
+    assert payload['customers'] == state.cube.rows
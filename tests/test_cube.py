@@ -0,0 +1,73 @@
+# Cube slices and roll-ups must equal a groupby over the matching customer rows
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import CUBE_DIMENSIONS, CUBE_MEASURES, ChurnCube
+from data_cache import load_raw_data
+from features import add_derived_columns, credit_score_bounds
+
+FILTERS = [
+    None,
+    {'Geography': ['France', 'Spain'], 'IsActiveMember': 1},
+    {'AgeGroup': '46-60', 'ZeroBalance': [False], 'NumOfProducts': [1, 2]},
+    {'CreditScoreCategory': ['Low', 'Normal'], 'Gender': 'Female', 'HasCrCard': [0], 'Tenure': [0, 5, 10]},
+]
+
+
+@pytest.fixture(scope='module')
+def df(data_file, cache_dir):
+    return add_derived_columns(load_raw_data(data_file, cache_dir=cache_dir))
+
+
+@pytest.fixture(scope='module')
+def cube(df):
+    return ChurnCube.from_frame(df, credit_score_bounds(df))
+
+
+def select(df, filters):
+    mask = np.ones(len(df), dtype=bool)
+    for dim, allowed in (filters or {}).items():
+        mask &= df[dim].isin(allowed if isinstance(allowed, list) else [allowed]).to_numpy()
+    return df[mask]
+
+
+def groupby_measures(df, by):
+    rows = df.assign(BalanceExited=df['Balance'] * df['Exited'], TenureSum=df['Tenure'])
+    return rows.groupby(by, observed=True).agg(Count=('Exited', 'size'), Exited=('Exited', 'sum'),
+                                               Balance=('Balance', 'sum'), BalanceExited=('BalanceExited', 'sum'),
+                                               TenureSum=('TenureSum', 'sum'))
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+@pytest.mark.parametrize('by', [['Geography'], ['Gender', 'AgeGroup'], ['Tenure', 'CreditScoreCategory', 'ZeroBalance']])
+def test_slice_rollup_matches_groupby(df, cube, filters, by):
+    result = cube.slice(filters).rollup(by)
+    expected = groupby_measures(select(df, filters), by)
+    pd.testing.assert_frame_equal(result.sort_index(), expected[CUBE_MEASURES].sort_index(),
+                                  check_dtype=False, check_index_type=False, check_categorical=False)
+
+
+@pytest.mark.parametrize('filters', FILTERS)
+def test_tables_match_groupby(df, cube, filters):
+    sliced, rows = cube.slice(filters), select(df, filters)
+    assert sliced.rows == len(rows) and sliced.total_exited == rows['Exited'].sum()
+    for dim in CUBE_DIMENSIONS:
+        expected = rows.groupby(dim, observed=True)['Exited'].mean()
+        np.testing.assert_allclose(sliced.table(dim)['ChurnRate'].sort_index(), expected.sort_index())
+    stayed, churned = rows.groupby('Exited')['Tenure'].mean().reindex([0, 1])
+    assert sliced.average_tenure() == pytest.approx((stayed, churned), nan_ok=True)
+
+
+def test_remove_and_persist(df, cube, tmp_path):
+    rebuilt = ChurnCube.from_frame(df).remove(df.iloc[:4000]).update(df.iloc[:1000])
+    expected = ChurnCube.from_frame(pd.concat([df.iloc[4000:], df.iloc[:1000]]))
+    for dim in CUBE_DIMENSIONS:
+        pd.testing.assert_frame_equal(rebuilt.table(dim), expected.table(dim), check_dtype=False)
+
+    cube.save(str(tmp_path / 'cube.arrow'), 'v1')
+    loaded = ChurnCube.load(str(tmp_path / 'cube.arrow'), 'v1')
+    assert loaded.bounds == cube.bounds and loaded.bounds is not None
+    pd.testing.assert_frame_equal(loaded.cells, cube.cells)
+    assert ChurnCube.load(str(tmp_path / 'cube.arrow'), 'v2') is None
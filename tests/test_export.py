@@ -0,0 +1,41 @@
+# Export filters must match whatever dtype a column was read with
+
+import pandas as pd
+import pytest
+
+from data_cache import load_raw_data
+from export import export_chunks, select_rows
+from features import add_derived_columns
+
+
+@pytest.fixture
+def chunk():
+    return pd.DataFrame({
+        'Geography': pd.Series(['France', 'Germany', 'Spain'], dtype='category'),
+        'IsActiveMember': [1, 0, 1],
+        'HasCrCard': [1.0, 0.0, None],
+        'NumOfProducts': pd.Series([1, 2, 3], dtype='category'),
+    })
+
+
+@pytest.mark.parametrize('value', [1, '1', '1.0', 1.0])
+def test_numbers_match_integer_and_float_columns(chunk, value):
+    assert select_rows(chunk, {'IsActiveMember': value}).index.tolist() == [0, 2]
+    assert select_rows(chunk, {'HasCrCard': value}).index.tolist() == [0]
+    assert select_rows(chunk, {'NumOfProducts': [value]}).index.tolist() == [0]
+
+
+def test_categories_and_unconvertible_values(chunk):
+    assert select_rows(chunk, {'Geography': ['Spain', 'France']}).index.tolist() == [0, 2]
+    assert select_rows(chunk, {'IsActiveMember': 'yes'}).empty
+    assert len(select_rows(chunk)) == 3
+
+
+def test_float_chunks_export_like_integer_ones(data_file, cache_dir, tmp_path):
+    raw = load_raw_data(data_file, cache_dir=cache_dir)
+    filters = {'IsActiveMember': ['1'], 'NumOfProducts': ['2']}
+    as_floats = raw.astype({'IsActiveMember': float, 'NumOfProducts': float})
+    counts = [export_chunks([df], str(tmp_path / f'{i}.csv'), filters)['rows']
+              for i, df in enumerate([raw, as_floats])]
+    expected = select_rows(add_derived_columns(raw.copy()), {'IsActiveMember': 1, 'NumOfProducts': 2})
+    assert counts == [len(expected)] * 2 and len(expected) > 0
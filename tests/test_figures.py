@@ -0,0 +1,40 @@
+# Every chart must draw when filters leave some dimension values without customers
+
+import matplotlib
+
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+from plotly.colors import convert_colors_to_same_type  # noqa: E402
+
+from aggregates import ChurnAggregates  # noqa: E402
+from dashboard_figures import create_activity_analysis, create_credit_score_analysis  # noqa: E402
+from data_cache import load_raw_data  # noqa: E402
+from features import SAMPLE_ROWS, add_derived_columns  # noqa: E402
+from figures import FIGURES  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def sample(data_file, cache_dir):
+    df = load_raw_data(data_file, cache_dir=cache_dir).head(SAMPLE_ROWS).copy()
+    return df[(df['IsActiveMember'] == 1) & (df['HasCrCard'] == 1)].reset_index(drop=True)
+
+
+@pytest.mark.parametrize('name, title, plot', FIGURES, ids=[name for name, _, _ in FIGURES])
+def test_report_figures_with_missing_groups(sample, name, title, plot):
+    agg = ChurnAggregates.from_frame(sample)
+    fig = plot(add_derived_columns(sample.copy(), agg.credit_score_bounds()), agg)
+    fig.canvas.draw()
+    plt.close(fig)
+
+
+def test_dashboard_figures_with_missing_groups(sample):
+    agg = ChurnAggregates.from_frame(add_derived_columns(sample.copy()))
+    create_activity_analysis(agg).to_json()
+    _, bars = create_credit_score_analysis(add_derived_columns(sample.copy()), agg)
+    # A sequential scale: lightness changes one way from the lowest rate to the highest
+    colors, _ = convert_colors_to_same_type([color for _, color in bars.layout.coloraxis.colorscale], 'tuple')
+    lightness = np.diff([sum(color) for color in colors])
+    assert (lightness <= 0).all() or (lightness >= 0).all()
@@ -0,0 +1,87 @@
+# Every structure CustomerStore maintains by delta must match a rebuild from its table
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_cache import load_raw_data
+from incremental import KEY, CustomerStore
+from quantiles import OrderStatistics, count_outliers
+
+
+@pytest.fixture(scope='module')
+def raw(data_file, cache_dir):
+    return load_raw_data(data_file, cache_dir=cache_dir)
+
+
+@pytest.fixture
+def store(raw):
+    return CustomerStore(raw)
+
+
+def new_customers(raw, rows):
+    inserts = raw.head(rows).copy()
+    inserts[KEY] = raw[KEY].max() + 1 + np.arange(rows)
+    return inserts
+
+
+def test_update_delta(store, raw):
+    ids = raw[KEY].iloc[[0, 17, 4242]].to_numpy()
+    result = store.apply(pd.DataFrame({KEY: ids, 'Balance': [0.0, 1e5, 2e5], 'Exited': [1, 0, 1],
+                                       'IsActiveMember': [0, 1, 0], 'HasCrCard': [1, 0, 0]}))
+    assert result['updated'] == 3 and store.rows == len(raw)
+    assert store.table.loc[ids, 'Balance'].tolist() == [0.0, 1e5, 2e5]
+    assert store.verify() == []
+
+
+def test_table_snapshots_keep_their_values(store, raw):
+    ids = raw[KEY].iloc[[0, 1]].to_numpy()
+    table = store.table
+    balances = table.loc[ids, 'Balance'].tolist()
+    store.apply(pd.DataFrame({KEY: ids, 'Balance': [1.0, 2.0]}))
+    assert table.loc[ids, 'Balance'].tolist() == balances
+    assert store.table.loc[ids, 'Balance'].tolist() == [1.0, 2.0]
+
+
+def test_insert_delta(store, raw):
+    result = store.apply(new_customers(raw, 5))
+    assert result['inserted'] == 5 and store.rows == len(raw) + 5
+    assert store.verify() == []
+
+
+def test_delete_delta(store, raw):
+    ids = raw[KEY].iloc[[3, 9000]].to_numpy()
+    result = store.apply(pd.DataFrame({KEY: ids, 'Action': 'delete'}))
+    assert result['deleted'] == 2 and store.rows == len(raw) - 2
+    assert not store.table.index.isin(ids).any()
+    assert store.verify() == []
+
+
+def test_delta_moving_the_fences(store, raw):
+    fences = store.fences
+    ids = raw[KEY].iloc[:2000].to_numpy()
+    result = store.apply(pd.DataFrame({KEY: ids, 'CreditScore': 350, 'Balance': 250000.0}))
+    assert result['rebuilt']
+    assert store.fences['CreditScore'] != fences['CreditScore'] and store.fences['Balance'] != fences['Balance']
+    assert store.verify() == []
+
+
+def test_changes_to_rows_not_yet_compacted(store, raw):
+    inserts = new_customers(raw, 3)
+    store.apply(inserts)
+    ids = inserts[KEY].to_numpy()
+    store.apply(pd.DataFrame({KEY: ids[:2], 'Action': ['upsert', 'delete'], 'Exited': [1, np.nan]}))
+    store.apply(pd.DataFrame({KEY: [raw[KEY].iloc[5]], 'Action': 'delete'}))
+    store.apply(new_customers(raw, 1).assign(**{KEY: raw[KEY].iloc[5]}))
+    assert store.rows == len(raw) + 2
+    assert store.table.loc[ids[0], 'Exited'] == 1
+    assert store.verify() == []
+
+
+def test_order_statistics_match_a_sort(raw):
+    stats = OrderStatistics.from_frame(raw).remove(raw.iloc[:3000]).update(raw.iloc[:1000])
+    kept = pd.concat([raw.iloc[3000:], raw.iloc[:1000]])
+    for col, (lower_bound, upper_bound) in stats.bounds().items():
+        q1, q3 = np.quantile(kept[col], [0.25, 0.75])
+        assert lower_bound == pytest.approx(q1 - 1.5 * (q3 - q1)) and upper_bound == pytest.approx(q3 + 1.5 * (q3 - q1))
+    assert stats.outlier_counts(stats.bounds()) == count_outliers(kept, stats.bounds())
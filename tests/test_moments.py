@@ -0,0 +1,66 @@
+# Co-moments merged or subtracted by chunk must match pandas on the whole table
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import ChurnAggregates
+from data_cache import load_raw_data
+from features import CORRELATION_COLS, add_derived_columns
+from moments import CoMoments, association_table, cramers_v
+
+
+@pytest.fixture(scope='module')
+def raw(data_file, cache_dir):
+    return load_raw_data(data_file, cache_dir=cache_dir)
+
+
+def assert_matches(moments, df):
+    df = df[CORRELATION_COLS].dropna()
+    assert moments.n == len(df)
+    np.testing.assert_allclose(moments.mean, df.mean(), rtol=1e-12)
+    np.testing.assert_allclose(moments.covariance(), df.cov(), rtol=1e-9)
+    np.testing.assert_allclose(moments.correlation(), df.corr(), atol=1e-12)
+
+
+@pytest.mark.parametrize('pieces', [1, 3, 64])
+def test_merged_chunks(raw, pieces):
+    moments = CoMoments()
+    for rows in np.array_split(np.arange(len(raw)), pieces):
+        moments.merge(CoMoments.from_frame(raw.iloc[rows]))
+    assert_matches(moments, raw)
+
+
+def test_large_offsets_do_not_cancel(raw):
+    shifted = raw.assign(Balance=raw['Balance'] + 1e12, EstimatedSalary=raw['EstimatedSalary'] + 1e9)
+    moments = CoMoments()
+    for rows in np.array_split(np.arange(len(raw)), 10):
+        moments.update(shifted.iloc[rows])
+    np.testing.assert_allclose(moments.correlation(), raw[CORRELATION_COLS].corr(), atol=1e-9)
+
+
+def test_subtract_is_the_inverse_of_merge(raw):
+    moments = CoMoments.from_frame(raw).subtract(CoMoments.from_frame(raw.iloc[:3000]))
+    assert_matches(moments, raw.iloc[3000:])
+    moments.remove(raw.iloc[3000:7000]).update(raw.iloc[:500])
+    assert_matches(moments, pd.concat([raw.iloc[7000:], raw.iloc[:500]]))
+    assert CoMoments.from_frame(raw).subtract(CoMoments.from_frame(raw)).n == 0
+
+
+def test_rows_with_missing_values_are_skipped(raw):
+    df = raw.head(1000).astype({'Balance': float})
+    df.loc[::9, 'Balance'] = np.nan
+    assert_matches(CoMoments.from_frame(df).merge(CoMoments()), df)
+
+
+def test_associations_match_pandas(raw):
+    df = add_derived_columns(raw.copy())
+    result = association_table(ChurnAggregates.from_frame(df)).set_index('Feature')['Association']
+    for col in ['IsActiveMember', 'HasCrCard', 'CreditScore', 'Age', 'Balance']:
+        assert result[col] == pytest.approx(df[col].astype(float).corr(df['Exited'].astype(float)), abs=1e-12)
+
+    observed = pd.crosstab(df['Geography'], df['Exited']).to_numpy(dtype=float)
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / observed.sum()
+    v = np.sqrt(((observed - expected) ** 2 / expected).sum() / observed.sum())
+    assert result['Geography'] == pytest.approx(v, abs=1e-12)
+    assert np.isnan(cramers_v(pd.DataFrame({'Count': [5], 'Exited': [2]})))
@@ -0,0 +1,73 @@
+# Partitioned reads and the map-reduce pipeline must see every row exactly once
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from cube import CUBE_DIMENSIONS, ChurnCube
+from data_cache import load_raw_data
+from parallel import run_parallel
+from quantiles import count_outliers
+from streaming import DEFAULT_CHUNKSIZE, partitions, read_partition
+
+
+@pytest.fixture(scope='module')
+def raw(data_file, cache_dir):
+    return load_raw_data(data_file, cache_dir=cache_dir)
+
+
+@pytest.fixture(scope='module')
+def quoted_csv(raw, tmp_path_factory):
+    """The customers as CSV, with surnames holding quotes, commas and line breaks"""
+    df = raw.copy()
+    df.loc[::7, 'Surname'] = 'O"Neil,\nJr'
+    df.loc[3::11, 'Surname'] = '\n'
+    path = tmp_path_factory.mktemp('csv') / 'customers.csv'
+    df.to_csv(path, index=False)
+    return str(path), df
+
+
+def read_all(path, chunksize):
+    return pd.concat([chunk for part in partitions(path, chunksize)
+                      for chunk in read_partition(part, chunksize)], ignore_index=True)
+
+
+@pytest.mark.parametrize('chunksize', [1, 700, DEFAULT_CHUNKSIZE])
+def test_csv_ranges_split_on_row_boundaries(quoted_csv, chunksize):
+    path, df = quoted_csv
+    parts = partitions(path, chunksize)
+    assert all(stop == start for (_, _, _, stop), (_, _, start, _) in zip(parts, parts[1:]))
+    pd.testing.assert_frame_equal(read_all(path, chunksize), df, check_dtype=False)
+
+
+def test_csv_ranges_pin_source_dtypes(quoted_csv):
+    path, _ = quoted_csv
+    dtypes = {str(chunk.dtypes.to_dict()) for part in partitions(path, 1)
+              for chunk in read_partition(part, 1)}
+    assert len(dtypes) == 1
+
+
+def test_csv_without_trailing_newline(tmp_path):
+    path = tmp_path / 'customers.csv'
+    path.write_bytes(b'CustomerId,Surname\n1,"a\nb"\n2,c')
+    assert read_all(str(path), 1)['Surname'].tolist() == ['a\nb', 'c']
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'parquet', 'frame'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_run_parallel_matches_an_in_memory_build(raw, tmp_path, fmt, workers):
+    source = tmp_path / f'customers.{fmt}'
+    if fmt == 'csv':
+        raw.to_csv(source, index=False)
+    elif fmt == 'parquet':
+        raw.to_parquet(source, index=False, row_group_size=1500)
+    else:
+        source = raw
+    result = run_parallel(source if fmt == 'frame' else str(source), workers, chunksize=1500)
+
+    assert result.rows == len(raw)
+    cube = ChurnCube.from_frame(raw, result.cube.bounds)
+    for dim in CUBE_DIMENSIONS:
+        pd.testing.assert_frame_equal(result.cube.table(dim), cube.table(dim), check_dtype=False)
+    assert result.outlier_counts == count_outliers(raw, result.sketches.bounds())
+    assert np.allclose(result.correlation(), raw[result.correlation().columns].corr(), atol=1e-9)
@@ -0,0 +1,72 @@
+# KLL sketches must stay within their documented rank error, merged or not
+
+import numpy as np
+import pytest
+
+from data_cache import load_raw_data
+from features import NUMERICAL_COLS
+from quantiles import DEFAULT_K, ColumnSketches, KLLSketch, count_outliers
+
+# Simultaneous normalized rank error over all quantiles for k=200 (see KLLSketch)
+RANK_ERROR = 0.017
+QUANTILES = np.linspace(0.01, 0.99, 99)
+
+
+@pytest.fixture(scope='module')
+def values():
+    rng = np.random.default_rng(42)
+    return np.concatenate([rng.lognormal(10, 1, 150_000), rng.integers(300, 850, 50_000)])
+
+
+def rank_errors(sketch, values):
+    """Normalized rank error of the sketch's estimate of every quantile in
+    QUANTILES: its distance to the ranks the estimate spans (ties span several)"""
+    ordered = np.sort(values)
+    estimates = [sketch.quantile(q) for q in QUANTILES]
+    below = np.searchsorted(ordered, estimates, side='left') / len(values)
+    at_most = np.searchsorted(ordered, estimates, side='right') / len(values)
+    return np.maximum(below - QUANTILES, 0) + np.maximum(QUANTILES - at_most, 0)
+
+
+def test_rank_error_bound(values):
+    sketch = KLLSketch.from_values(values)
+    assert rank_errors(sketch, values).max() <= RANK_ERROR
+    assert (sketch.n, sketch.min, sketch.max) == (len(values), values.min(), values.max())
+    # Memory stays around 3k items, independent of n
+    assert sum(len(items) for items in sketch.levels) < 3 * DEFAULT_K + 2 * len(sketch.levels)
+
+
+def test_rank_estimates(values):
+    sketch = KLLSketch.from_values(values)
+    ordered = np.sort(values)
+    for q in QUANTILES:
+        value = ordered[int(q * len(values))]
+        assert abs(sketch.rank(value) - np.searchsorted(ordered, value)) <= RANK_ERROR * len(values)
+
+
+@pytest.mark.parametrize('pieces', [2, 7, 40])
+def test_merged_sketches_keep_the_bound(values, pieces):
+    sketch = KLLSketch()
+    for chunk in np.array_split(values, pieces):
+        sketch.merge(KLLSketch.from_values(chunk))
+    assert rank_errors(sketch, values).max() <= RANK_ERROR
+    assert (sketch.n, sketch.min, sketch.max) == (len(values), values.min(), values.max())
+
+
+def test_nans_and_empty_sketches():
+    sketch = KLLSketch().update([np.nan, 1.0, np.nan, 3.0]).merge(KLLSketch())
+    assert sketch.n == 2 and sketch.quantile(0) == 1.0 and sketch.quantile(1) == 3.0
+    assert np.isnan(KLLSketch().quantile(0.5)) and KLLSketch().rank(1.0) == 0
+
+
+def test_column_sketches_merge_like_one_pass(data_file, cache_dir):
+    raw = load_raw_data(data_file, cache_dir=cache_dir)
+    merged = ColumnSketches()
+    for chunk in np.array_split(np.arange(len(raw)), 5):
+        merged.merge(ColumnSketches().update(raw.iloc[chunk]))
+    for col in NUMERICAL_COLS:
+        assert rank_errors(merged[col], raw[col].to_numpy(dtype=np.float64)).max() <= RANK_ERROR
+    # Estimated outlier counts carry the rank error of both fences
+    estimates = merged.outlier_table().set_index('Column')['Outlier_Count']
+    for col, count in count_outliers(raw, merged.bounds()).items():
+        assert abs(estimates[col] - count) <= 2 * RANK_ERROR * len(raw)
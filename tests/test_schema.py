@@ -0,0 +1,62 @@
+# The compact dtypes of schema.py must leave every aggregate unchanged
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregates import DIMENSIONS, ChurnAggregates
+from cube import CUBE_DIMENSIONS, ChurnCube
+from data_cache import load_raw_data
+from features import CORRELATION_COLS, add_derived_columns
+from profiling import profile_frame
+from schema import memory_report, parity_check
+
+
+@pytest.fixture(scope='module')
+def frames(data_file, cache_dir):
+    """The customer table in its original dtypes and in the compact ones, both enriched"""
+    raw = add_derived_columns(load_raw_data(data_file, cache_dir=cache_dir))
+    compact = add_derived_columns(load_raw_data(data_file, cache_dir=cache_dir, compact=True))
+    return raw, compact
+
+
+def assert_same(compact, raw):
+    pd.testing.assert_frame_equal(compact, raw, check_dtype=False, check_index_type=False,
+                                  check_column_type=False, check_categorical=False)
+
+
+def test_compact_dtypes_are_smaller(frames):
+    raw, compact = frames
+    report = memory_report(raw, compact)
+    assert report.loc['Total', 'Compact KiB'] < report.loc['Total', 'Raw KiB']
+    assert list(compact.columns) == list(raw.columns)
+
+
+@pytest.mark.parametrize('dim', DIMENSIONS)
+def test_aggregate_tables_unchanged(frames, dim):
+    raw, compact = (ChurnAggregates.from_frame(df) for df in frames)
+    assert_same(compact.table(dim).reset_index(), raw.table(dim).reset_index())
+    assert_same(compact.average_balance(dim).reset_index(), raw.average_balance(dim).reset_index())
+
+
+@pytest.mark.parametrize('dim', CUBE_DIMENSIONS)
+def test_cube_tables_unchanged(frames, dim):
+    raw, compact = (ChurnCube.from_frame(df) for df in frames)
+    assert_same(compact.table(dim).reset_index(), raw.table(dim).reset_index())
+
+
+def test_correlation_unchanged(frames):
+    raw, compact = frames
+    np.testing.assert_allclose(compact[CORRELATION_COLS].corr(), raw[CORRELATION_COLS].corr(), atol=1e-12)
+    np.testing.assert_allclose(ChurnAggregates.from_frame(compact).correlation(),
+                               ChurnAggregates.from_frame(raw).correlation(), atol=1e-12)
+
+
+def test_outlier_counts_unchanged(frames):
+    raw, compact = (profile_frame(df) for df in frames)
+    assert_same(compact.outliers, raw.outliers)
+
+
+def test_parity_check_passes(frames):
+    raw, _ = frames
+    assert parity_check(raw) == []